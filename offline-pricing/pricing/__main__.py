@@ -0,0 +1,153 @@
+import argparse
+import sys
+
+from .benchmark import BASELINE_PATH, COLD_START_BUDGET_MS, GOLDEN_PATH, run_bench
+from .bulk import run_batch
+from .capacity import run_capacity
+from .consumption import STATE_PATH, run_consumption
+from .ganging import run_gang
+from .matrix import MATRIX_DIR, run_matrix
+from .money import ROUNDING_RULES
+from .service import run_service
+from .snapshot import SNAPSHOT_PATH, run_snapshot
+
+
+def run_impact(args):
+    # numpy is only needed by this command and vinyl, so it stays off the others' startup
+    from .impact import run_impact
+    return run_impact(args)
+
+
+def run_vinyl(args):
+    from .vinyl import run_vinyl
+    return run_vinyl(args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pricing', description='Offline pricing tools')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch = commands.add_parser('batch', help='Price a CSV/JSONL order file row by row')
+    batch.add_argument('input', help="Input file ('-' for stdin)")
+    batch.add_argument('-o', '--output', default='-', help="Output file ('-' for stdout)")
+    batch.add_argument('--format', choices=('csv', 'jsonl'), help='Input format (default: from extension)')
+    batch.add_argument('--output-format', choices=('csv', 'jsonl'), help='Output format (default: from extension)')
+    batch.add_argument('-j', '--workers', type=int, help='Workers (default: CPU count)')
+    batch.add_argument('--threads', action='store_true',
+                       help='Use worker threads sharing one calculator instead of processes '
+                            '(parallel on free-threaded Python)')
+    batch.add_argument('--chunk-size', type=int, default=256, help='Rows per worker task')
+    batch.add_argument('--grouped', action='store_true',
+                       help='Price each chunk as one quote, sharing work between rows with the same configuration')
+    batch.add_argument('--exact', choices=ROUNDING_RULES, metavar='RULE',
+                       help=f'Exact integer money with one rounding rule ({", ".join(ROUNDING_RULES)})')
+    batch.add_argument('--store', metavar='DB', help='Also save priced rows to a local SQLite quote store')
+    batch.add_argument('--store-batch', type=int, default=5000, help='Rows per quote store transaction')
+    batch.add_argument('--strict', action='store_true', help='Exit non-zero if any row fails')
+    batch.set_defaults(handler=run_batch)
+
+    serve = commands.add_parser('serve', help='Run the local HTTP/JSON pricing service')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--cache-size', type=int, default=10000, help='Maximum cached responses')
+    serve.add_argument('--cache-ttl', type=float, default=300, help='Seconds a cached response stays valid')
+    serve.add_argument('--instrument', action='store_true',
+                       help='Record per-method metrics (GET /metrics/prometheus, /metrics/json)')
+    serve.add_argument('--watch', help='Reload pricing config from this snapshot file or SQLite database')
+    serve.add_argument('--watch-interval', type=float, default=2.0, help='Seconds between reload checks')
+    serve.set_defaults(handler=run_service)
+
+    bench = commands.add_parser('bench', help='Benchmark the pricing functions and check golden prices')
+    bench.add_argument('--record', action='store_true', help='Record a new baseline and golden corpus')
+    bench.add_argument('--baseline', default=BASELINE_PATH)
+    bench.add_argument('--golden', default=GOLDEN_PATH)
+    bench.add_argument('--threshold', type=float, default=0.25, help='Allowed latency regression (fraction)')
+    bench.add_argument('--number', type=int, default=2000, help='Calls per timing run')
+    bench.add_argument('--repeat', type=int, default=5, help='Timing runs per scenario (best is kept)')
+    bench.add_argument('--cold-start-budget', type=float, default=COLD_START_BUDGET_MS,
+                       help='Fail if import plus first quote takes longer (ms, 0 to skip)')
+    bench.add_argument('--scaling', action='store_true',
+                       help='Only compare thread pool and process pool throughput by worker count')
+    bench.add_argument('--scaling-rows', type=int, default=20000, help='Rows per scaling run')
+    bench.set_defaults(handler=run_bench)
+
+    snapshot = commands.add_parser('snapshot', help='Compile the pricing config into a fast-loading snapshot')
+    snapshot.add_argument('-o', '--output', default=SNAPSHOT_PATH)
+    snapshot.set_defaults(handler=run_snapshot)
+
+    matrix = commands.add_parser('matrix', help='Export precomputed price matrix shards for offline use')
+    matrix.add_argument('-o', '--output', default=MATRIX_DIR)
+    matrix.add_argument('-j', '--workers', type=int, help='Worker processes (default: CPU count)')
+    matrix.add_argument('--products', nargs='+', help='Only these products (default: all)')
+    matrix.add_argument('--force', action='store_true', help='Rebuild shards even if their inputs are unchanged')
+    matrix.add_argument('--no-parquet', action='store_true', help='Skip the Parquet copies')
+    matrix.set_defaults(handler=run_matrix)
+
+    impact = commands.add_parser('impact', help='Reprice a historical quote corpus under a changed pricing config')
+    impact.add_argument('corpus', help='Quote store database or CSV/JSONL rows in the batch format')
+    impact.add_argument('--format', choices=('csv', 'jsonl'), help='Corpus file format (default: from extension)')
+    impact.add_argument('--new', help='New config as a snapshot file or SQLite config database (default: current)')
+    impact.add_argument('--set', action='append', default=[], metavar='PATH=VALUE',
+                        help='Override a config value, e.g. formula.efficiency_exponent=0.82')
+    impact.add_argument('--paper-cost', action='append', default=[], metavar='CODE=COST',
+                        help='Set one paper stock cost')
+    impact.add_argument('--paper-scale', type=float, help='Multiply every paper cost')
+    impact.add_argument('--monte-carlo', type=int, default=0, metavar='DRAWS',
+                        help='Also sweep paper-cost uncertainty with this many draws')
+    impact.add_argument('--paper-sigma', type=float, default=0.1, help='Log-sd of the paper cost factors')
+    impact.add_argument('--seed', type=int)
+    impact.add_argument('--top', type=int, default=20, help='Customers listed in the report')
+    impact.add_argument('--chunk-rows', type=int, default=100000, help='Rows per chunk')
+    impact.add_argument('-o', '--output', default='-', help="Report file ('-' for stdout)")
+    impact.set_defaults(handler=run_impact)
+
+    consumption = commands.add_parser('consumption',
+                                      help='Track paper stock consumption from priced quotes or orders')
+    consumption.add_argument('sources', nargs='+', help='Quote store databases or CSV/JSONL rows in the batch format')
+    consumption.add_argument('--format', choices=('csv', 'jsonl'), help='Source file format (default: from extension)')
+    consumption.add_argument('--state', default=STATE_PATH, help='Incremental state file')
+    consumption.add_argument('--rebuild', action='store_true', help='Ignore the saved state and read every source again')
+    consumption.add_argument('--stock', help='Stock levels JSON for reorder alerts')
+    consumption.add_argument('--as-of', help='Report date, YYYY-MM-DD (default: today)')
+    consumption.add_argument('--alpha', type=float, default=0.3, help='Smoothing of the daily level')
+    consumption.add_argument('--beta', type=float, default=0.1, help='Smoothing of the daily trend')
+    consumption.add_argument('--horizon', type=int, default=30, help='Forecast days')
+    consumption.add_argument('--daily', action='store_true', help='Include the daily totals of the longest window')
+    consumption.add_argument('-o', '--output', default='-', help="Report file ('-' for stdout)")
+    consumption.set_defaults(handler=run_consumption)
+
+    capacity = commands.add_parser('capacity', help='Simulate the open job queue and check rush feasibility')
+    capacity.add_argument('queue', help='Open jobs as CSV/JSONL rows in the batch format (with due or ordered_at)')
+    capacity.add_argument('--format', choices=('csv', 'jsonl'), help='Queue file format (default: from extension)')
+    capacity.add_argument('--job', metavar='JSON', help='New job row to check every rush tier for')
+    capacity.add_argument('--capacity', help='JSON overriding the shift, rush days and station rates')
+    capacity.add_argument('--now', help='Simulation start, ISO datetime (default: now)')
+    capacity.add_argument('-o', '--output', default='-', help="Report file ('-' for stdout)")
+    capacity.set_defaults(handler=run_capacity)
+
+    vinyl = commands.add_parser('vinyl', help='Price a multi-design vinyl sticker order')
+    vinyl.add_argument('designs', help="Designs as CSV/JSONL rows with name, width, height and quantity ('-' for stdin)")
+    vinyl.add_argument('--format', choices=('csv', 'jsonl'), help='Designs file format (default: from extension)')
+    vinyl.add_argument('--quantity', type=int, help="Price every design at this quantity instead of the file's")
+    vinyl.add_argument('--rush-type', default='standard')
+    vinyl.add_argument('--exact', choices=ROUNDING_RULES, metavar='RULE',
+                       help=f'Exact integer money with one rounding rule ({", ".join(ROUNDING_RULES)})')
+    vinyl.add_argument('-o', '--output', default='-', help="Order breakdown file ('-' for stdout)")
+    vinyl.set_defaults(handler=run_vinyl)
+
+    gang = commands.add_parser('gang', help='Plan gang runs of mixed-size jobs on shared press sheets')
+    gang.add_argument('jobs', help="Jobs as CSV/JSONL rows with id, width, height, quantity and paper_code "
+                                   "('-' for stdin)")
+    gang.add_argument('--format', choices=('csv', 'jsonl'), help='Jobs file format (default: from extension)')
+    gang.add_argument('--makeready-sheets', type=int, default=10, help='Sheets one make-ready is worth')
+    gang.add_argument('--candidate-jobs', type=int, default=64, help='Largest jobs considered for each layout')
+    gang.add_argument('--run-candidates', type=int, default=24, help='Run lengths tried for each layout')
+    gang.add_argument('-o', '--output', default='-', help="Plan file ('-' for stdout)")
+    gang.set_defaults(handler=run_gang)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1052 @@
+import math
+import numpy as np
+from .calculator import VINYL_MONEY_FIELDS, PricingCalculator
+from .money import MICROS_PER_CENT, MICROS_PER_DOLLAR, RATE_SCALE, ExactPricingCalculator, to_rate
+
+
+# Half-cent ties are where numpy's rint-based rounding can disagree with
+# Python's round(); rows that land this close to a tie are re-priced through
+# the scalar path so batch results always match it to the cent.
+TIE_TOLERANCE = 1e-9
+
+# Columns of the plan-based products that add up to the subtotal
+PLAN_PARTS = ('printing_setup_cost', 'finishing_setup_cost', 'production_cost', 'material_cost',
+              'finishing_cost')
+
+
+def _near_tie(values, digits):
+    """Mask of values that sit within TIE_TOLERANCE of a rounding tie"""
+    scaled = np.asarray(values, dtype=np.float64) * (10 ** digits)
+    distance = np.abs(scaled - np.floor(scaled) - 0.5)
+    return distance <= TIE_TOLERANCE * np.maximum(1.0, np.abs(scaled))
+
+
+def _round_column(values, digits):
+    """np.round, with round() on values near a tie so every element matches the scalar path"""
+    rounded = np.round(values, digits)
+    for i in np.flatnonzero(_near_tie(values, digits)):
+        rounded[i] = round(float(values[i]), digits)
+    return rounded
+
+
+def _tier_column(index, values, field=None):
+    """Vectorized TierIndex.lookup(value), or one field of it (gaps get the index default)"""
+    lows = np.asarray(index.lows, dtype=np.float64)
+    highs = np.asarray(index.highs, dtype=np.float64)
+    i = np.searchsorted(lows, values, side='right') - 1
+    inside = (i >= 0) & (values <= highs[np.maximum(i, 0)])
+    # The default sits in the last slot, so position -1 selects it
+    tiers = index.values + (index.default,)
+    table = np.array(tiers if field is None else [tier[field] for tier in tiers])
+    return table[np.where(inside, i, -1)]
+
+
+def _curve_values(curve, x):
+    """Vectorized BracketCurve.value with the same operation order"""
+    brackets = np.asarray(curve.brackets, dtype=np.float64)
+    costs = np.asarray(curve.costs, dtype=np.float64)
+    rises = np.asarray(curve.rises, dtype=np.float64)
+    runs = np.asarray(curve.runs, dtype=np.float64)
+    i = np.clip(np.searchsorted(brackets, x, side='left') - 1, 0, len(runs) - 1)
+    values = costs[i] + (x - brackets[i]) * rises[i] / runs[i]
+    if curve.extrapolate:
+        above = costs[-1] + (x - brackets[-1]) * curve.slopes[-1]
+    else:
+        above = costs[-1]
+    return np.where(x <= brackets[0], costs[0], np.where(x >= brackets[-1], above, values))
+
+
+class BatchPricingCalculator(PricingCalculator):
+    """
+    Vectorized variants of the pricing functions.
+    Each *_batch method resolves papers, constraints, imposition and finishing
+    once per configuration, then evaluates
+    C(Q) = (S + F_setup + S_total^e * k + Q * v + Q * f) * r
+    over a whole array of quantities and returns columnar results.
+    """
+
+    def _as_quantities(self, quantities, product):
+        """Validate a quantity array against product constraints"""
+        q = np.asarray(quantities, dtype=np.int64).ravel()
+        constraints = self.config['product_constraints'][product]
+        if q.size == 0:
+            return None, {'error': 'At least one quantity is required'}
+        if q.min() < constraints['min_quantity'] or q.max() > constraints['max_quantity']:
+            return None, {'error': f"Quantity must be between {constraints['min_quantity']} and {constraints['max_quantity']}"}
+        return q, None
+
+    def _finalize(self, result, money_columns, unit_digits, scalar_price, quantities, parts=()):
+        """
+        Round money columns and re-price near-tie rows through the scalar path.
+        parts names the columns that add up to the subtotal, for the exact
+        money mode (see ExactBatchPricingCalculator).
+        """
+        ties = _near_tie(result['unit_price'], unit_digits)
+        for column in money_columns:
+            ties |= _near_tie(result[column], 2)
+
+        result['unit_price'] = np.round(result['unit_price'], unit_digits)
+        for column in money_columns:
+            result[column] = np.round(result[column], 2)
+
+        for i in np.flatnonzero(ties):
+            exact = scalar_price(int(quantities[i]))
+            for column in money_columns:
+                result[column][i] = exact[column]
+            result['unit_price'][i] = exact['unit_price']
+        return result
+
+    def calculate_flat_print_price_batch(self, quantities, width, height, paper_code,
+                                         printing_sides='double-sided', hole_punch=False,
+                                         lanyard=False, rush_type='standard'):
+        """
+        Batch price for flat prints (postcards, flyers, bookmarks, name tags)
+        """
+        paper = self.paper_stocks.get(paper_code)
+        if not paper:
+            return {'error': 'Invalid paper selection'}
+
+        q, error = self._as_quantities(quantities, 'flat-prints')
+        if error:
+            return error
+
+        formula = self.config['formula']
+        S = formula['setup_fee']
+        k = formula['base_production_rate']
+        e = formula['efficiency_exponent']
+
+        clicks_per_piece = 0.10 if printing_sides == 'double-sided' else 0.05
+        paper_cost = paper['cost_per_sheet']
+
+        imposition_result = self.imposition_calc.calculate_imposition(width, height)
+        if imposition_result.get('error'):
+            return {'error': imposition_result['error']}
+
+        imposition = imposition_result['copies']
+        if imposition == 0:
+            return {'error': 'Unable to calculate imposition for given dimensions'}
+
+        v = (paper_cost + clicks_per_piece) * 1.5 / imposition
+
+        is_adhesive = paper_code == 'PAC51319WP'
+        f = 0
+        if not is_adhesive:
+            if hole_punch:
+                f += 0.05
+            if lanyard:
+                f += 1.25
+        needs_finishing = f > 0
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        finishing_setup_cost = 0
+        qf = q.astype(np.float64)
+        S_total = np.ceil(qf / imposition)
+        production_cost = np.power(S_total, e) * k
+        material_cost = qf * v
+        finishing_cost = qf * f
+
+        subtotal = S + finishing_setup_cost + production_cost + material_cost + finishing_cost
+        total_cost = subtotal * rush_multiplier
+
+        result = {
+            'quantity': q,
+            'printing_setup_cost': np.full(q.size, float(S)),
+            'finishing_setup_cost': np.full(q.size, float(finishing_setup_cost)),
+            'needs_finishing': needs_finishing,
+            'production_cost': production_cost,
+            'material_cost': material_cost,
+            'finishing_cost': finishing_cost,
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'sheets_required': S_total.astype(np.int64),
+            'paper_used': paper['display_name'],
+            'imposition': imposition,
+            'size': f'{width}"x{height}"',
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_flat_print_price(quantity, width, height, paper_code,
+                                                   printing_sides, hole_punch, lanyard, rush_type)
+
+        return self._finalize(result, ('printing_setup_cost', 'finishing_setup_cost', 'production_cost',
+                                       'material_cost', 'finishing_cost', 'subtotal', 'total_cost'),
+                              3, scalar_price, q, PLAN_PARTS)
+
+    def calculate_folded_print_price_batch(self, quantities, size, paper_code,
+                                           fold_type='none', printing_sides='double-sided',
+                                           rush_type='standard'):
+        """
+        Batch price for folded prints (brochures, table tents)
+        """
+        paper = self.paper_stocks.get(paper_code)
+        if not paper:
+            return {'error': 'Invalid paper selection'}
+
+        q, error = self._as_quantities(quantities, 'folded-prints')
+        if error:
+            return error
+
+        formula = self.config['formula']
+        S = formula['setup_fee']
+        F_setup = formula['finishing_setup_fee']
+        k = formula['base_production_rate']
+        e = formula['efficiency_exponent']
+
+        clicks_per_piece = 0.10 if printing_sides == 'double-sided' else 0.05
+        paper_cost = paper['cost_per_sheet']
+
+        width, height = self._parse_size_string(size)
+
+        if fold_type == 'table-tent':
+            material_height = height * 2.5
+            imposition_result = self.imposition_calc.calculate_imposition(width, material_height)
+        else:
+            imposition_result = self.imposition_calc.calculate_imposition(width, height)
+
+        if imposition_result.get('error'):
+            return {'error': imposition_result['error']}
+
+        imposition = imposition_result['copies']
+        if imposition == 0:
+            return {'error': 'Unable to calculate imposition for given size'}
+
+        v = (paper_cost + clicks_per_piece) * 1.5 / imposition
+
+        f = self.config['finishing_costs']['folding'].get(fold_type, 0)
+        needs_finishing = fold_type and fold_type != 'none' and f > 0
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        finishing_setup_cost = F_setup if needs_finishing else 0
+        qf = q.astype(np.float64)
+        S_total = np.ceil(qf / imposition)
+        production_cost = np.power(S_total, e) * k
+        material_cost = qf * v
+        finishing_cost = qf * f
+
+        subtotal = S + finishing_setup_cost + production_cost + material_cost + finishing_cost
+        total_cost = subtotal * rush_multiplier
+
+        result = {
+            'quantity': q,
+            'printing_setup_cost': np.full(q.size, float(S)),
+            'finishing_setup_cost': np.full(q.size, float(finishing_setup_cost)),
+            'needs_finishing': needs_finishing,
+            'production_cost': production_cost,
+            'material_cost': material_cost,
+            'finishing_cost': finishing_cost,
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'sheets_required': S_total.astype(np.int64),
+            'paper_used': paper['display_name'],
+            'imposition': imposition,
+            'fold_type': fold_type,
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_folded_print_price(quantity, size, paper_code,
+                                                     fold_type, printing_sides, rush_type)
+
+        return self._finalize(result, ('printing_setup_cost', 'finishing_setup_cost', 'production_cost',
+                                       'material_cost', 'finishing_cost', 'subtotal', 'total_cost'),
+                              3, scalar_price, q, PLAN_PARTS)
+
+    def calculate_booklet_price_batch(self, quantities, size, pages, cover_paper_code,
+                                      text_paper_code, printing_sides='double-sided',
+                                      rush_type='standard'):
+        """
+        Batch price for booklets (8-48 pages, saddle stitch)
+        """
+        constraints = self.config['product_constraints']['booklets']
+
+        q, error = self._as_quantities(quantities, 'booklets')
+        if error:
+            return error
+
+        if pages < constraints['min_pages'] or pages > constraints['max_pages']:
+            return {'error': f"Page count must be between {constraints['min_pages']} and {constraints['max_pages']}"}
+
+        if pages % constraints['page_multiple'] != 0:
+            return {'error': f"Page count must be a multiple of {constraints['page_multiple']}"}
+
+        is_self_cover = cover_paper_code == 'SELF_COVER'
+
+        if is_self_cover:
+            text_paper = self.paper_stocks.get(text_paper_code)
+            cover_paper = text_paper
+            if not text_paper:
+                return {'error': 'Invalid text paper selection'}
+        else:
+            cover_paper = self.paper_stocks.get(cover_paper_code)
+            text_paper = self.paper_stocks.get(text_paper_code)
+            if not cover_paper or not text_paper:
+                return {'error': 'Invalid paper selection'}
+
+        clicks_cost = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        if is_self_cover:
+            cover_sheets_per_booklet = 0
+            text_sheets_per_booklet = pages / 4
+        else:
+            cover_sheets_per_booklet = 1
+            text_sheets_per_booklet = (pages - 4) / 4
+
+        width, height = self._parse_size_string(size)
+        imposition_result = self.imposition_calc.calculate_imposition(width, height)
+        imposition = imposition_result.get('copies', 4)
+
+        multi_up_factor = 2 if (width <= 6.5 and height <= 9) else 1
+
+        sheets_per_booklet = cover_sheets_per_booklet + text_sheets_per_booklet
+        clicks_per_booklet = sheets_per_booklet / multi_up_factor
+
+        cover_cost = (cover_sheets_per_booklet * cover_paper['cost_per_sheet']) / multi_up_factor
+        text_cost = (text_sheets_per_booklet * text_paper['cost_per_sheet']) / multi_up_factor
+        click_cost = clicks_per_booklet * clicks_cost
+        materials_cost_per_unit = (cover_cost + text_cost + click_cost) * 1.25
+
+        booklet_finishing = self.config['finishing_costs']['booklet_finishing']
+        cover_creasing = 0 if is_self_cover else booklet_finishing['cover_creasing']
+        finishing_per_unit = booklet_finishing['base_labor'] + cover_creasing + (booklet_finishing['binding_per_sheet'] * text_sheets_per_booklet)
+
+        formula = self.config['formula']
+        base_setup = (formula['setup_fee'] * 2) + (2 * pages)
+        k = formula['base_production_rate']
+        e = formula['efficiency_exponent']
+        finishing_setup = formula['finishing_setup_fee']
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        qf = q.astype(np.float64)
+        S_total = qf * sheets_per_booklet / multi_up_factor
+        production = np.power(S_total, e) * k
+        materials = qf * materials_cost_per_unit
+        finishing = qf * finishing_per_unit
+
+        subtotal = base_setup + production + materials + finishing_setup + finishing
+        total_cost = subtotal * rush_multiplier
+
+        cover_sheets_required = np.ceil(qf * cover_sheets_per_booklet).astype(np.int64)
+        text_sheets_required = np.ceil(qf * text_sheets_per_booklet).astype(np.int64)
+
+        result = {
+            'quantity': q,
+            'printing_setup_cost': np.full(q.size, float(base_setup)),
+            'finishing_setup_cost': np.full(q.size, float(finishing_setup)),
+            'needs_finishing': True,
+            'production_cost': production,
+            'material_cost': materials,
+            'finishing_cost': finishing,
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'sheets_required': cover_sheets_required + text_sheets_required,
+            'cover_paper_used': 'Self Cover' if is_self_cover else cover_paper['display_name'],
+            'text_paper_used': text_paper['display_name'],
+            'pages': pages,
+            'imposition': imposition,
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_booklet_price(quantity, size, pages, cover_paper_code,
+                                                text_paper_code, printing_sides, rush_type)
+
+        return self._finalize(result, ('printing_setup_cost', 'finishing_setup_cost', 'production_cost',
+                                       'material_cost', 'finishing_cost', 'subtotal', 'total_cost'),
+                              3, scalar_price, q, PLAN_PARTS)
+
+    def calculate_notebook_price_batch(self, quantities, width, height, pages, binding_type,
+                                       cover_paper_code, text_paper_code, page_content='blank',
+                                       printing_sides='double-sided', rush_type='standard'):
+        """
+        Batch price for notebooks (20-200 pages, various bindings)
+        """
+        q, error = self._as_quantities(quantities, 'notebooks')
+        if error:
+            return error
+
+        cover_paper = self.paper_stocks.get(cover_paper_code)
+        text_paper = self.paper_stocks.get(text_paper_code)
+
+        if not cover_paper or not text_paper:
+            return {'error': 'Invalid paper selection'}
+
+        base_setup = 0 if page_content == 'blank' else self.config['formula']['setup_fee']
+        finishing_setup = self.config['formula']['finishing_setup_fee']
+        total_setup = base_setup + finishing_setup
+
+        imposition_result = self.imposition_calc.calculate_imposition(width, height)
+        imposition = imposition_result.get('copies', 2)
+
+        sides_multiplier = 2 if printing_sides == 'double-sided' else 1
+        clicks_cost = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        cover_sheets_per_notebook = 1 / imposition
+        text_sheets_per_notebook = pages / (imposition * sides_multiplier)
+
+        cover_clicks = 1
+        text_clicks = round(text_sheets_per_notebook * sides_multiplier)
+        total_clicks = cover_clicks + text_clicks
+
+        cover_cost = cover_sheets_per_notebook * cover_paper['cost_per_sheet']
+        text_cost = text_sheets_per_notebook * text_paper['cost_per_sheet']
+        click_cost = total_clicks * clicks_cost
+        materials_cost_per_unit = (cover_cost + text_cost + click_cost) * 1.25
+
+        binding_hardware = self.config['finishing_costs']['notebook_binding'].get(binding_type, 0)
+        labor_cost = self.config['finishing_costs']['notebook_labor'].get(binding_type, 2.50)
+
+        sheets_per_notebook = cover_sheets_per_notebook + text_sheets_per_notebook
+        formula = self.config['formula']
+        k = formula['base_production_rate']
+        e = formula['efficiency_exponent']
+
+        qf = q.astype(np.float64)
+        S_total = qf * sheets_per_notebook
+        production_cost = np.power(S_total, e) * k
+        materials_cost_total = qf * materials_cost_per_unit
+        labor_cost_total = qf * labor_cost
+        binding_cost_total = qf * binding_hardware
+
+        subtotal = total_setup + production_cost + materials_cost_total + labor_cost_total + binding_cost_total
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+        total = subtotal * rush_multiplier
+
+        result = {
+            'quantity': q,
+            'width': width,
+            'height': height,
+            'pages': pages,
+            'binding_type': binding_type,
+            'cover_paper': cover_paper['display_name'],
+            'text_paper': text_paper['display_name'],
+            'page_content': page_content,
+            'unit_price': total / qf,
+            'total_cost': total,
+            'printing_setup_cost': np.full(q.size, float(base_setup)),
+            'finishing_setup_cost': np.full(q.size, float(finishing_setup)),
+            'total_setup_cost': np.full(q.size, float(total_setup)),
+            'production_cost': production_cost,
+            'material_cost': materials_cost_total,
+            'labor_cost': labor_cost_total,
+            'binding_cost': binding_cost_total,
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'imposition': imposition,
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_notebook_price(quantity, width, height, pages, binding_type,
+                                                 cover_paper_code, text_paper_code, page_content,
+                                                 printing_sides, rush_type)
+
+        return self._finalize(result, ('total_cost', 'printing_setup_cost', 'finishing_setup_cost',
+                                       'total_setup_cost', 'production_cost', 'material_cost',
+                                       'labor_cost', 'binding_cost', 'subtotal'),
+                              2, scalar_price, q, ('printing_setup_cost', 'finishing_setup_cost',
+                                                   'production_cost', 'material_cost', 'labor_cost',
+                                                   'binding_cost'))
+
+    def calculate_notepad_price_batch(self, quantities, width, height, sheets, text_paper_code,
+                                      backing_paper_code, page_content='blank',
+                                      printing_sides='single-sided', rush_type='standard'):
+        """
+        Batch price for notepads (25-100 sheets, glue-bound)
+        """
+        q, error = self._as_quantities(quantities, 'notepads')
+        if error:
+            return error
+
+        text_paper = self.paper_stocks.get(text_paper_code)
+        backing_paper = self.paper_stocks.get(backing_paper_code)
+
+        if not text_paper or not backing_paper:
+            return {'error': 'Invalid paper selection'}
+
+        base_setup = self.config['formula']['setup_fee'] if page_content == 'custom' else 0
+        finishing_setup = self.config['formula']['finishing_setup_fee']
+        total_setup = base_setup + finishing_setup
+
+        imposition_result = self.imposition_calc.calculate_imposition(width, height)
+        imposition = imposition_result.get('copies')
+
+        if not imposition:
+            return {'error': 'Unable to calculate imposition for given dimensions'}
+
+        clicks_cost = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        backing_sheets_per_pad = 1 / imposition
+        backing_cost = backing_sheets_per_pad * backing_paper['cost_per_sheet']
+        padding_labor = sheets * 0.01
+
+        formula = self.config['formula']
+        k = formula['base_production_rate']
+        e = formula['efficiency_exponent']
+
+        qf = q.astype(np.float64)
+        press_sheets_needed = (qf * sheets) / imposition
+
+        text_cost_per_unit = (press_sheets_needed * text_paper['cost_per_sheet']) / qf
+        click_cost_per_unit = (press_sheets_needed * clicks_cost) / qf
+        materials_cost_per_unit = (text_cost_per_unit + backing_cost + click_cost_per_unit) * 1.25
+
+        production_cost = np.power(press_sheets_needed, e) * k
+        materials_cost_total = qf * materials_cost_per_unit
+        labor_cost_total = qf * padding_labor
+
+        subtotal = total_setup + production_cost + materials_cost_total + labor_cost_total
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+        total = subtotal * rush_multiplier
+
+        result = {
+            'quantity': q,
+            'size': f'{width}" x {height}"',
+            'sheets': sheets,
+            'text_paper': text_paper['display_name'],
+            'backing_paper': backing_paper['display_name'],
+            'page_content': page_content,
+            'unit_price': total / qf,
+            'total_cost': total,
+            'printing_setup_cost': np.full(q.size, float(base_setup)),
+            'finishing_setup_cost': np.full(q.size, float(finishing_setup)),
+            'total_setup_cost': np.full(q.size, float(total_setup)),
+            'production_cost': production_cost,
+            'material_cost': materials_cost_total,
+            'labor_cost': labor_cost_total,
+            'finishing_cost': labor_cost_total.copy(),
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'sheets_required': np.ceil(press_sheets_needed).astype(np.int64),
+            'imposition': imposition,
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_notepad_price(quantity, width, height, sheets, text_paper_code,
+                                                backing_paper_code, page_content,
+                                                printing_sides, rush_type)
+
+        return self._finalize(result, ('total_cost', 'printing_setup_cost', 'finishing_setup_cost',
+                                       'total_setup_cost', 'production_cost', 'material_cost',
+                                       'labor_cost', 'finishing_cost', 'subtotal'),
+                              2, scalar_price, q, PLAN_PARTS)
+
+    def calculate_poster_price_batch(self, quantities, material_code, width=None, height=None,
+                                     preset_size=None, rush_type='standard'):
+        """
+        Batch price for posters/large format (material cost only with volume discounts)
+        """
+        material = self.paper_stocks.get(material_code)
+        if not material:
+            return {'error': f'Material {material_code} not found'}
+
+        q, error = self._as_quantities(quantities, 'posters')
+        if error:
+            return error
+
+        if preset_size:
+            size_data = self.config['imposition_data']['posters'].get(preset_size)
+            if not size_data:
+                return {'error': f'Size {preset_size} not found for posters'}
+            square_footage = size_data['sqft']
+        else:
+            if not width or not height:
+                return {'error': 'Width and height required for custom size'}
+            if width < 6 or height < 6:
+                return {'error': 'Custom dimensions must be at least 6 inches'}
+
+            max_width = material.get('max_width', 54)
+            if width > max_width:
+                return {'error': f'Width cannot exceed {max_width} inches for this material'}
+
+            if height > 120:
+                return {'error': 'Height cannot exceed 120 inches'}
+
+            square_footage = (width * height) / 144
+
+            if square_footage > 50:
+                return {'error': 'Total area cannot exceed 50 square feet'}
+
+        charge_rate = material['charge_rate']
+        qf = q.astype(np.float64)
+        total_square_footage = square_footage * qf
+
+        discount = _tier_column(self.poster_tiers, total_square_footage, 'discount')
+        multiplier = _tier_column(self.poster_tiers, total_square_footage, 'multiplier')
+
+        material_cost_per_poster = square_footage * charge_rate * multiplier
+        total_material_cost = material_cost_per_poster * qf
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        subtotal = total_material_cost
+        total_cost = subtotal * rush_multiplier
+
+        original_material_cost = square_footage * charge_rate * qf
+        volume_savings = original_material_cost - total_material_cost
+
+        result = {
+            'quantity': q,
+            'printing_setup_cost': 0,
+            'finishing_setup_cost': 0,
+            'needs_finishing': False,
+            'production_cost': 0,
+            'material_cost': total_material_cost,
+            'finishing_cost': 0,
+            'subtotal': subtotal.copy(),
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'square_footage': round(square_footage, 1),
+            'total_square_footage': total_square_footage,
+            'material_rate': round(charge_rate, 2),
+            'material_used': material['display_name'],
+            'volume_discount': discount,
+            'volume_savings': volume_savings,
+            'config_version': self.snapshot.version
+        }
+
+        ties = _near_tie(total_square_footage, 1)
+        result['total_square_footage'] = np.round(total_square_footage, 1)
+        for i in np.flatnonzero(ties):
+            result['total_square_footage'][i] = round(square_footage * int(q[i]), 1)
+
+        def scalar_price(quantity):
+            return self.calculate_poster_price(quantity, material_code, width, height,
+                                               preset_size, rush_type)
+
+        return self._finalize(result, ('material_cost', 'subtotal', 'total_cost', 'volume_savings'),
+                              2, scalar_price, q, ('material_cost',))
+
+    def calculate_vinyl_sticker_price_batch(self, widths, heights, quantities, rush_type='standard'):
+        """
+        Batch price for one vinyl sticker order given as design columns:
+        every design's area, the order's square footage and its tier, then
+        every design's costs in one pass. Order totals and per-design
+        columns match calculate_vinyl_sticker_price to the cent.
+        """
+        w = np.asarray(widths, dtype=np.float64).ravel()
+        h = np.asarray(heights, dtype=np.float64).ravel()
+        q = np.asarray(quantities, dtype=np.int64).ravel()
+        if w.size == 0:
+            return {'error': 'At least one design is required'}
+        if not w.size == h.size == q.size:
+            return {'error': 'Widths, heights and quantities must have one entry per design'}
+
+        settings = self.snapshot.vinyl_stickers
+        checks = (
+            (~((w > 0) & (h > 0)), 'width and height required'),
+            (q < 1, 'quantity must be at least 1'),
+            (np.minimum(w, h) > settings['max_width'], f"one side must fit the {settings['max_width']} inch roll")
+        )
+        # The scalar path reports the first design that fails any check
+        failures = [(np.flatnonzero(bad)[0], message) for bad, message in checks if bad.any()]
+        if failures:
+            number, message = min(failures, key=lambda failure: failure[0])
+            return {'error': f'Design {number + 1}: {message}'}
+
+        qf = q.astype(np.float64)
+        square_footage = (w * h) / 144
+        if settings['sqft_digits'] is not None:
+            square_footage = _round_column(square_footage, settings['sqft_digits'])
+        design_square_footage = square_footage * qf
+        total_square_footage = round(math.fsum(design_square_footage), 6)
+        volume_discount = self.vinyl_tiers.lookup(total_square_footage)
+        charge_rate = settings['rate_per_sqft']
+        setup_fee = settings['setup_fee_per_design']
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        original_cost = square_footage * qf * charge_rate
+        costs = self._vinyl_costs_batch(original_cost * volume_discount['multiplier'], original_cost,
+                                        setup_fee, rush_multiplier, q)
+        cents = {field: int(np.rint(costs[field] * 100).astype(np.int64).sum()) for field in VINYL_MONEY_FIELDS}
+
+        total_quantity = int(q.sum())
+        return {
+            'designs': {
+                'width': w,
+                'height': h,
+                'quantity': q,
+                'square_footage': _round_column(square_footage, 3),
+                'total_square_footage': _round_column(design_square_footage, 2),
+                **costs
+            },
+            'design_count': int(w.size),
+            'total_quantity': total_quantity,
+            'total_square_footage': round(total_square_footage, 2),
+            'material_rate': round(charge_rate, 2),
+            'volume_discount': volume_discount['discount'],
+            'volume_discount_description': volume_discount.get('description'),
+            'discount_multiplier': volume_discount['multiplier'],
+            'material_cost': cents['material_cost'] / 100,
+            'setup_fees': cents['setup_fee'] / 100,
+            'subtotal': cents['subtotal'] / 100,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': cents['total_cost'] / 100,
+            'unit_price': round(cents['total_cost'] / 100 / total_quantity, 2),
+            'volume_savings': cents['volume_savings'] / 100,
+            'config_version': self.snapshot.version
+        }
+
+    def _vinyl_costs_batch(self, material, original, setup_fee, rush_multiplier, quantities):
+        """Vectorized _vinyl_costs over design columns"""
+        material_cost = _round_column(material, 2)
+        subtotal = _round_column(material_cost + setup_fee, 2)
+        total_cost = _round_column(subtotal * rush_multiplier, 2)
+        return {
+            'material_cost': material_cost,
+            'setup_fee': np.full(quantities.size, setup_fee),
+            'subtotal': subtotal,
+            'total_cost': total_cost,
+            'unit_price': _round_column(total_cost / quantities, 2),
+            'volume_savings': _round_column(_round_column(original, 2) - material_cost, 2)
+        }
+
+    def calculate_perfect_bound_price_batch(self, quantities, width, height, pages,
+                                            text_paper_code, cover_paper_code,
+                                            printing_sides='double-sided', rush_type='standard'):
+        """
+        Batch price for perfect bound books (4-500 pages)
+        """
+        constraints = self.config['product_constraints']['perfect-bound-books']
+
+        q, error = self._as_quantities(quantities, 'perfect-bound-books')
+        if error:
+            return error
+
+        if pages < constraints['min_pages'] or pages > constraints['max_pages']:
+            return {'error': f"Page count must be between {constraints['min_pages']} and {constraints['max_pages']}"}
+
+        if pages % constraints['page_multiple'] != 0:
+            return {'error': f"Page count must be in multiples of {constraints['page_multiple']}"}
+
+        text_paper = self.paper_stocks.get(text_paper_code)
+        cover_paper = self.paper_stocks.get(cover_paper_code)
+
+        if not text_paper or text_paper['type'] != 'text_stock':
+            return {'error': 'Please select a valid text paper'}
+
+        if not cover_paper or cover_paper['type'] != 'cover_stock':
+            return {'error': 'Please select a valid cover paper (cover stock required)'}
+
+        cover_weight = int(cover_paper['weight'].replace('#', ''))
+        if cover_weight < 80:
+            return {'error': 'Cover stock must be 80# or heavier for perfect binding'}
+
+        imposition_result = self.imposition_calc.calculate_imposition(width, height)
+        if imposition_result.get('error'):
+            return {'error': imposition_result['error']}
+
+        sides_multiplier = 2 if printing_sides == 'double-sided' else 1
+        clicks_per_sheet = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        pages_per_sheet = imposition_result['copies'] * sides_multiplier
+
+        interior_pages = pages - 4
+        interior_sheets = math.ceil(interior_pages / pages_per_sheet)
+        cover_sheets = 1
+        total_sheets = interior_sheets + cover_sheets
+
+        formula = self.config['formula']
+        product_formula = self.config['product_formulas']['perfect-bound-books']
+
+        S = formula['setup_fee'] * product_formula['setup_fee_multiplier']
+        F_setup = product_formula['finishing_setup_fee']
+        k = formula['base_production_rate']
+        e = formula['efficiency_exponent']
+
+        interior_cost = interior_sheets * text_paper['cost_per_sheet']
+        cover_cost = cover_sheets * cover_paper['cost_per_sheet']
+        interior_clicks = interior_sheets * clicks_per_sheet
+        cover_clicks = cover_sheets * 0.10
+        click_cost = interior_clicks + cover_clicks
+        v = (interior_cost + cover_cost + click_cost) * 1.25
+        f = self.config['finishing_costs']['perfect_binding']['base_labor']
+
+        qf = q.astype(np.float64)
+        S_total = qf * total_sheets
+        production_cost = np.power(S_total, e) * k
+        materials_cost = qf * v
+        finishing_cost = qf * f
+
+        subtotal = S + F_setup + production_cost + materials_cost + finishing_cost
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+        total_cost = subtotal * rush_multiplier
+
+        result = {
+            'printing_setup_cost': np.full(q.size, float(S)),
+            'finishing_setup_cost': np.full(q.size, float(F_setup)),
+            'production_cost': production_cost,
+            'material_cost': materials_cost,
+            'finishing_cost': finishing_cost,
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'sheets_required': total_sheets,
+            'size': f'{width}" x {height}"',
+            'text_paper': text_paper['display_name'],
+            'cover_paper': cover_paper['display_name'],
+            'pages': pages,
+            'quantity': q,
+            'interior_sheets': interior_sheets,
+            'cover_sheets': cover_sheets,
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_perfect_bound_price(quantity, width, height, pages,
+                                                      text_paper_code, cover_paper_code,
+                                                      printing_sides, rush_type)
+
+        return self._finalize(result, ('printing_setup_cost', 'finishing_setup_cost', 'production_cost',
+                                       'material_cost', 'finishing_cost', 'subtotal', 'total_cost'),
+                              3, scalar_price, q, PLAN_PARTS)
+
+    def calculate_envelope_price_batch(self, quantities, envelope_code, print_type='color',
+                                       rush_type='standard'):
+        """
+        Batch price for printed pre-made envelopes
+        """
+        if 'envelope_config' not in self.config:
+            return {'error': 'Envelope pricing is not configured'}
+        constraints = self.config['product_constraints']['envelopes']
+        q = np.asarray(quantities, dtype=np.int64).ravel()
+        if q.size == 0:
+            return {'error': 'At least one quantity is required'}
+        if q.min() < constraints['min_quantity']:
+            return {'error': f"Minimum quantity is {constraints['min_quantity']}"}
+        if q.max() > constraints['max_quantity']:
+            return {'error': f"Maximum quantity is {constraints['max_quantity']}. For larger orders, please contact us for a custom quote."}
+
+        envelope = self.paper_stocks.get(envelope_code)
+        if not envelope or envelope.get('type') != 'envelope_stock':
+            return {'error': 'Please select an envelope'}
+
+        rates = self.envelope_rates.get(print_type)
+        if rates is None:
+            return {'error': f'Print type {print_type} not found for envelopes'}
+
+        envelope_config = self.config['envelope_config']
+        setup_fee = envelope_config['setup_fee']
+        qf = q.astype(np.float64)
+        envelope_cost = envelope['cost_per_unit'] * qf * envelope_config['envelope_markup']
+
+        impression_rate = _tier_column(rates, qf)
+        printing_cost = impression_rate * qf
+
+        subtotal = setup_fee + envelope_cost + printing_cost
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+        total_cost = subtotal * rush_multiplier
+
+        result = {
+            'printing_setup_cost': round(setup_fee, 2),
+            'finishing_setup_cost': 0,
+            'needs_finishing': False,
+            'production_cost': 0,
+            'envelope_cost': envelope_cost,
+            'material_cost': envelope_cost.copy(),
+            'printing_cost': printing_cost,
+            'finishing_cost': 0,
+            'subtotal': subtotal,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'quantity': q,
+            'envelope_used': envelope['display_name'],
+            'envelope_size': envelope.get('envelope_size'),
+            'envelope_dimensions': envelope.get('dimensions'),
+            'print_type': print_type,
+            'impression_rate': np.round(impression_rate, 2),
+            'volume_discount': _tier_column(self.envelope_discounts, qf, 'discount'),
+            'envelope_cost_per_unit': round(envelope['cost_per_unit'], 4),
+            'envelope_cost_with_markup': round(envelope['cost_per_unit'] * envelope_config['envelope_markup'], 4),
+            'config_version': self.snapshot.version
+        }
+
+        def scalar_price(quantity):
+            return self.calculate_envelope_price(quantity, envelope_code, print_type, rush_type)
+
+        return self._finalize(result, ('envelope_cost', 'material_cost', 'printing_cost',
+                                       'subtotal', 'total_cost'),
+                              3, scalar_price, q, ('printing_setup_cost', 'envelope_cost', 'printing_cost'))
+
+    def _promo_price_batch(self, product_key, quantities, size, rush_type, scalar_price, offset):
+        product = self.promo_config['products'][product_key]
+        q = np.asarray(quantities, dtype=np.int64).ravel()
+        if q.size == 0:
+            return {'error': 'At least one quantity is required'}
+        if q.min() < product['min_quantity'] or q.max() > product['max_quantity']:
+            return {'error': f"Quantity must be between {product['min_quantity']} and {product['max_quantity']}"}
+        if np.any((q - offset) % product['step_quantity']):
+            # Let the scalar path produce the product's own step message
+            return scalar_price(int(q[np.flatnonzero((q - offset) % product['step_quantity'])[0]]))
+
+        curve = self._promo_curve(product_key, size)
+        if curve is None:
+            return scalar_price(int(q[0]))
+
+        qf = q.astype(np.float64)
+        supplier_cost = _curve_values(curve, qf)
+        price_after_markup = supplier_cost * (1 + product['markup_percentage'])
+        rush_multiplier = self.promo_config['pricing']['rush_multipliers'].get(rush_type, 1.0)
+        total_cost = price_after_markup * rush_multiplier
+
+        result = {
+            'quantity': q,
+            'size': size,
+            'supplier_cost': supplier_cost,
+            'markup': product['markup_percentage'],
+            'price_after_markup': price_after_markup,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cost,
+            'unit_price': total_cost / qf,
+            'config_version': self.snapshot.version
+        }
+        return self._finalize(result, ('supplier_cost', 'price_after_markup', 'total_cost'),
+                              3, scalar_price, q)
+
+    def calculate_magnet_price_batch(self, quantities, size, rush_type='standard'):
+        """
+        Batch price for outsourced magnets
+        """
+        def scalar_price(quantity):
+            return self.calculate_magnet_price(quantity, size, rush_type)
+
+        if 'magnets' not in self.promo_config['products']:
+            return {'error': 'Magnet pricing is not configured'}
+        min_quantity = self.promo_config['products']['magnets']['min_quantity']
+        return self._promo_price_batch('magnets', quantities, size, rush_type, scalar_price, min_quantity)
+
+    def calculate_sticker_price_batch(self, quantities, size, sticker_type=None, rush_type='standard'):
+        """
+        Batch price for outsourced stickers
+        """
+        def scalar_price(quantity):
+            return self.calculate_sticker_price(quantity, size, sticker_type, rush_type)
+
+        if 'stickers' not in self.promo_config['products']:
+            return {'error': 'Sticker pricing is not configured'}
+        result = self._promo_price_batch('stickers', quantities, size, rush_type, scalar_price, 0)
+        if 'error' not in result:
+            result['sticker_type'] = sticker_type
+        return result
+
+
+def _micros(values, size):
+    """Dollars to integer micro-cents, like money.to_micros"""
+    return np.broadcast_to(np.rint(np.asarray(values, dtype=np.float64) * MICROS_PER_DOLLAR), (size,)).astype(np.int64)
+
+
+def _divide(numerator, denominator, rule):
+    """Vectorized money.divide"""
+    quotient, remainder = np.divmod(np.abs(numerator), denominator)
+    twice = 2 * remainder
+    if rule == 'half_up':
+        quotient += twice >= denominator
+    elif rule == 'half_even':
+        quotient += (twice > denominator) | ((twice == denominator) & (quotient % 2 == 1))
+    elif rule == 'half_down':
+        quotient += twice > denominator
+    elif rule == 'up':
+        quotient += remainder > 0
+    return np.where(numerator < 0, -quotient, quotient)
+
+
+def _apply_rate(micros, rate):
+    """
+    Vectorized money.apply_rate for non-negative amounts. The product is split
+    as (whole * RATE_SCALE + rest) * rate so it cannot overflow int64.
+    """
+    whole, rest = np.divmod(micros, RATE_SCALE)
+    carried, remainder = np.divmod(rest * rate, RATE_SCALE)
+    result = whole * rate + carried
+    twice = 2 * remainder
+    return result + ((twice > RATE_SCALE) | ((twice == RATE_SCALE) & (result % 2 == 1)))
+
+
+def _allocate(parts, totals):
+    """Vectorized money.allocate over a (parts, rows) array"""
+    cents = parts // MICROS_PER_CENT
+    short = totals - cents.sum(axis=0)
+    order = np.argsort(-(parts - cents * MICROS_PER_CENT), axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(len(parts))[:, None], axis=0)
+    return cents + (ranks < short)
+
+
+class ExactBatchPricingCalculator(ExactPricingCalculator, BatchPricingCalculator):
+    """
+    BatchPricingCalculator with the exact money of ExactPricingCalculator:
+    the same micro-cent arithmetic and single rounding in int64 columns, so
+    batch and scalar results agree to the cent under every rounding rule.
+    Integer rounding has no near-tie cases, so no row is re-priced.
+    """
+
+    def _vinyl_costs_batch(self, material, original, setup_fee, rush_multiplier, quantities):
+        rule = self.rounding
+        size = quantities.size
+        parts = np.stack([_micros(material, size), _micros(setup_fee, size)])
+        subtotal = parts.sum(axis=0)
+        subtotal_cents = _divide(subtotal, MICROS_PER_CENT, rule)
+        material_cents, setup_cents = _allocate(parts, subtotal_cents)
+        total_cents = _divide(_apply_rate(subtotal, to_rate(rush_multiplier)), MICROS_PER_CENT, rule)
+        return {
+            'material_cost': material_cents / 100,
+            'setup_fee': setup_cents / 100,
+            'subtotal': subtotal_cents / 100,
+            'total_cost': total_cents / 100,
+            'unit_price': _divide(total_cents, quantities, rule) / 100,
+            'volume_savings': _divide(_micros(original, size) - parts[0], MICROS_PER_CENT, rule) / 100
+        }
+
+    def _finalize(self, result, money_columns, unit_digits, scalar_price, quantities, parts=()):
+        rule = self.rounding
+        size = quantities.size
+        micros = {column: _micros(result[column], size) for column in set(money_columns) | set(parts)}
+        rush = to_rate(result['rush_multiplier'])
+
+        if 'price_after_markup' in result:
+            # Outsourced products: supplier cost, markup and rush are applied in turn
+            price_after_markup = _apply_rate(micros['supplier_cost'], to_rate(1 + result['markup']))
+            total_cents = _divide(_apply_rate(price_after_markup, rush), MICROS_PER_CENT, rule)
+            cents = {
+                'supplier_cost': _divide(micros['supplier_cost'], MICROS_PER_CENT, rule),
+                'price_after_markup': _divide(price_after_markup, MICROS_PER_CENT, rule)
+            }
+        else:
+            part_micros = np.stack([micros[part] for part in parts])
+            subtotal = part_micros.sum(axis=0)
+            subtotal_cents = _divide(subtotal, MICROS_PER_CENT, rule)
+            total_cents = _divide(_apply_rate(subtotal, rush), MICROS_PER_CENT, rule)
+            cents = dict(zip(parts, _allocate(part_micros, subtotal_cents)))
+            cents['subtotal'] = subtotal_cents
+            # Columns that repeat a part (envelope material_cost, notepad
+            # labor_cost) show that part's allocated cents
+            for column in money_columns:
+                if column not in cents and column != 'total_cost':
+                    cents[column] = next((cents[part] for part in parts if np.array_equal(micros[column], micros[part])),
+                                         None)
+                    if cents[column] is None:
+                        cents[column] = _divide(micros[column], MICROS_PER_CENT, rule)
+        cents['total_cost'] = total_cents
+
+        for column, values in cents.items():
+            if column in money_columns or column in parts:
+                result[column] = values / 100
+        result['unit_price'] = _divide(total_cents * 10 ** (unit_digits - 2), quantities, rule) / 10 ** unit_digits
+        return result
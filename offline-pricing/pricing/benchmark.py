@@ -0,0 +1,281 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from functools import partial
+from itertools import cycle, islice
+
+from .calculator import PricingCalculator
+
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+GOLDEN_PATH = os.path.join(BENCHMARK_DIR, 'golden.json')
+
+# (name, calculator method, kwargs) - a realistic mix of what the site quotes
+SCENARIOS = [
+    ('flat_postcard_small', 'calculate_flat_print_price',
+     {'quantity': 25, 'width': 4, 'height': 6, 'paper_code': 'LYNOC95FSC'}),
+    ('flat_postcard_max', 'calculate_flat_print_price',
+     {'quantity': 5000, 'width': 4, 'height': 6, 'paper_code': 'LYNOC95FSC', 'rush_type': '2-day'}),
+    ('flat_name_tag_lanyard', 'calculate_flat_print_price',
+     {'quantity': 250, 'width': 3, 'height': 4, 'paper_code': 'PACDISC12413FSC', 'hole_punch': True, 'lanyard': True}),
+    ('flat_offgrid_size', 'calculate_flat_print_price',
+     {'quantity': 500, 'width': 2.33, 'height': 3, 'paper_code': 'LYNOC95FSC', 'printing_sides': 'single-sided'}),
+    ('folded_trifold', 'calculate_folded_print_price',
+     {'quantity': 1000, 'size': '8.5x11', 'paper_code': 'PACDIS42FSC', 'fold_type': 'trifold'}),
+    ('folded_table_tent', 'calculate_folded_print_price',
+     {'quantity': 50, 'size': '4x6', 'paper_code': 'LYNOC95FSC', 'fold_type': 'table-tent', 'rush_type': 'same-day'}),
+    ('booklet_self_cover', 'calculate_booklet_price',
+     {'quantity': 100, 'size': '5.5x8.5', 'pages': 16, 'cover_paper_code': 'SELF_COVER', 'text_paper_code': 'PACDIS42FSC'}),
+    ('booklet_max', 'calculate_booklet_price',
+     {'quantity': 1000, 'size': '8.5x11', 'pages': 48, 'cover_paper_code': 'PACDISC12413FSC', 'text_paper_code': 'LYNO416FSC'}),
+    ('notebook_coil', 'calculate_notebook_price',
+     {'quantity': 50, 'width': 8.5, 'height': 11, 'pages': 100, 'binding_type': 'plasticCoil',
+      'cover_paper_code': 'LYNOC95FSC', 'text_paper_code': 'LYNO416FSC', 'page_content': 'lined'}),
+    ('notepad_custom', 'calculate_notepad_price',
+     {'quantity': 200, 'width': 4, 'height': 6, 'sheets': 50, 'text_paper_code': 'LYNO416FSC',
+      'backing_paper_code': 'LYNOC95FSC', 'page_content': 'custom'}),
+    ('poster_preset', 'calculate_poster_price',
+     {'quantity': 10, 'material_code': 'LARGE_FORMAT_PAPER', 'preset_size': '24x36'}),
+    ('poster_custom', 'calculate_poster_price',
+     {'quantity': 3, 'material_code': 'LARGE_FORMAT_PET_VINYL', 'width': 33.5, 'height': 80, 'rush_type': 'next-day'}),
+    ('perfect_bound_500_pages', 'calculate_perfect_bound_price',
+     {'quantity': 100, 'width': 6, 'height': 9, 'pages': 500, 'text_paper_code': 'LYNO416FSC',
+      'cover_paper_code': 'PACDISC12413FSC'}),
+    ('perfect_bound_small', 'calculate_perfect_bound_price',
+     {'quantity': 5, 'width': 5.5, 'height': 8.5, 'pages': 48, 'text_paper_code': 'PACDIS42FSC',
+      'cover_paper_code': 'LYNOC95FSC', 'printing_sides': 'single-sided'}),
+    ('envelope_color', 'calculate_envelope_price',
+     {'quantity': 500, 'envelope_code': 'SUPX10WSFSC-S', 'print_type': 'color'}),
+    ('magnet_interpolated', 'calculate_magnet_price',
+     {'quantity': 175, 'size': '3x3'}),
+    ('sticker_interpolated', 'calculate_sticker_price',
+     {'quantity': 375, 'size': '2.5x2.5', 'sticker_type': 'vinyl-matte', 'rush_type': 'rush'}),
+]
+
+# Every scenario is also priced across this ladder for the golden corpus;
+# out-of-range quantities are included so error messages are pinned too.
+GOLDEN_QUANTITIES = (1, 5, 10, 24, 25, 26, 50, 99, 100, 101, 250, 499, 500, 1000, 2500, 4999, 5000, 5001)
+
+# Budget for the cold start below, in milliseconds (with the config snapshot built)
+COLD_START_BUDGET_MS = 10
+
+# Import plus first quote in a fresh interpreter, i.e. what a CLI run or a
+# serverless worker pays before it can answer
+COLD_START_SCRIPT = '''
+import time
+started = time.perf_counter()
+from pricing.calculator import PricingCalculator
+PricingCalculator().{method}(**{kwargs!r})
+print((time.perf_counter() - started) * 1000)
+'''
+
+
+# Fields that legitimately change without any price changing
+VOLATILE_FIELDS = ('config_version',)
+
+
+def _golden_cases():
+    for name, method, kwargs in SCENARIOS:
+        for quantity in GOLDEN_QUANTITIES:
+            yield f'{name}@{quantity}', method, {**kwargs, 'quantity': quantity}
+
+
+def build_golden(calculator):
+    """Price the golden corpus"""
+    return {key: getattr(calculator, method)(**kwargs) for key, method, kwargs in _golden_cases()}
+
+
+def check_golden(calculator, golden):
+    """Return a list of (case, field, expected, actual) for every difference"""
+    differences = []
+    actual = build_golden(calculator)
+    for key, expected in golden.items():
+        result = actual.get(key)
+        if result is None:
+            differences.append((key, None, expected, None))
+            continue
+        for field in sorted(set(expected) | set(result)):
+            if field in VOLATILE_FIELDS:
+                continue
+            if expected.get(field) != result.get(field):
+                differences.append((key, field, expected.get(field), result.get(field)))
+    return differences
+
+
+def measure(calculator, method, kwargs, number=2000, repeat=5):
+    """Best-of-repeat per-call latency plus peak traced allocation for one call"""
+    fn = getattr(calculator, method)
+    fn(**kwargs)
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(**kwargs)
+        best = min(best, (time.perf_counter() - started) / number)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    fn(**kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'latency_us': round(best * 1e6, 3),
+        'calls_per_sec': round(1 / best) if best else 0,
+        'peak_alloc_bytes': peak - baseline
+    }
+
+
+def measure_cold_start(runs=5):
+    """Best-of-runs milliseconds for `import pricing` plus the first quote"""
+    _, method, kwargs = SCENARIOS[0]
+    script = COLD_START_SCRIPT.format(method=method, kwargs=kwargs)
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(path for path in sys.path if path)}
+    best = float('inf')
+    for _ in range(runs):
+        completed = subprocess.run([sys.executable, '-c', script], env=env, capture_output=True,
+                                   text=True, check=True)
+        best = min(best, float(completed.stdout.strip().splitlines()[-1]))
+    return round(best, 3)
+
+
+def run_benchmarks(calculator=None, number=2000, repeat=5):
+    calculator = calculator or PricingCalculator()
+    results = {}
+    for name, method, kwargs in SCENARIOS:
+        results[name] = measure(calculator, method, kwargs, number, repeat)
+
+    imposition = calculator.imposition_calc
+    results['imposition_grid'] = measure(imposition, 'calculate_imposition',
+                                         {'trim_width': 8.5, 'trim_height': 11}, number, repeat)
+    results['imposition_offgrid'] = measure(imposition, 'calculate_imposition',
+                                            {'trim_width': 2.33, 'trim_height': 3.5}, number, repeat)
+    return results
+
+
+def _scaling_rows(count):
+    """count batch-format rows cycling through the scenarios"""
+    from .dispatch import PRODUCTS
+    products = {method: product for product, (method, _) in PRODUCTS.items()}
+    return [{'product_type': products[method], **kwargs}
+            for _, method, kwargs in islice(cycle(SCENARIOS), count)]
+
+
+def measure_scaling(rows=20000, workers=None, chunk_size=256):
+    """
+    Rows per second through price_many (threads sharing one warm calculator)
+    and price_rows (a process pool, one calculator per worker, pool start-up
+    included) at each worker count, with the speedup over one worker
+    """
+    from .bulk import price_many, price_rows
+
+    workers = workers or sorted({1, 2, 4, os.cpu_count() or 1})
+    data = _scaling_rows(rows)
+    calculator = PricingCalculator()
+    for _ in price_many(data[:len(SCENARIOS)], calculator, workers=1):
+        pass
+
+    results = {}
+    for kind, price in (('threads', partial(price_many, calculator=calculator)), ('processes', price_rows)):
+        runs = results[kind] = {}
+        single = None
+        for count in workers:
+            started = time.perf_counter()
+            for _ in price(data, workers=count, chunk_size=chunk_size):
+                pass
+            rate = rows / (time.perf_counter() - started)
+            single = single or rate
+            runs[count] = {'rows_per_sec': round(rate), 'speedup': round(rate / single, 2)}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Scenarios whose latency regressed more than threshold (a fraction) over baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and current['latency_us'] > previous['latency_us'] * (1 + threshold):
+            regressions.append((name, previous['latency_us'], current['latency_us']))
+    return regressions
+
+
+def _load(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def run_bench(args):
+    """Entry point for `python -m pricing bench`"""
+    calculator = PricingCalculator()
+
+    if args.record:
+        _save(args.golden, build_golden(calculator))
+        _save(args.baseline, run_benchmarks(calculator, args.number, args.repeat))
+        print(f'Recorded golden corpus to {args.golden} and baseline to {args.baseline}', file=sys.stderr)
+        return 0
+
+    if args.scaling:
+        # sys._is_gil_enabled is only there from 3.13; older builds always hold the GIL
+        gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+        print(f'{os.cpu_count()} CPUs, GIL {"enabled" if gil else "disabled"}, {args.scaling_rows} rows')
+        results = measure_scaling(args.scaling_rows)
+        print(f'{"workers":>7} {"threads rows/s":>15} {"speedup":>8} {"processes rows/s":>17} {"speedup":>8}')
+        for count, threads in results['threads'].items():
+            processes = results['processes'][count]
+            print(f'{count:>7} {threads["rows_per_sec"]:>15} {threads["speedup"]:>8} '
+                  f'{processes["rows_per_sec"]:>17} {processes["speedup"]:>8}')
+        return 0
+
+    # Both files are recorded per deployment (they depend on the config
+    # package and the machine), so a checkout has neither until --record
+    golden, baseline = _load(args.golden), _load(args.baseline)
+    missing = [path for path, data in ((args.golden, golden), (args.baseline, baseline)) if data is None]
+    if missing:
+        print(f'MISSING {" and ".join(missing)}; record with python -m pricing bench --record',
+              file=sys.stderr)
+        return 2
+
+    failed = False
+    differences = check_golden(calculator, golden)
+    for key, field, expected, actual in differences[:50]:
+        print(f'PRICE CHANGE {key} {field}: {expected!r} -> {actual!r}', file=sys.stderr)
+    if differences:
+        print(f'{len(differences)} golden differences', file=sys.stderr)
+        failed = True
+
+    results = run_benchmarks(calculator, args.number, args.repeat)
+
+    print(f'{"scenario":<28} {"latency_us":>11} {"baseline":>10} {"calls/sec":>11} {"peak_bytes":>11}')
+    for name, current in results.items():
+        previous = baseline.get(name, {}).get('latency_us', '-')
+        print(f'{name:<28} {current["latency_us"]:>11} {previous:>10} '
+              f'{current["calls_per_sec"]:>11} {current["peak_alloc_bytes"]:>11}')
+
+    for name, previous, current in compare(results, baseline, args.threshold):
+        print(f'REGRESSION {name}: {previous}us -> {current}us', file=sys.stderr)
+        failed = True
+
+    if args.cold_start_budget:
+        cold_start = measure_cold_start()
+        print(f'cold start (import + first quote): {cold_start}ms (budget {args.cold_start_budget}ms)')
+        if cold_start > args.cold_start_budget:
+            print(f'COLD START OVER BUDGET: {cold_start}ms > {args.cold_start_budget}ms '
+                  f'(is the config snapshot built? python -m pricing snapshot)', file=sys.stderr)
+            failed = True
+
+    return 1 if failed else 0
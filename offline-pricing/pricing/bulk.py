@@ -0,0 +1,215 @@
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from .calculator import PricingCalculator
+from .dispatch import normalize_request, price_normalized
+from .money import ExactPricingCalculator
+from .quote import price_quote_normalized
+
+
+PASSTHROUGH_FIELDS = ('id', 'quote_id', 'quote_number', 'sort_order')
+CSV_OUTPUT_FIELDS = ('row', 'id', 'quote_id', 'product_type', 'quantity', 'total_cost',
+                     'unit_price', 'subtotal', 'rush_multiplier', 'sheets_required', 'error')
+
+_worker_calculator = None
+
+
+def _init_worker(rounding=None):
+    global _worker_calculator
+    if rounding:
+        _worker_calculator = ExactPricingCalculator(rounding=rounding)
+    else:
+        _worker_calculator = PricingCalculator()
+
+
+def _price_chunk(chunk, grouped=False, configuration=False, calculator=None):
+    """
+    Price a chunk of (row_number, row) pairs with the given calculator
+    (default: this worker process's).
+    Grouped chunks are priced as one quote, so rows sharing a configuration
+    share its plan and identical quantities are evaluated once. With
+    configuration, priced rows carry their normalized options (for the
+    quote store).
+    """
+    if calculator is None:
+        if _worker_calculator is None:
+            _init_worker()
+        calculator = _worker_calculator
+    results = []
+    requests = []
+    for row_number, row in chunk:
+        if '_error' in row:
+            results.append({'row': row_number, 'error': row['_error']})
+            continue
+        result = {'row': row_number}
+        for field in PASSTHROUGH_FIELDS:
+            if row.get(field) not in (None, ''):
+                result[field] = row[field]
+        product, kwargs, error = normalize_request(row)
+        if error:
+            result.update(product_type=row.get('product_type'), quantity=row.get('quantity'), error=error)
+        else:
+            result.update(product_type=product, quantity=kwargs['quantity'])
+            if configuration:
+                result['configuration'] = {name: value for name, value in kwargs.items() if name != 'quantity'}
+            if grouped:
+                requests.append((result, (product, kwargs, None)))
+            else:
+                result.update(price_normalized(calculator, product, kwargs))
+        results.append(result)
+
+    if requests:
+        quote = price_quote_normalized(calculator, [request for _, request in requests])
+        for (result, _), price in zip(requests, quote['items']):
+            result.update(price)
+    return results
+
+
+def read_rows(stream, fmt):
+    """Yield input rows one at a time from a CSV or JSONL stream"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = {'_error': f'Invalid JSON on line {line_number}'}
+        yield row if isinstance(row, dict) else {'_error': f'Expected an object on line {line_number}'}
+
+
+def _chunks(rows, size):
+    numbered = enumerate(rows, 1)
+    while True:
+        chunk = list(islice(numbered, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def price_rows(rows, workers=None, chunk_size=256, max_pending=None, grouped=False, configuration=False,
+               rounding=None):
+    """
+    Price an iterable of rows, yielding results in input order.
+    Work is sharded in chunks across a process pool with one calculator per
+    worker; at most max_pending chunks are in flight, so memory stays flat
+    regardless of input size. With grouped, each chunk is priced as one
+    quote (see quote.price_quote_normalized); with configuration, priced
+    rows include their options. With a rounding rule, money is exact
+    (see money.ExactPricingCalculator).
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(rows, chunk_size)
+    price_chunk = partial(_price_chunk, grouped=grouped, configuration=configuration)
+
+    if workers == 1:
+        if _worker_calculator is None or getattr(_worker_calculator, 'rounding', None) != rounding:
+            _init_worker(rounding)
+        for chunk in chunks:
+            yield from price_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rounding,)) as pool:
+        yield from _in_order(pool, price_chunk, chunks, max_pending or workers * 4)
+
+
+def price_many(rows, calculator=None, workers=None, chunk_size=256, max_pending=None, grouped=False,
+               configuration=False, rounding=None):
+    """
+    Price an iterable of rows on a thread pool, yielding results in input
+    order. Every thread shares one calculator (the given one, or a new one
+    with the rounding rule), so there is one copy of the config and one set
+    of warm caches instead of one per process. Threads run in parallel on
+    free-threaded CPython (3.13t and later); under the GIL they interleave,
+    and price_rows is the one that uses more than one core. Options are as
+    for price_rows.
+    """
+    if calculator is None:
+        calculator = ExactPricingCalculator(rounding=rounding) if rounding else PricingCalculator()
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(rows, chunk_size)
+    price_chunk = partial(_price_chunk, grouped=grouped, configuration=configuration, calculator=calculator)
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from price_chunk(chunk)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pricing') as pool:
+        yield from _in_order(pool, price_chunk, chunks, max_pending or workers * 4)
+
+
+def _in_order(pool, price_chunk, chunks, max_pending):
+    """Run chunks on a pool, yielding their results in order with at most max_pending in flight"""
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(price_chunk, chunk))
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def write_results(results, stream, fmt):
+    """Stream results out as JSONL or CSV; returns (rows, errors)"""
+    rows = errors = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=CSV_OUTPUT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+            rows += 1
+            errors += 'error' in result
+    else:
+        for result in results:
+            stream.write(json.dumps(result, separators=(',', ':'), default=str) + '\n')
+            rows += 1
+            errors += 'error' in result
+    return rows, errors
+
+
+def _detect_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def run_batch(args):
+    """Entry point for `python -m pricing batch`"""
+    input_format = _detect_format(args.input, args.format)
+    output_format = _detect_format(args.output, args.output_format)
+
+    source = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8')
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    store = None
+    try:
+        rows = read_rows(source, input_format)
+        price = price_many if args.threads else price_rows
+        results = price(rows, workers=args.workers, chunk_size=args.chunk_size, grouped=args.grouped,
+                        configuration=bool(args.store), rounding=args.exact)
+        if args.store:
+            from .store import QuoteStore
+            store = QuoteStore(args.store)
+            results = store.record(results, batch_size=args.store_batch)
+        count, errors = write_results(results, sink, output_format)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+        if store:
+            store.close()
+
+    print(f'Priced {count} rows ({errors} errors)', file=sys.stderr)
+    if store:
+        print(f'Stored {store.written["stored"]} rows in {args.store}', file=sys.stderr)
+    return 1 if args.strict and errors else 0
@@ -1,24 +1,142 @@
 import math
 from .imposition import ImpositionCalculator
-from config.pricing_config import PRICING_CONFIG
-from config.paper_stocks import PAPER_STOCKS
+from .plans import PlanCompiler
+from .sizes import suggest_sizes
+from .solver import PricingSolver
+from .snapshot import default_store
+from .tiers import BracketCurve
+
+
+# Per-design money fields of a vinyl sticker order; the order totals are their sums
+VINYL_MONEY_FIELDS = ('material_cost', 'setup_fee', 'subtotal', 'total_cost', 'volume_savings')
 
 
 class PricingCalculator:
     """
-    Core pricing calculator that ports all 7 pricing functions from calculator.js
+    Core pricing calculator that ports the pricing functions from calculator.js
+    (plus the magnet/sticker bracket pricing from promoCalculator.js)
     Base Formula: C(Q) = (S + F_setup + S_total^e * k + Q * v + Q * f) * r
     """
 
-    def __init__(self):
+    def __init__(self, snapshot=None, store=None):
+        """
+        With no snapshot the calculator follows the process-wide config store
+        (or the given one) and picks up reloads; a fixed snapshot pins it
+        """
         self.imposition_calc = ImpositionCalculator()
-        self.config = PRICING_CONFIG
-        self.paper_stocks = PAPER_STOCKS
+        self._promo_curves = {}
+        if snapshot is not None:
+            self.store = None
+            self.snapshot = snapshot
+        else:
+            self.store = store or default_store()
+            # Sets self.snapshot under the store lock
+            self.store.subscribe(self)
+
+    def on_config_swap(self, old, new, changed):
+        """
+        Follow a config reload. Imposition depends only on the sheet
+        specification, so its caches survive; promo curves are dropped only
+        when the promo config changed.
+        """
+        self.snapshot = new
+        if 'promo' in changed:
+            self._promo_curves = {}
+
+    @property
+    def config(self):
+        return self.snapshot.config
+
+    @property
+    def promo_config(self):
+        return self.snapshot.promo_config
+
+    @property
+    def paper_stocks(self):
+        """Paper stocks, loaded from the snapshot on first access"""
+        return self.snapshot.paper_stocks
+
+    @property
+    def poster_tiers(self):
+        return self.snapshot.poster_tiers
+
+    @property
+    def vinyl_tiers(self):
+        return self.snapshot.vinyl_tiers
+
+    @property
+    def envelope_rates(self):
+        return self.snapshot.envelope_rates
+
+    @property
+    def envelope_discounts(self):
+        return self.snapshot.envelope_discounts
 
     def _get_rush_multiplier(self, rush_type):
         """Get rush multiplier from config"""
         return self.config['rush_multipliers'].get(rush_type, {}).get('multiplier', 1.0)
 
+    def compile_plan(self, product, *args, **options):
+        """
+        Compile a product configuration into an immutable PricingPlan.
+        Options are the arguments of the matching calculate_* method without
+        quantity; plan.price(quantity) then returns the calculate_* result of
+        this class (calculators with their own rounding, like exact money,
+        price a plan through _plan_breakdown instead).
+        """
+        return PlanCompiler(self).compile(product, *args, **options)
+
+    def _plan_breakdown(self, plan, quantity, costs, rush_multiplier):
+        """Round a plan's costs at one quantity into the calculate_* result (exact money overrides this)"""
+        return plan._breakdown(quantity, costs, rush_multiplier)
+
+    def _solver(self, product, options):
+        plan = self.compile_plan(product, **options)
+        if isinstance(plan, dict):
+            return None, plan
+        return PricingSolver(plan), None
+
+    def find_quantity_for_unit_price(self, product, target_unit_price, **options):
+        """
+        Minimal quantity whose unit price is at or below target_unit_price
+        """
+        solver, error = self._solver(product, options)
+        return error or solver.quantity_for_unit_price(target_unit_price)
+
+    def find_quantity_for_total_price(self, product, target_total_price, **options):
+        """
+        Minimal quantity whose total cost reaches target_total_price
+        """
+        solver, error = self._solver(product, options)
+        return error or solver.quantity_for_total_price(target_total_price)
+
+    def find_price_breaks(self, product, thresholds=(), **options):
+        """
+        List quantities where sheets_required (or the poster volume tier) steps
+        and where the unit price crosses any of the given thresholds
+        """
+        solver, error = self._solver(product, options)
+        return error or solver.price_breaks(thresholds)
+
+    def suggest_sizes(self, width, height, tolerance=0.2, limit=3, product='flat-prints',
+                      quantity=None, **options):
+        """
+        Nearest trim sizes within tolerance of width x height that fit more
+        copies per sheet; with a quantity and the product's options each one
+        also carries its price and the saving per unit
+        """
+        return suggest_sizes(self, width, height, tolerance, limit, product, quantity, **options)
+
+    def price_quote(self, items):
+        """
+        Price a multi-item quote or cart (rows in the bulk CLI / cart format),
+        sharing plan compilation and evaluation between items with the same
+        configuration; returns per-item results and quote totals
+        """
+        # Imported here to keep the row normalization (and json) off the cold-start path
+        from .quote import price_quote
+        return price_quote(self, items)
+
     def _parse_size_string(self, size_str):
         """Parse size strings like '4x6' or '8.5x11'"""
         parts = size_str.replace('"', '').replace("'", '').split('x')
@@ -92,7 +210,8 @@ class PricingCalculator:
             'sheets_required': S_total,
             'paper_used': paper['display_name'],
             'imposition': imposition,
-            'size': f'{width}"x{height}"'
+            'size': f'{width}"x{height}"',
+            'config_version': self.snapshot.version
         }
 
     def calculate_folded_print_price(self, quantity, size, paper_code,
@@ -165,7 +284,8 @@ class PricingCalculator:
             'sheets_required': S_total,
             'paper_used': paper['display_name'],
             'imposition': imposition,
-            'fold_type': fold_type
+            'fold_type': fold_type,
+            'config_version': self.snapshot.version
         }
 
     def calculate_booklet_price(self, quantity, size, pages, cover_paper_code,
@@ -260,7 +380,8 @@ class PricingCalculator:
             'cover_paper_used': 'Self Cover' if is_self_cover else cover_paper['display_name'],
             'text_paper_used': text_paper['display_name'],
             'pages': pages,
-            'imposition': imposition
+            'imposition': imposition,
+            'config_version': self.snapshot.version
         }
 
     def calculate_notebook_price(self, quantity, width, height, pages, binding_type,
@@ -340,7 +461,8 @@ class PricingCalculator:
             'binding_cost': round(binding_cost_total, 2),
             'subtotal': round(subtotal, 2),
             'rush_multiplier': rush_multiplier,
-            'imposition': imposition
+            'imposition': imposition,
+            'config_version': self.snapshot.version
         }
 
     def calculate_notepad_price(self, quantity, width, height, sheets, text_paper_code,
@@ -415,7 +537,8 @@ class PricingCalculator:
             'subtotal': round(subtotal, 2),
             'rush_multiplier': rush_multiplier,
             'sheets_required': math.ceil(press_sheets_needed),
-            'imposition': imposition
+            'imposition': imposition,
+            'config_version': self.snapshot.version
         }
 
     def calculate_poster_price(self, quantity, material_code, width=None, height=None,
@@ -457,11 +580,7 @@ class PricingCalculator:
         charge_rate = material['charge_rate']
         total_square_footage = square_footage * quantity
 
-        volume_discount = {'discount': 0, 'multiplier': 1.00}
-        for tier in self.config['large_format_volume_discounts']:
-            if tier['min_sqft'] <= total_square_footage <= tier['max_sqft']:
-                volume_discount = tier
-                break
+        volume_discount = self.poster_tiers.lookup(total_square_footage)
 
         material_cost_per_poster = square_footage * charge_rate * volume_discount['multiplier']
         total_material_cost = material_cost_per_poster * quantity
@@ -491,7 +610,95 @@ class PricingCalculator:
             'material_rate': round(charge_rate, 2),
             'material_used': material['display_name'],
             'volume_discount': volume_discount['discount'],
-            'volume_savings': round(volume_savings, 2)
+            'volume_savings': round(volume_savings, 2),
+            'config_version': self.snapshot.version
+        }
+
+    def calculate_vinyl_sticker_price(self, designs, rush_type='standard'):
+        """
+        Calculate price for an order of in-house vinyl stickers. Each design
+        ({'width', 'height', 'quantity'} in inches, plus an optional 'name')
+        pays its own setup fee and its square footage at the per-sqft rate;
+        the volume discount tier comes from the whole order's square footage.
+        """
+        if not designs:
+            return {'error': 'At least one design is required'}
+
+        settings = self.snapshot.vinyl_stickers
+        digits = settings['sqft_digits']
+        areas = []
+        for number, design in enumerate(designs, 1):
+            width, height, quantity = design.get('width'), design.get('height'), design.get('quantity')
+            if not width or not height or width < 0 or height < 0:
+                return {'error': f'Design {number}: width and height required'}
+            if not quantity or quantity < 1:
+                return {'error': f'Design {number}: quantity must be at least 1'}
+            if min(width, height) > settings['max_width']:
+                return {'error': f"Design {number}: one side must fit the {settings['max_width']} inch roll"}
+            square_footage = (width * height) / 144
+            areas.append(square_footage if digits is None else round(square_footage, digits))
+
+        # Rounded so float error in the sum cannot drop an order below a tier boundary
+        total_square_footage = round(math.fsum(area * design['quantity'] for area, design in zip(areas, designs)), 6)
+        volume_discount = self.vinyl_tiers.lookup(total_square_footage)
+        charge_rate = settings['rate_per_sqft']
+        setup_fee = settings['setup_fee_per_design']
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        lines = []
+        cents = dict.fromkeys(VINYL_MONEY_FIELDS, 0)
+        for square_footage, design in zip(areas, designs):
+            quantity = design['quantity']
+            original_cost = square_footage * quantity * charge_rate
+            costs = self._vinyl_costs(original_cost * volume_discount['multiplier'], original_cost,
+                                      setup_fee, rush_multiplier, quantity)
+            lines.append({
+                'name': design.get('name'),
+                'width': design['width'],
+                'height': design['height'],
+                'quantity': quantity,
+                'square_footage': round(square_footage, 3),
+                'total_square_footage': round(square_footage * quantity, 2),
+                **costs
+            })
+            for field in VINYL_MONEY_FIELDS:
+                cents[field] += round(costs[field] * 100)
+
+        total_quantity = sum(line['quantity'] for line in lines)
+        return {
+            'designs': lines,
+            'design_count': len(lines),
+            'total_quantity': total_quantity,
+            'total_square_footage': round(total_square_footage, 2),
+            'material_rate': round(charge_rate, 2),
+            'volume_discount': volume_discount['discount'],
+            'volume_discount_description': volume_discount.get('description'),
+            'discount_multiplier': volume_discount['multiplier'],
+            'material_cost': cents['material_cost'] / 100,
+            'setup_fees': cents['setup_fee'] / 100,
+            'subtotal': cents['subtotal'] / 100,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': cents['total_cost'] / 100,
+            'unit_price': round(cents['total_cost'] / 100 / total_quantity, 2),
+            'volume_savings': cents['volume_savings'] / 100,
+            'config_version': self.snapshot.version
+        }
+
+    def _vinyl_costs(self, material, original, setup_fee, rush_multiplier, quantity):
+        """
+        Money fields of one vinyl sticker design from its unrounded material
+        cost after and before the volume discount
+        """
+        material_cost = round(material, 2)
+        subtotal = round(material_cost + setup_fee, 2)
+        total_cost = round(subtotal * rush_multiplier, 2)
+        return {
+            'material_cost': material_cost,
+            'setup_fee': setup_fee,
+            'subtotal': subtotal,
+            'total_cost': total_cost,
+            'unit_price': round(total_cost / quantity, 2),
+            'volume_savings': round(round(original, 2) - material_cost, 2)
         }
 
     def calculate_perfect_bound_price(self, quantity, width, height, pages,
@@ -584,5 +791,146 @@ class PricingCalculator:
             'pages': pages,
             'quantity': quantity,
             'interior_sheets': interior_sheets,
-            'cover_sheets': cover_sheets
+            'cover_sheets': cover_sheets,
+            'config_version': self.snapshot.version
+        }
+
+    def calculate_envelope_price(self, quantity, envelope_code, print_type='color',
+                                 rush_type='standard'):
+        """
+        Calculate price for printed pre-made envelopes (Ricoh/Xante envelope printer):
+        setup + marked-up envelope cost + per-impression rate by volume tier
+        """
+        if 'envelope_config' not in self.config:
+            return {'error': 'Envelope pricing is not configured'}
+        constraints = self.config['product_constraints']['envelopes']
+        if quantity < constraints['min_quantity']:
+            return {'error': f"Minimum quantity is {constraints['min_quantity']}"}
+        if quantity > constraints['max_quantity']:
+            return {'error': f"Maximum quantity is {constraints['max_quantity']}. For larger orders, please contact us for a custom quote."}
+
+        envelope = self.paper_stocks.get(envelope_code)
+        if not envelope or envelope.get('type') != 'envelope_stock':
+            return {'error': 'Please select an envelope'}
+
+        rates = self.envelope_rates.get(print_type)
+        if rates is None:
+            return {'error': f'Print type {print_type} not found for envelopes'}
+
+        envelope_config = self.config['envelope_config']
+        envelope_cost = envelope['cost_per_unit'] * quantity * envelope_config['envelope_markup']
+
+        impression_rate = rates.lookup(quantity)
+        volume_discount = self.envelope_discounts.lookup(quantity)
+
+        rush_multiplier = self._get_rush_multiplier(rush_type)
+
+        return {
+            **self._envelope_costs(envelope_config['setup_fee'], envelope_cost,
+                                   impression_rate * quantity, rush_multiplier, quantity),
+            'quantity': quantity,
+            'envelope_used': envelope['display_name'],
+            'envelope_size': envelope.get('envelope_size'),
+            'envelope_dimensions': envelope.get('dimensions'),
+            'print_type': print_type,
+            'impression_rate': round(impression_rate, 2),
+            'volume_discount': volume_discount['discount'],
+            'volume_discount_description': volume_discount.get('description'),
+            'envelope_cost_per_unit': round(envelope['cost_per_unit'], 4),
+            'envelope_cost_with_markup': round(envelope['cost_per_unit'] * envelope_config['envelope_markup'], 4),
+            'config_version': self.snapshot.version
         }
+
+    def _envelope_costs(self, setup_fee, envelope_cost, printing_cost, rush_multiplier, quantity):
+        """
+        Money fields of an envelope order from its unrounded setup, envelope
+        and printing costs
+        """
+        subtotal = setup_fee + envelope_cost + printing_cost
+        total_cost = subtotal * rush_multiplier
+        unit_price = total_cost / quantity
+        return {
+            'printing_setup_cost': round(setup_fee, 2),
+            'finishing_setup_cost': 0,
+            'needs_finishing': False,
+            'production_cost': 0,
+            'envelope_cost': round(envelope_cost, 2),
+            'material_cost': round(envelope_cost, 2),
+            'printing_cost': round(printing_cost, 2),
+            'finishing_cost': 0,
+            'subtotal': round(subtotal, 2),
+            'rush_multiplier': rush_multiplier,
+            'total_cost': round(total_cost, 2),
+            'unit_price': round(unit_price, 3)
+        }
+
+    def _promo_curve(self, product_key, size):
+        """Supplier cost curve for one promo product size, built on first use"""
+        key = (product_key, size)
+        # Read before the config, as in ExactPricingCalculator._price_plan
+        curves = self._promo_curves
+        curve = curves.get(key)
+        if curve is None:
+            product = self.promo_config['products'][product_key]
+            costs = product['supplier_costs'].get(size)
+            if not costs:
+                return None
+            # Magnets extrapolate past the last bracket; stickers hold its cost
+            curve = curves.setdefault(key, BracketCurve(
+                product['quantity_brackets'], costs, extrapolate=product_key == 'magnets'))
+        return curve
+
+    def _promo_price(self, product_key, quantity, size, rush_type, supplier_cost):
+        product = self.promo_config['products'][product_key]
+        price_after_markup = supplier_cost * (1 + product['markup_percentage'])
+        rush_multiplier = self.promo_config['pricing']['rush_multipliers'].get(rush_type, 1.0)
+        total_cost = price_after_markup * rush_multiplier
+        return {
+            'quantity': quantity,
+            'size': size,
+            'supplier_cost': round(supplier_cost, 2),
+            'markup': product['markup_percentage'],
+            'price_after_markup': round(price_after_markup, 2),
+            'rush_multiplier': rush_multiplier,
+            'total_cost': round(total_cost, 2),
+            'unit_price': round(total_cost / quantity, 3),
+            'config_version': self.snapshot.version
+        }
+
+    def calculate_magnet_price(self, quantity, size, rush_type='standard'):
+        """
+        Calculate price for outsourced magnets: supplier cost interpolated
+        between quantity brackets, plus markup and rush
+        """
+        product = self.promo_config['products'].get('magnets')
+        if product is None:
+            return {'error': 'Magnet pricing is not configured'}
+        if quantity < product['min_quantity'] or quantity > product['max_quantity']:
+            return {'error': f"Quantity must be between {product['min_quantity']} and {product['max_quantity']}"}
+        if (quantity - product['min_quantity']) % product['step_quantity'] != 0:
+            return {'error': f"Quantity must be in increments of {product['step_quantity']} pieces (25, 30, 35, etc.)"}
+
+        curve = self._promo_curve('magnets', size)
+        if curve is None:
+            return {'error': 'Invalid size selected'}
+        return self._promo_price('magnets', quantity, size, rush_type, curve.value(quantity))
+
+    def calculate_sticker_price(self, quantity, size, sticker_type=None, rush_type='standard'):
+        """
+        Calculate price for outsourced stickers: supplier cost interpolated
+        between quantity brackets, plus markup and rush
+        """
+        product = self.promo_config['products'].get('stickers')
+        if product is None:
+            return {'error': 'Sticker pricing is not configured'}
+        if quantity < product['min_quantity'] or quantity > product['max_quantity']:
+            return {'error': f"Quantity must be between {product['min_quantity']} and {product['max_quantity']}"}
+        if quantity % product['step_quantity'] != 0:
+            return {'error': f"Quantity must be in increments of {product['step_quantity']} pieces"}
+
+        curve = self._promo_curve('stickers', size)
+        if curve is None:
+            return {'error': f'Invalid size: {size}'}
+        result = self._promo_price('stickers', quantity, size, rush_type, curve.value(quantity))
+        result['sticker_type'] = sticker_type
+        return result
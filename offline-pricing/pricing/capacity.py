@@ -0,0 +1,411 @@
+import heapq
+import json
+import math
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from .bulk import read_rows
+from .calculator import PricingCalculator
+from .consumption import _usage
+from .dispatch import compile_normalized, normalize_request, price_normalized
+
+
+# Shop floor model. Throughput figures are placeholders to be replaced with
+# the shop's measured rates (python -m pricing capacity --capacity FILE):
+# per_hour counts press impressions (sheet sides), square feet on the large
+# format printer, and finished pieces everywhere else. cure_minutes is glue
+# drying after the station, which holds the job but not the machine.
+DEFAULT_CAPACITY = {
+    'shift_start': '08:00',
+    'shift_end': '17:00',
+    'workdays': [0, 1, 2, 3, 4],
+    # Business days after the order day whose shift end is the due time
+    'rush_days': {'standard': 5, '2-day': 2, 'next-day': 1, 'same-day': 0},
+    'stations': {
+        'press': {'machines': 1, 'per_hour': 2400, 'setup_minutes': 10},
+        'large_format': {'machines': 1, 'per_hour': 400, 'setup_minutes': 5},
+        'folding': {'machines': 1, 'per_hour': 6000, 'setup_minutes': 15},
+        'saddle_stitch': {'machines': 1, 'per_hour': 900, 'setup_minutes': 20},
+        'perfect_binding': {'machines': 1, 'per_hour': 150, 'setup_minutes': 30, 'cure_minutes': 120},
+        'coil_binding': {'machines': 1, 'per_hour': 60, 'setup_minutes': 10},
+        'padding': {'machines': 1, 'per_hour': 120, 'setup_minutes': 10, 'cure_minutes': 60}
+    }
+}
+
+# Row field for where an open job is: not yet printed, printed and waiting
+# for finishing, or finished (skipped)
+STAGES = ('press', 'finishing', 'done')
+
+# Row fields giving when a job was ordered, in order of preference
+ORDERED_FIELDS = ('ordered_at', 'order_date', 'created_at')
+
+# Products whose calculate_* default is single-sided
+SINGLE_SIDED_DEFAULT = ('notepads',)
+
+
+def merge_capacity(overrides):
+    """DEFAULT_CAPACITY with overrides applied (stations merged one level down)"""
+    capacity = {**DEFAULT_CAPACITY, **overrides}
+    capacity['rush_days'] = {**DEFAULT_CAPACITY['rush_days'], **overrides.get('rush_days', {})}
+    capacity['stations'] = {name: {**DEFAULT_CAPACITY['stations'].get(name, {}), **station}
+                            for name, station in {**DEFAULT_CAPACITY['stations'],
+                                                  **overrides.get('stations', {})}.items()}
+    return capacity
+
+
+class ShiftCalendar:
+    """
+    Working time: one shift a day on the workdays. Times are mapped to
+    working minutes since a fixed Monday, so the gap between any two is
+    plain subtraction and the simulator never touches datetimes.
+    """
+
+    EPOCH = date(2001, 1, 1)
+
+    def __init__(self, shift_start, shift_end, workdays):
+        self.start = self._minutes(shift_start)
+        self.end = self._minutes(shift_end)
+        self.shift = self.end - self.start
+        self.workdays = sorted(workdays)
+        if self.shift <= 0 or not self.workdays:
+            raise ValueError('The shift must end after it starts, on at least one workday')
+
+    @staticmethod
+    def _minutes(clock):
+        hours, _, minutes = clock.partition(':')
+        return int(hours) * 60 + int(minutes or 0)
+
+    def working(self, moment):
+        """Working minutes from the epoch to a datetime"""
+        days = (moment.date() - self.EPOCH).days
+        weeks, weekday = divmod(days, 7)
+        elapsed = weeks * len(self.workdays) + sum(1 for day in self.workdays if day < weekday)
+        minutes = elapsed * self.shift
+        if weekday in self.workdays:
+            clock = moment.hour * 60 + moment.minute + moment.second / 60
+            minutes += min(max(clock - self.start, 0), self.shift)
+        return minutes
+
+    def moment(self, working):
+        """Datetime at working minutes from the epoch; a shift boundary is the end of the earlier day"""
+        days, minutes = divmod(working, self.shift)
+        if minutes == 0 and days:
+            days, minutes = days - 1, self.shift
+        weeks, index = divmod(int(days), len(self.workdays))
+        day = self.EPOCH + timedelta(days=weeks * 7 + self.workdays[index])
+        return datetime.combine(day, datetime.min.time()) + timedelta(minutes=self.start + minutes)
+
+    def due(self, ordered_at, business_days):
+        """Shift end business_days workdays after the order day (the next workday if it is not one)"""
+        day = ordered_at.date()
+        while day.weekday() not in self.workdays:
+            day += timedelta(days=1)
+        for _ in range(business_days):
+            day += timedelta(days=1)
+            while day.weekday() not in self.workdays:
+                day += timedelta(days=1)
+        return datetime.combine(day, datetime.min.time()) + timedelta(minutes=self.end)
+
+
+class Job:
+    """One open job: its route through the stations and due time, in working minutes"""
+
+    __slots__ = ('job_id', 'product', 'quantity', 'due', 'route')
+
+    def __init__(self, job_id, product, quantity, due, route):
+        self.job_id = job_id
+        self.product = product
+        self.quantity = quantity
+        self.due = due
+        self.route = route
+
+    def __repr__(self):
+        return f'Job({self.job_id!r}, {self.product!r}, quantity={self.quantity})'
+
+
+class CapacitySimulator:
+    """
+    Event-driven model of the press and finishing stations.
+
+    Each job is routed through a print station (the Indigo press, or the
+    large format printer for posters) and at most one finishing station.
+    Machines are dispatched earliest-due-date first and jobs are not
+    interrupted. Run time is setup plus quantity at the station's rate, with
+    press sheets taken from the compiled plan (the calculate_* sheet counts)
+    times the printed sides. Routes are computed once per configuration and
+    quantity, so re-simulating a queue of thousands of jobs is a heap walk.
+
+    rush_options() answers for a new quote which rush tiers can be met: the
+    job is added with each tier's due time and the queue re-simulated; a
+    tier is feasible when the job finishes by then without making any job
+    that was on time late.
+    """
+
+    def __init__(self, calculator=None, capacity=None, now=None):
+        self.calc = calculator or PricingCalculator()
+        self.capacity = merge_capacity(capacity or {})
+        self.stations = self.capacity['stations']
+        self.calendar = ShiftCalendar(self.capacity['shift_start'], self.capacity['shift_end'],
+                                      self.capacity['workdays'])
+        self.now = now or datetime.now().replace(microsecond=0)
+        self.origin = self.calendar.working(self.now)
+        self._routes = {}
+
+    # Jobs
+
+    def _minutes(self, station, amount):
+        rates = self.stations[station]
+        return rates.get('setup_minutes', 0) + amount / rates['per_hour'] * 60
+
+    def _route(self, product, kwargs):
+        """[(station, run minutes, cure minutes)] for a normalized request, or an error string"""
+        key = (product, tuple(sorted((name, value) for name, value in kwargs.items() if name != 'rush_type')))
+        route = self._routes.get(key)
+        if route is not None:
+            return route
+        quantity = kwargs['quantity']
+        options = {name: value for name, value in kwargs.items() if name not in ('quantity', 'rush_type')}
+        if product in ('magnets', 'stickers'):
+            # Made by the promo supplier, never on this floor
+            route = []
+        elif product == 'envelopes':
+            route = [('press', self._minutes('press', quantity), 0)]
+        else:
+            plan = compile_normalized(self.calc, product, kwargs)
+            if isinstance(plan, dict):
+                route = plan['error']
+            else:
+                route = []
+                sheets = square_feet = 0
+                for _, per_unit, divisor, unit in _usage(plan, options):
+                    if divisor is None:
+                        square_feet += quantity * per_unit
+                    else:
+                        sheets += math.ceil(quantity * per_unit / divisor)
+                if sheets:
+                    default = 'single-sided' if product in SINGLE_SIDED_DEFAULT else 'double-sided'
+                    sides = 2 if options.get('printing_sides', default) == 'double-sided' else 1
+                    route.append(('press', self._minutes('press', sheets * sides), 0))
+                if square_feet:
+                    route.append(('large_format', self._minutes('large_format', square_feet), 0))
+                station = self._finishing(product, options)
+                if station:
+                    route.append((station, self._minutes(station, quantity),
+                                  self.stations[station].get('cure_minutes', 0)))
+        self._routes[key] = route
+        return route
+
+    @staticmethod
+    def _finishing(product, options):
+        if product == 'folded-prints':
+            return 'folding' if options.get('fold_type', 'none') != 'none' else None
+        if product == 'booklets':
+            return 'saddle_stitch'
+        if product == 'perfect-bound-books':
+            return 'perfect_binding'
+        if product == 'notebooks':
+            return 'perfect_binding' if options.get('binding_type') == 'perfectBinding' else 'coil_binding'
+        if product == 'notepads':
+            return 'padding'
+        return None
+
+    def _ordered_at(self, row):
+        value = next((row[name] for name in ORDERED_FIELDS if row.get(name)), None)
+        return datetime.fromisoformat(str(value)) if value is not None else self.now
+
+    def due_for(self, rush_type, ordered_at=None):
+        """Due datetime of a rush tier for an order placed at ordered_at (default now)"""
+        return self.calendar.due(ordered_at or self.now, self.capacity['rush_days'][rush_type])
+
+    def job(self, row, job_id=None, rush_type=None):
+        """
+        A Job from a row in the bulk format plus 'due' (ISO datetime) or
+        rush_type and ordered_at, and optionally 'stage'; returns (job, error)
+        """
+        product, kwargs, error = normalize_request(row)
+        if error:
+            return None, error
+        route = self._route(product, kwargs)
+        if isinstance(route, str):
+            return None, route
+        stage = row.get('stage') or 'press'
+        if stage not in STAGES:
+            return None, f'Unknown stage {stage!r}'
+        if stage == 'done':
+            route = []
+        elif stage == 'finishing':
+            route = [step for step in route if step[0] not in ('press', 'large_format')]
+        rush_type = rush_type or kwargs.get('rush_type', 'standard')
+        try:
+            if row.get('due'):
+                due = datetime.fromisoformat(str(row['due']))
+            else:
+                due = self.due_for(rush_type, self._ordered_at(row))
+        except KeyError:
+            return None, f'Unknown rush type {rush_type}'
+        except ValueError as e:
+            return None, f'Invalid date: {e}'
+        job_id = job_id if job_id is not None else row.get('job_id', row.get('id'))
+        return Job(job_id, product, kwargs['quantity'], self.calendar.working(due) - self.origin, route), None
+
+    def load(self, rows):
+        """Jobs for the rows of an open job queue, and a Counter of rows that could not be loaded"""
+        jobs = []
+        errors = Counter()
+        for i, row in enumerate(rows):
+            job, error = self.job(row, row.get('job_id', row.get('id', i)))
+            if error:
+                errors[error] += 1
+            else:
+                jobs.append(job)
+        return jobs, errors
+
+    # Simulation
+
+    def simulate(self, jobs):
+        """
+        Completion time of each job in working minutes from now (0 for a
+        job with nothing left to do), in the order given
+        """
+        finish = [0.0] * len(jobs)
+        idle = {name: station.get('machines', 1) for name, station in self.stations.items()}
+        waiting = {name: [] for name in self.stations}
+        step = [0] * len(jobs)
+        # (time, kind, job): kind 0 is a machine finishing, 1 a job arriving;
+        # everything at one time is applied before machines are dispatched
+        events = []
+        for i, job in enumerate(jobs):
+            if job.route:
+                heapq.heappush(waiting[job.route[0][0]], (job.due, i))
+
+        now = 0.0
+        touched = set(name for name, queue in waiting.items() if queue)
+        while True:
+            for name in touched:
+                queue = waiting[name]
+                while idle[name] and queue:
+                    _, i = heapq.heappop(queue)
+                    idle[name] -= 1
+                    heapq.heappush(events, (now + jobs[i].route[step[i]][1], 0, i))
+            touched = set()
+            if not events:
+                return finish
+            now = events[0][0]
+            while events and events[0][0] == now:
+                _, kind, i = heapq.heappop(events)
+                route = jobs[i].route
+                if kind == 0:
+                    station, _, cure = route[step[i]]
+                    idle[station] += 1
+                    touched.add(station)
+                    step[i] += 1
+                    if step[i] == len(route):
+                        finish[i] = now + cure
+                    elif cure:
+                        heapq.heappush(events, (now + cure, 1, i))
+                    else:
+                        heapq.heappush(waiting[route[step[i]][0]], (jobs[i].due, i))
+                        touched.add(route[step[i]][0])
+                else:
+                    heapq.heappush(waiting[route[step[i]][0]], (jobs[i].due, i))
+                    touched.add(route[step[i]][0])
+
+    def _late(self, jobs, finish):
+        return {i for i, job in enumerate(jobs) if job.route and finish[i] > job.due + 1e-9}
+
+    def queue_report(self, jobs):
+        """Queue summary: late jobs and when each station clears"""
+        finish = self.simulate(jobs)
+        late = self._late(jobs, finish)
+        busy = Counter()
+        for job in jobs:
+            for station, minutes, _ in job.route:
+                busy[station] += minutes
+        return {
+            'now': self.now.isoformat(),
+            'jobs': len(jobs),
+            'clears_at': self._at(max(finish, default=0)),
+            'station_hours': {station: round(minutes / 60, 1) for station, minutes in sorted(busy.items())},
+            'late': [{'job_id': jobs[i].job_id, 'due': self._at(jobs[i].due), 'completes_at': self._at(finish[i])}
+                     for i in sorted(late, key=lambda i: jobs[i].due)]
+        }
+
+    def _at(self, minutes):
+        return self.calendar.moment(self.origin + minutes).isoformat(timespec='minutes')
+
+    def rush_options(self, jobs, row):
+        """
+        Per rush tier for a new job row: whether it is feasible, its due and
+        projected completion time, how many on-time jobs it would make late,
+        and its price
+        """
+        baseline = self._late(jobs, self.simulate(jobs))
+        product, kwargs, error = normalize_request(row)
+        if error:
+            return {'error': error}
+        tiers = {}
+        for rush_type in sorted(self.capacity['rush_days'], key=lambda tier: -self.capacity['rush_days'][tier]):
+            if rush_type not in self.calc.config['rush_multipliers']:
+                continue
+            job, error = self.job({**row, 'due': None, 'stage': None, 'ordered_at': self.now.isoformat()},
+                                  'new', rush_type)
+            if error:
+                return {'error': error}
+            queue = jobs + [job]
+            finish = self.simulate(queue)
+            completes = finish[-1]
+            bumped = len(self._late(queue, finish) - baseline - {len(jobs)})
+            price = price_normalized(self.calc, product, {**kwargs, 'rush_type': rush_type})
+            tiers[rush_type] = {
+                'feasible': completes <= job.due + 1e-9 and not bumped,
+                'due': self._at(job.due),
+                'completes_at': self._at(completes),
+                'slack_hours': round((job.due - completes) / 60, 1),
+                'bumped_jobs': bumped,
+                'rush_multiplier': price.get('rush_multiplier'),
+                'total_cost': price.get('total_cost'),
+                **({'price_error': price['error']} if 'error' in price else {})
+            }
+        feasible = [tier for tier, option in tiers.items() if option['feasible']]
+        return {'now': self.now.isoformat(), 'queue_jobs': len(jobs), 'tiers': tiers,
+                'fastest_feasible': feasible[-1] if feasible else None}
+
+
+def run_capacity(args):
+    """Entry point for `python -m pricing capacity`"""
+    started = time.perf_counter()
+    try:
+        capacity = {}
+        if args.capacity:
+            with open(args.capacity, encoding='utf-8') as f:
+                capacity = json.load(f)
+        simulator = CapacitySimulator(capacity=capacity,
+                                      now=datetime.fromisoformat(args.now) if args.now else None)
+        new_job = json.loads(args.job) if args.job else None
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    if new_job is not None and not isinstance(new_job, dict):
+        print('--job must be a JSON object', file=sys.stderr)
+        return 1
+
+    fmt = args.format or ('csv' if args.queue.lower().endswith('.csv') else 'jsonl')
+    with open(args.queue, newline='', encoding='utf-8') as stream:
+        jobs, errors = simulator.load(row for row in read_rows(stream, fmt) if '_error' not in row)
+
+    simulated = time.perf_counter()
+    report = simulator.rush_options(jobs, new_job) if new_job is not None else simulator.queue_report(jobs)
+    if errors:
+        report['queue_errors'] = dict(errors.most_common(10))
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    print(f'Loaded {len(jobs)} jobs ({sum(errors.values())} skipped) in {simulated - started:.2f}s, '
+          f'simulated in {time.perf_counter() - simulated:.3f}s', file=sys.stderr)
+    return 0
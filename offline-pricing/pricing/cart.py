@@ -0,0 +1,192 @@
+from collections import Counter
+
+from .calculator import PricingCalculator
+from .dispatch import DIRECT_PRODUCTS, compile_normalized, normalize_request, price_normalized
+
+
+# Cost components of one line item and what each is computed from, in
+# evaluation order. The line's own inputs are its options (everything except
+# quantity and rush type), quantity and rush_type.
+#   plan   paper, imposition and finishing lookups; setup S + F_setup, v, f
+#   costs  production S_total^e * k, material Q * v, finishing Q * f, subtotal
+#   rush   r
+#   total  subtotal * r and the rounded breakdown (the calculator's _plan_breakdown)
+# Production, material and finishing share their inputs (plan and quantity),
+# and each product sums them in its own order, so they are one node.
+COST_GRAPH = {
+    'plan': ('options',),
+    'costs': ('plan', 'quantity'),
+    'rush': ('rush_type',),
+    'total': ('costs', 'rush')
+}
+
+def _affected(graph, changed):
+    """Nodes downstream of an input or node, in evaluation order"""
+    affected = {changed}
+    for node, sources in graph.items():
+        if affected.intersection(sources):
+            affected.add(node)
+    return tuple(node for node in graph if node in affected)
+
+
+INVALIDATES = {name: _affected(COST_GRAPH, name) for name in ('options', 'quantity', 'rush_type')}
+
+
+class CartLine:
+    """One cart line item with the cached value of each cost node"""
+
+    __slots__ = ('item_id', 'product', 'options', 'quantity', 'rush_type',
+                 'plan', 'costs', 'rush', 'result', 'total_cents')
+
+    def __init__(self, item_id, product, options, quantity, rush_type):
+        self.item_id = item_id
+        self.product = product
+        self.options = options
+        self.quantity = quantity
+        self.rush_type = rush_type
+        self.plan = self.costs = self.rush = self.result = None
+        self.total_cents = 0
+
+    def __repr__(self):
+        return f'CartLine({self.item_id!r}, {self.product!r}, quantity={self.quantity})'
+
+
+class CartPricer:
+    """
+    Incremental pricing for a cart or quote being edited.
+
+    Each line keeps the cost nodes of COST_GRAPH; a change marks only the
+    nodes downstream of the input that changed. A rush change re-applies r
+    to the cached subtotal, a quantity change re-runs the arithmetic on the
+    cached plan without paper or imposition lookups, and an options change
+    recompiles the plan (shared between lines with identical options).
+    Line results equal those of calculate_*. The cart total is kept in
+    integer cents and adjusted by each line's difference.
+    """
+
+    def __init__(self, calculator=None):
+        self.calc = calculator or PricingCalculator()
+        self.lines = {}
+        self.recomputed = Counter()
+        self._plans = {}
+        self._version = self.calc.snapshot.version
+        self._total_cents = 0
+
+    def add(self, item_id, product, quantity, rush_type='standard', **options):
+        """Add (or replace) a line and return its price"""
+        if item_id in self.lines:
+            self.remove(item_id)
+        line = CartLine(item_id, product, options, quantity, rush_type)
+        self.lines[item_id] = line
+        return self._reprice(line, COST_GRAPH)
+
+    def add_row(self, row, item_id=None):
+        """Add a cart or quote_items row (browser field names, configuration JSON)"""
+        product, kwargs, error = normalize_request(row)
+        item_id = item_id if item_id is not None else row.get('id', len(self.lines))
+        if error:
+            return {'error': error}
+        return self.add(item_id, product, **kwargs)
+
+    def update(self, item_id, quantity=None, rush_type=None, **options):
+        """Change some inputs of a line; only the affected nodes are recomputed"""
+        line = self.lines[item_id]
+        dirty = set()
+        if quantity is not None and quantity != line.quantity:
+            line.quantity = quantity
+            dirty.update(INVALIDATES['quantity'])
+        if rush_type is not None and rush_type != line.rush_type:
+            line.rush_type = rush_type
+            dirty.update(INVALIDATES['rush_type'])
+        if options and any(line.options.get(name) != value for name, value in options.items()):
+            line.options = {**line.options, **options}
+            dirty.update(INVALIDATES['options'])
+        return self._reprice(line, dirty)
+
+    def set_rush(self, rush_type):
+        """Apply one rush type to every line"""
+        for line in self.lines.values():
+            self.update(line.item_id, rush_type=rush_type)
+        return self.totals()
+
+    def remove(self, item_id):
+        line = self.lines.pop(item_id)
+        self._total_cents -= line.total_cents
+
+    def refresh(self):
+        """Reprice everything if the pricing config was reloaded since the last change"""
+        if self.calc.snapshot.version == self._version:
+            return False
+        self._version = self.calc.snapshot.version
+        self._plans = {}
+        for line in self.lines.values():
+            self._reprice(line, COST_GRAPH, refresh=False)
+        return True
+
+    def totals(self):
+        self.refresh()
+        errors = sum(1 for line in self.lines.values() if 'error' in line.result)
+        return {
+            'items': len(self.lines),
+            'errors': errors,
+            'total_cost': self._total_cents / 100,
+            'config_version': self._version
+        }
+
+    def results(self):
+        """{item_id: price result} in cart order"""
+        self.refresh()
+        return {item_id: line.result for item_id, line in self.lines.items()}
+
+    def _reprice(self, line, dirty, refresh=True):
+        if refresh and self.refresh():
+            return line.result
+        if not dirty:
+            return line.result
+
+        if line.product in DIRECT_PRODUCTS:
+            self.recomputed['direct'] += 1
+            result = price_normalized(self.calc, line.product,
+                                      {**line.options, 'quantity': line.quantity,
+                                       'rush_type': line.rush_type})
+        else:
+            result = self._evaluate(line, dirty)
+
+        total_cents = 0 if 'error' in result else round(result['total_cost'] * 100)
+        self._total_cents += total_cents - line.total_cents
+        line.total_cents = total_cents
+        line.result = result
+        return result
+
+    def _evaluate(self, line, dirty):
+        recomputed = self.recomputed
+        if 'rush' in dirty:
+            recomputed['rush'] += 1
+            line.rush = self.calc._get_rush_multiplier(line.rush_type)
+        if 'plan' in dirty:
+            recomputed['plan'] += 1
+            line.plan = self._plan(line.product, line.options)
+        plan = line.plan
+        if isinstance(plan, dict):
+            return plan
+
+        if 'costs' in dirty:
+            recomputed['costs'] += 1
+            quantity = line.quantity
+            if quantity < plan.min_quantity or quantity > plan.max_quantity:
+                line.costs = {'error': f'Quantity must be between {plan.min_quantity} and {plan.max_quantity}'}
+            else:
+                line.costs = plan._costs(quantity)
+        if isinstance(line.costs, dict):
+            return line.costs
+
+        # Through the calculator's breakdown so exact-money calculators round their own way
+        recomputed['total'] += 1
+        return self.calc._plan_breakdown(plan, line.quantity, line.costs, line.rush)
+
+    def _plan(self, product, options):
+        key = (product, tuple(sorted(options.items())))
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = compile_normalized(self.calc, product, options)
+        return plan
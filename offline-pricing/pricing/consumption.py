@@ -0,0 +1,420 @@
+import csv
+import io
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from .bulk import read_rows
+from .calculator import PricingCalculator
+from .dispatch import compile_normalized, normalize_request
+from .plans import BookletPlan, NotebookPlan, NotepadPlan, PerfectBoundPlan, PosterPlan, SheetPlan
+
+
+# Bump when the saved state layout or the consumption rules change, so the
+# next run rebuilds from the full history instead of mixing the two
+STATE_FORMAT = 1
+STATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'build', 'consumption-state.json')
+
+# Rolling windows reported per paper, in days
+WINDOWS = (7, 30, 90)
+
+# Daily totals older than this are dropped when the state is saved
+RETENTION_DAYS = 400
+
+# Row fields giving the day a job consumes its stock, in order of preference;
+# rows without one count on the day they are read
+DATE_FIELDS = ('order_date', 'created_at', 'date')
+
+STORE_CHUNK_ROWS = 50000
+READ_BYTES = 4 * 1024 * 1024
+
+# Reorder policy used for any paper the stock file does not override
+STOCK_DEFAULTS = {'lead_time_days': 7, 'safety_days': 7, 'review_days': 30}
+
+
+def _usage(plan, options):
+    """
+    Stock a configuration consumes, as (paper_code, per_unit, divisor, unit)
+    parts: Q units take ceil(Q * per_unit / divisor) press sheets, following
+    the sheet counts of the calculate_* results, or Q * per_unit square feet
+    for roll media (divisor None)
+    """
+    if isinstance(plan, SheetPlan):
+        return ((options['paper_code'], 1, plan.imposition, 'sheets'),)
+    if isinstance(plan, BookletPlan):
+        parts = [(options['text_paper_code'], plan.text_sheets_per_booklet, 1, 'sheets')]
+        if plan.cover_sheets_per_booklet:
+            parts.append((options['cover_paper_code'], plan.cover_sheets_per_booklet, 1, 'sheets'))
+        return tuple(parts)
+    if isinstance(plan, NotebookPlan):
+        sides = 2 if options.get('printing_sides', 'double-sided') == 'double-sided' else 1
+        return ((options['cover_paper_code'], 1, plan.imposition, 'sheets'),
+                (options['text_paper_code'], options['pages'], plan.imposition * sides, 'sheets'))
+    if isinstance(plan, NotepadPlan):
+        return ((options['text_paper_code'], plan.sheets, plan.imposition, 'sheets'),
+                (options['backing_paper_code'], 1, plan.imposition, 'sheets'))
+    if isinstance(plan, PerfectBoundPlan):
+        return ((options['text_paper_code'], plan.total_sheets - 1, 1, 'sheets'),
+                (options['cover_paper_code'], 1, 1, 'sheets'))
+    if isinstance(plan, PosterPlan):
+        return ((options['material_code'], plan.square_footage, None, 'sqft'),)
+    return ()
+
+
+def _holt(values, alpha, beta):
+    """Level and per-day trend of a daily series by double exponential smoothing"""
+    if not values:
+        return 0.0, 0.0
+    level, trend = float(values[0]), 0.0
+    for value in values[1:]:
+        previous = level
+        level = alpha * value + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+    return level, trend
+
+
+def _demand(level, trend, start, days):
+    """Forecast consumption over forecast days start+1 .. start+days, never below zero"""
+    return sum(max(level + trend * day, 0.0) for day in range(start + 1, start + days + 1))
+
+
+def _amount(value, unit):
+    return round(value, 2) if unit == 'sqft' else round(value)
+
+
+class ConsumptionTracker:
+    """
+    Projected paper stock consumption from priced quotes or orders, kept as
+    daily totals per paper code and updated incrementally.
+
+    Each source (a quote store database or a CSV/JSONL file of rows in the
+    bulk format) remembers how far it has been read: the last quote_items
+    rowid, or the byte offset of the last complete line. update() reads only
+    what was added since, so the tracker can run every few minutes over a
+    year of history; a file that shrinks, or a store whose rows go back, is
+    read again from the start. Each configuration is compiled once and its
+    sheet counts come from the plan. The smoothing and windows are computed
+    from the daily totals at report time, so late rows for earlier days are
+    folded in too. Rows are counted once when first read, so a quote item
+    re-recorded under the same id is counted again.
+    """
+
+    def __init__(self, calculator=None, state=None):
+        self.calc = calculator or PricingCalculator()
+        self.state = state or {'format': STATE_FORMAT, 'sources': {}, 'units': {}}
+        self._usage = {}
+        self._days = {}
+        self._today = date.today().isoformat()
+
+    @classmethod
+    def load(cls, path=STATE_PATH, calculator=None):
+        """Tracker resuming from a saved state (a fresh one if missing or from another format)"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+        if state is not None and state.get('format') != STATE_FORMAT:
+            state = None
+        return cls(calculator, state)
+
+    def save(self, path=STATE_PATH, as_of=None):
+        """Atomically write the state, dropping daily totals older than RETENTION_DAYS"""
+        cutoff = ((as_of or date.today()) - timedelta(days=RETENTION_DAYS)).isoformat()
+        for source in self.state['sources'].values():
+            for paper, days in source['usage'].items():
+                for day in [day for day in days if day < cutoff]:
+                    del days[day]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, separators=(',', ':'))
+        os.replace(temporary, path)
+
+    def _source(self, path, kind, reset=False):
+        sources = self.state['sources']
+        source = sources.get(path)
+        if source is None or reset or source['kind'] != kind:
+            source = sources[path] = {'kind': kind, 'position': 0, 'header': None, 'identity': None,
+                                      'rows': 0, 'errors': {}, 'usage': {}}
+        return source
+
+    def _configuration(self, product, kwargs):
+        options = {name: value for name, value in kwargs.items() if name not in ('quantity', 'rush_type')}
+        key = (product, tuple(sorted(options.items())))
+        usage = self._usage.get(key)
+        if usage is None:
+            if product == 'envelopes':
+                code = options.get('envelope_code')
+                usage = (((code, 1, 1, 'envelopes'),) if code in self.calc.paper_stocks
+                         else 'Please select an envelope')
+            elif product in ('magnets', 'stickers'):
+                # Bought in from the promo supplier, not printed from stock
+                usage = ()
+            else:
+                plan = compile_normalized(self.calc, product, kwargs)
+                usage = plan['error'] if isinstance(plan, dict) else _usage(plan, options)
+            self._usage[key] = usage
+        return usage
+
+    def _day(self, row):
+        value = next((row[name] for name in DATE_FIELDS if row.get(name)), None)
+        if value is None:
+            return self._today
+        value = str(value)[:10]
+        day = self._days.get(value)
+        if day is None:
+            try:
+                day = self._days[value] = date.fromisoformat(value).isoformat()
+            except ValueError:
+                return None
+        return day
+
+    def add(self, rows, source):
+        """Fold rows (bulk CLI / quote_items format) into a source's daily totals"""
+        usage_by_paper = source['usage']
+        units = self.state['units']
+        errors = Counter()
+        for row in rows:
+            source['rows'] += 1
+            if '_error' in row:
+                errors[row['_error'].split(' on line ')[0]] += 1
+                continue
+            product, kwargs, error = normalize_request(row)
+            if error:
+                errors[error] += 1
+                continue
+            usage = self._configuration(product, kwargs)
+            if isinstance(usage, str):
+                errors[usage] += 1
+                continue
+            day = self._day(row)
+            if day is None:
+                errors['Invalid date'] += 1
+                continue
+            quantity = kwargs['quantity']
+            for paper, per_unit, divisor, unit in usage:
+                amount = quantity * per_unit if divisor is None else math.ceil(quantity * per_unit / divisor)
+                days = usage_by_paper.get(paper)
+                if days is None:
+                    days = usage_by_paper[paper] = {}
+                    units[paper] = unit
+                days[day] = days.get(day, 0) + amount
+        for error, count in errors.items():
+            source['errors'][error] = source['errors'].get(error, 0) + count
+
+    def update(self, path, fmt=None):
+        """Read what was added to a source since the last update; returns the number of new rows"""
+        path = os.path.abspath(path)
+        if path.endswith(('.db', '.sqlite', '.sqlite3')):
+            return self._update_store(path)
+        return self._update_file(path, fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl'))
+
+    def _update_store(self, path):
+        connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            last = connection.execute('SELECT max(rowid) FROM quote_items').fetchone()[0] or 0
+            source = self._source(path, 'store')
+            if last < source['position']:
+                source = self._source(path, 'store', reset=True)
+            before = source['rows']
+            cursor = connection.execute(
+                'SELECT rowid, product_type, quantity, configuration, created_at FROM quote_items '
+                'WHERE rowid > ? ORDER BY rowid', (source['position'],))
+            while True:
+                batch = cursor.fetchmany(STORE_CHUNK_ROWS)
+                if not batch:
+                    break
+                self.add(({'product_type': product, 'quantity': quantity, 'configuration': configuration,
+                           'created_at': created_at} for _, product, quantity, configuration, created_at in batch),
+                         source)
+                source['position'] = batch[-1][0]
+            return source['rows'] - before
+        finally:
+            connection.close()
+
+    def _update_file(self, path, fmt):
+        stat = os.stat(path)
+        source = self._source(path, fmt)
+        identity = [stat.st_dev, stat.st_ino]
+        if stat.st_size < source['position'] or (source['identity'] and source['identity'] != identity):
+            source = self._source(path, fmt, reset=True)
+        source['identity'] = identity
+        before = source['rows']
+        with open(path, 'rb') as f:
+            f.seek(source['position'])
+            pending = b''
+            while True:
+                data = f.read(READ_BYTES)
+                if not data:
+                    break
+                pending += data
+                # Only whole lines; a line still being appended waits for the next update
+                end = pending.rfind(b'\n') + 1
+                if not end:
+                    continue
+                text = pending[:end].decode('utf-8-sig' if source['position'] == 0 else 'utf-8')
+                source['position'] += end
+                pending = pending[end:]
+                if fmt == 'csv':
+                    if source['header'] is None:
+                        header, _, text = text.partition('\n')
+                        source['header'] = next(csv.reader([header]))
+                    rows = csv.DictReader(io.StringIO(text, newline=''), fieldnames=source['header'])
+                else:
+                    rows = read_rows(io.StringIO(text), 'jsonl')
+                self.add(rows, source)
+        return source['rows'] - before
+
+    def daily(self):
+        """Daily totals per paper over every source: {paper_code: {day: amount}}"""
+        merged = {}
+        for source in self.state['sources'].values():
+            for paper, days in source['usage'].items():
+                totals = merged.setdefault(paper, {})
+                for day, amount in days.items():
+                    totals[day] = totals.get(day, 0) + amount
+        return merged
+
+    def report(self, as_of=None, stock=None, alpha=0.3, beta=0.1, horizon=30, daily=False):
+        """
+        Per paper: totals over the rolling windows ending the day before
+        as_of, consumption so far on as_of, a forecast from double
+        exponential smoothing of the daily totals (alpha for the level, beta
+        for the trend), and with stock levels the reorder alerts.
+
+        stock maps paper codes to {'on_hand', 'counted_at', 'lead_time_days',
+        'safety_days', 'review_days', 'reorder_point'}; all but on_hand are
+        optional, with STOCK_DEFAULTS or stock['defaults'] for the policy.
+        Consumption on and after counted_at is taken off on_hand.
+        """
+        as_of = as_of or date.today()
+        last_day = as_of - timedelta(days=1)
+        today = as_of.isoformat()
+        units = self.state['units']
+        papers = {}
+        forecasts = {}
+        for paper, days in sorted(self.daily().items()):
+            unit = units.get(paper, 'sheets')
+            start = date.fromisoformat(min(days))
+            values = [days.get((start + timedelta(days=i)).isoformat(), 0)
+                      for i in range((last_day - start).days + 1)]
+            level, trend = _holt(values, alpha, beta)
+            forecasts[paper] = (level, trend)
+            entry = {
+                'name': self.calc.paper_stocks.get(paper, {}).get('display_name', paper),
+                'unit': unit,
+                'first_day': start.isoformat(),
+                'today': _amount(days.get(today, 0), unit)
+            }
+            for window in WINDOWS:
+                entry[f'last_{window}_days'] = _amount(sum(values[-window:]), unit)
+            entry['daily_average_30'] = round(sum(values[-30:]) / min(30, len(values)), 2) if values else 0
+            entry['forecast_daily'] = round(max(level + trend, 0.0), 2)
+            entry['trend_daily'] = round(trend, 3)
+            entry[f'forecast_{horizon}_days'] = _amount(_demand(level, trend, 0, horizon), unit)
+            if daily:
+                entry['daily'] = {day: _amount(amount, unit) for day, amount in sorted(days.items())
+                                  if day >= (as_of - timedelta(days=max(WINDOWS))).isoformat()}
+            papers[paper] = entry
+
+        report = {'as_of': today, 'alpha': alpha, 'beta': beta, 'horizon_days': horizon,
+                  'papers': papers, 'sources': self._source_summary()}
+        if stock is not None:
+            report['alerts'] = self._alerts(stock, forecasts, as_of)
+        return report
+
+    def _source_summary(self):
+        return {path: {'kind': source['kind'], 'rows': source['rows'],
+                       'errors': dict(Counter(source['errors']).most_common(10))}
+                for path, source in self.state['sources'].items()}
+
+    def _alerts(self, stock, forecasts, as_of):
+        """Reorder alerts for papers whose projected stock is at or below their reorder point"""
+        defaults = {**STOCK_DEFAULTS, **stock.get('defaults', {})}
+        daily = self.daily()
+        units = self.state['units']
+        today = as_of.isoformat()
+        alerts = []
+        for paper, levels in sorted(stock.items()):
+            if paper == 'defaults':
+                continue
+            policy = {**defaults, **levels}
+            unit = units.get(paper, 'sheets')
+            counted_at = policy.get('counted_at')
+            used = sum(amount for day, amount in daily.get(paper, {}).items()
+                       if counted_at and counted_at[:10] <= day <= today)
+            on_hand = policy['on_hand'] - used
+            level, trend = forecasts.get(paper, (0.0, 0.0))
+            lead_time = policy['lead_time_days']
+            lead_demand = _demand(level, trend, 0, lead_time)
+            safety = policy['safety_days'] * max(level, 0.0)
+            reorder_point = policy.get('reorder_point', lead_demand + safety)
+            if on_hand > reorder_point:
+                continue
+            rate = max(level + trend, 0.0)
+            alerts.append({
+                'paper_code': paper,
+                'name': self.calc.paper_stocks.get(paper, {}).get('display_name', paper),
+                'unit': unit,
+                'severity': 'stockout' if on_hand <= 0 else 'reorder',
+                'projected_on_hand': _amount(on_hand, unit),
+                'reorder_point': _amount(reorder_point, unit),
+                'days_of_cover': round(max(on_hand, 0) / rate, 1) if rate > 0 else None,
+                'suggested_order': max(math.ceil(_demand(level, trend, 0, lead_time + policy['review_days'])
+                                                 + safety - on_hand), 0)
+            })
+        return alerts
+
+
+def read_stock(path):
+    """Stock levels file: JSON {paper_code: {'on_hand': ..., ...}, 'defaults': {...}}"""
+    with open(path, encoding='utf-8') as f:
+        stock = json.load(f)
+    if not isinstance(stock, dict):
+        raise ValueError(f'{path}: expected a JSON object of paper codes')
+    for paper, levels in stock.items():
+        if paper != 'defaults' and not (isinstance(levels, dict) and 'on_hand' in levels):
+            raise ValueError(f'{path}: {paper} needs an on_hand stock level')
+    return stock
+
+
+def run_consumption(args):
+    """Entry point for `python -m pricing consumption`"""
+    started = time.perf_counter()
+    try:
+        as_of = date.fromisoformat(args.as_of) if args.as_of else None
+        stock = read_stock(args.stock) if args.stock else None
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    tracker = ConsumptionTracker() if args.rebuild else ConsumptionTracker.load(args.state)
+    new_rows = 0
+    for path in args.sources:
+        try:
+            new_rows += tracker.update(path, args.format)
+        except (OSError, sqlite3.Error) as e:
+            print(f'{path}: {e}', file=sys.stderr)
+            return 1
+    tracker.save(args.state, as_of)
+
+    report = tracker.report(as_of, stock, args.alpha, args.beta, args.horizon, args.daily)
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    total_rows = sum(source['rows'] for source in tracker.state['sources'].values())
+    print(f'Read {new_rows} new rows ({total_rows} total) in {time.perf_counter() - started:.1f}s: '
+          f'{len(report["papers"])} papers, {len(report.get("alerts", ()))} reorder alerts',
+          file=sys.stderr)
+    return 0
@@ -0,0 +1,166 @@
+import json
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+    return bool(value)
+
+
+def _number(value):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+# product -> (calculator method, {keyword: coercion})
+PRODUCTS = {
+    'flat-prints': ('calculate_flat_print_price', {
+        'quantity': int, 'width': _number, 'height': _number, 'paper_code': str,
+        'printing_sides': str, 'hole_punch': _bool, 'lanyard': _bool, 'rush_type': str
+    }),
+    'folded-prints': ('calculate_folded_print_price', {
+        'quantity': int, 'size': str, 'paper_code': str, 'fold_type': str,
+        'printing_sides': str, 'rush_type': str
+    }),
+    'booklets': ('calculate_booklet_price', {
+        'quantity': int, 'size': str, 'pages': int, 'cover_paper_code': str,
+        'text_paper_code': str, 'printing_sides': str, 'rush_type': str
+    }),
+    'notebooks': ('calculate_notebook_price', {
+        'quantity': int, 'width': _number, 'height': _number, 'pages': int, 'binding_type': str,
+        'cover_paper_code': str, 'text_paper_code': str, 'page_content': str,
+        'printing_sides': str, 'rush_type': str
+    }),
+    'notepads': ('calculate_notepad_price', {
+        'quantity': int, 'width': _number, 'height': _number, 'sheets': int,
+        'text_paper_code': str, 'backing_paper_code': str, 'page_content': str,
+        'printing_sides': str, 'rush_type': str
+    }),
+    'posters': ('calculate_poster_price', {
+        'quantity': int, 'material_code': str, 'width': _number, 'height': _number,
+        'preset_size': str, 'rush_type': str
+    }),
+    'perfect-bound-books': ('calculate_perfect_bound_price', {
+        'quantity': int, 'width': _number, 'height': _number, 'pages': int,
+        'text_paper_code': str, 'cover_paper_code': str, 'printing_sides': str, 'rush_type': str
+    }),
+    'envelopes': ('calculate_envelope_price', {
+        'quantity': int, 'envelope_code': str, 'print_type': str, 'rush_type': str
+    }),
+    'magnets': ('calculate_magnet_price', {
+        'quantity': int, 'size': str, 'rush_type': str
+    }),
+    'stickers': ('calculate_sticker_price', {
+        'quantity': int, 'size': str, 'sticker_type': str, 'rush_type': str
+    })
+}
+
+# Priced in one piece through calculate_*: these have no compiled plan
+DIRECT_PRODUCTS = frozenset({'envelopes', 'magnets', 'stickers'})
+
+# Keyword arguments that identify the paper, in order of preference
+PAPER_ARGUMENTS = ('paper_code', 'text_paper_code', 'cover_paper_code', 'material_code', 'envelope_code')
+
+# Legacy product slugs from pricingConfig.js map onto the streamlined categories
+PRODUCT_ALIASES = {
+    'postcards': 'flat-prints',
+    'flyers': 'flat-prints',
+    'bookmarks': 'flat-prints',
+    'name-tags': 'flat-prints',
+    'brochures': 'folded-prints',
+    'table-tents': 'folded-prints'
+}
+
+# Form field names used by the browser calculators and cart configurations
+FIELD_ALIASES = {
+    'productType': 'product_type',
+    'product': 'product_type',
+    'customWidth': 'width',
+    'customHeight': 'height',
+    'paperType': 'paper_code',
+    'paper': 'paper_code',
+    'coverPaper': 'cover_paper_code',
+    'coverPaperType': 'cover_paper_code',
+    'textPaper': 'text_paper_code',
+    'textPaperType': 'text_paper_code',
+    'backingPaper': 'backing_paper_code',
+    'material': 'material_code',
+    'presetSize': 'preset_size',
+    'printingSides': 'printing_sides',
+    'holePunch': 'hole_punch',
+    'foldType': 'fold_type',
+    'bindingType': 'binding_type',
+    'pageContent': 'page_content',
+    'envelopeStock': 'envelope_code',
+    'printType': 'print_type',
+    'stickerType': 'sticker_type',
+    'rushType': 'rush_type'
+}
+
+
+def normalize_request(row):
+    """
+    Turn a loosely typed row (CSV strings, JSON, quote_items with a
+    configuration column) into (product, kwargs) for the calculator.
+    Returns (None, None, error) when the row cannot be priced.
+    """
+    fields = {}
+    configuration = row.get('configuration')
+    if isinstance(configuration, str) and configuration.strip():
+        try:
+            configuration = json.loads(configuration)
+        except ValueError:
+            return None, None, 'Invalid configuration JSON'
+    if isinstance(configuration, dict):
+        fields.update(configuration)
+    fields.update((k, v) for k, v in row.items() if k != 'configuration')
+
+    fields = {FIELD_ALIASES.get(k, k): v for k, v in fields.items()}
+    product = fields.get('product_type')
+    product = PRODUCT_ALIASES.get(product, product)
+    if product not in PRODUCTS:
+        return None, None, f'Unknown product type {product}'
+
+    params = PRODUCTS[product][1]
+    kwargs = {}
+    for name, coerce in params.items():
+        value = fields.get(name)
+        if value is None or value == '':
+            continue
+        try:
+            kwargs[name] = coerce(value)
+        except (TypeError, ValueError):
+            return None, None, f'Invalid value for {name}: {value!r}'
+
+    if 'quantity' not in kwargs:
+        return None, None, 'Quantity is required'
+    return product, kwargs, None
+
+
+def price_request(calculator, row):
+    """Price one row through the matching calculate_* method"""
+    product, kwargs, error = normalize_request(row)
+    if error:
+        return {'error': error}
+    return price_normalized(calculator, product, kwargs)
+
+
+def price_normalized(calculator, product, kwargs):
+    """Price an already normalized (product, kwargs) request"""
+    try:
+        return getattr(calculator, PRODUCTS[product][0])(**kwargs)
+    except TypeError as e:
+        return {'error': f'Missing or unexpected option: {e}'}
+    except (ValueError, ZeroDivisionError, KeyError) as e:
+        return {'error': f'Unable to price {product}: {e}'}
+
+
+def compile_normalized(calculator, product, kwargs):
+    """Compile a PricingPlan for a normalized request without its quantity and rush type"""
+    options = {name: value for name, value in kwargs.items() if name not in ('quantity', 'rush_type')}
+    try:
+        return calculator.compile_plan(product, **options)
+    except TypeError as e:
+        return {'error': f'Missing or unexpected option: {e}'}
+    except (ValueError, ZeroDivisionError, KeyError) as e:
+        return {'error': f'Unable to price {product}: {e}'}
@@ -0,0 +1,327 @@
+import heapq
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+
+from .bulk import _detect_format, read_rows
+from .calculator import PricingCalculator
+from .dispatch import _number
+from .imposition import ImpositionCalculator
+
+
+class GangRunPlanner:
+    """
+    Packs many same-stock jobs onto shared Indigo press sheets.
+
+    Each press layout is a guillotine-cuttable shelf packing: the sheet is cut
+    into full-width strips, each strip into pieces (with one trim cut when a
+    piece is shorter than its strip). Pieces may be rotated and different jobs
+    share a sheet. A layout is run R times; the planner repeatedly picks the
+    run length and layout that produce the most useful area per sheet,
+    counting a make-ready as makeready_sheets extra sheets, until every job's
+    quantity is covered.
+    """
+
+    def __init__(self, calculator=None, makeready_sheets=10, candidate_jobs=64,
+                 run_candidates=24, cache_size=4096):
+        self.calc = calculator
+        self.imposition_calc = calculator.imposition_calc if calculator else ImpositionCalculator()
+        self.bleed = self.imposition_calc.BLEED
+        self.sheet_width = self.imposition_calc.PRINTABLE_WIDTH
+        self.sheet_height = self.imposition_calc.PRINTABLE_HEIGHT
+        self.makeready_sheets = makeready_sheets
+        self.candidate_jobs = candidate_jobs
+        self.run_candidates = run_candidates
+        self.cache_size = cache_size
+        self._layout_cache = {}
+
+    def _pack_shelves(self, items, order, sheet_width, sheet_height):
+        """
+        First-fit decreasing-height shelf packing.
+        items is a tuple of (width, height, ups_wanted) with bleed included and
+        order their indexes by decreasing smaller side; returns
+        (ups_placed per item, [(item, x, y, width, height, count)]).
+        """
+        # No piece is narrower than the last one, so shelves with less room left
+        # than that are dropped, and packing stops once the sheet is that full
+        smallest = min(items[order[-1]][:2])
+        placed = [0] * len(items)
+        pieces = []
+        shelves = []
+        used_height = 0
+
+        for i in order:
+            if not shelves and sheet_height - used_height < smallest:
+                break
+            w, h, remaining = items[i]
+            orientations = ((w, h), (h, w)) if w != h else ((w, h),)
+
+            full = False
+            for shelf in shelves:
+                if not remaining:
+                    break
+                y, shelf_height, used_width = shelf
+                free = sheet_width - used_width
+                best = None
+                for iw, ih in orientations:
+                    if ih <= shelf_height and iw <= free:
+                        count = min(remaining, int(free // iw))
+                        if best is None or count > best[0] or (count == best[0] and ih > best[2]):
+                            best = (count, iw, ih)
+                if best:
+                    count, iw, ih = best
+                    pieces.append((i, used_width, y, iw, ih, count))
+                    shelf[2] += count * iw
+                    remaining -= count
+                    full = full or sheet_width - shelf[2] < smallest
+            if full:
+                shelves = [shelf for shelf in shelves if sheet_width - shelf[2] >= smallest]
+
+            # A new shelf needs at least the piece's smaller side of height
+            while remaining and sheet_height - used_height >= min(w, h):
+                fits = [(ih, iw) for iw, ih in orientations
+                        if iw <= sheet_width and ih <= sheet_height - used_height]
+                if not fits:
+                    break
+                ih, iw = min(fits)
+                count = min(remaining, int(sheet_width // iw))
+                if sheet_width - count * iw >= smallest:
+                    shelves.append([used_height, ih, count * iw])
+                pieces.append((i, 0, used_height, iw, ih, count))
+                used_height += ih
+                remaining -= count
+
+            placed[i] = items[i][2] - remaining
+
+        return placed, pieces
+
+    def _pack(self, items):
+        """Best shelf packing over both sheet orientations, memoized on the item tuple"""
+        cached = self._layout_cache.get(items)
+        if cached is not None:
+            return cached
+
+        sides = [-min(w, h) for w, h, _ in items]
+        order = sorted(range(len(items)), key=sides.__getitem__)
+        best = None
+        for sheet_width, sheet_height, turned in ((self.sheet_width, self.sheet_height, False),
+                                                  (self.sheet_height, self.sheet_width, True)):
+            placed, pieces = self._pack_shelves(items, order, sheet_width, sheet_height)
+            area = sum([n * w * h for (w, h, _), n in zip(items, placed) if n])
+            if best is None or area > best[0]:
+                best = (area, placed, pieces, turned)
+
+        if len(self._layout_cache) >= self.cache_size:
+            self._layout_cache.clear()
+        self._layout_cache[items] = best
+        return best
+
+    def _run_lengths(self, active, remaining, max_ups):
+        """Candidate run lengths: each top job finishing with k ups for small k"""
+        candidates = set()
+        for job in active[:8]:
+            for ups in range(1, min(max_ups[job], 16) + 1):
+                candidates.add(math.ceil(remaining[job] / ups))
+        for job in active:
+            candidates.add(remaining[job])
+
+        candidates = sorted(candidates)
+        if len(candidates) > self.run_candidates:
+            step = len(candidates) / self.run_candidates
+            candidates = [candidates[int(i * step)] for i in range(self.run_candidates)]
+        return candidates
+
+    def _plan_group(self, jobs):
+        sheet_area = self.sheet_width * self.sheet_height
+        ids = {}
+        sizes = {}
+        max_ups = {}
+        remaining = {}
+        for index, job in jobs:
+            ids[index] = job['id']
+            w = job['width'] + self.bleed * 2
+            h = job['height'] + self.bleed * 2
+            sizes[index] = (w, h)
+            max_ups[index] = max(self.imposition_calc.calculate_imposition(job['width'], job['height']).get('copies', 0), 1)
+            remaining[index] = job['quantity']
+
+        layouts = []
+        produced = defaultdict(int)
+        sheet_share = defaultdict(float)
+
+        # Candidates are the jobs with the most outstanding area, ties in job order.
+        # Jobs nothing has been made for yet keep their place in one sorted queue and
+        # part-made ones sit in a heap; a job's rank only changes while it's a candidate
+        def rank(j):
+            return -remaining[j] * sizes[j][0] * sizes[j][1], j
+
+        queue = sorted(remaining, key=rank)
+        head = 0
+        started = []
+
+        while remaining:
+            while head < len(queue) and queue[head] in produced:
+                head += 1
+            fresh = []
+            for k in range(head, len(queue)):
+                if queue[k] not in produced:
+                    fresh.append(queue[k])
+                    if len(fresh) == self.candidate_jobs:
+                        break
+            ranked = [heapq.heappop(started)[1] for _ in range(min(len(started), self.candidate_jobs))]
+            active = heapq.nsmallest(self.candidate_jobs, ranked + fresh, key=rank)
+
+            best = None
+            for runs in self._run_lengths(active, remaining, max_ups):
+                items = tuple((sizes[j][0], sizes[j][1], math.ceil(remaining[j] / runs)) for j in active)
+                area, placed, pieces, turned = self._pack(items)
+                useful = sum(min(n * runs, remaining[j]) * sizes[j][0] * sizes[j][1]
+                             for j, n in zip(active, placed) if n)
+                score = useful / ((runs + self.makeready_sheets) * sheet_area)
+                if best is None or score > best[0]:
+                    best = (score, runs, placed, pieces, area, turned)
+
+            _, runs, placed, pieces, area, turned = best
+            placements = []
+            for i, x, y, w, h, count in pieces:
+                job = active[i]
+                placements.append({
+                    'job': ids[job],
+                    'x': round(x, 3), 'y': round(y, 3),
+                    'width': round(w, 3), 'height': round(h, 3),
+                    'count': count,
+                    'rotated': (w, h) != sizes[job]
+                })
+            for job, ups in zip(active, placed):
+                if not ups:
+                    continue
+                made = ups * runs
+                produced[job] += made
+                remaining[job] -= made
+                if remaining[job] <= 0:
+                    del remaining[job]
+                sheet_share[job] += runs * (ups * sizes[job][0] * sizes[job][1]) / area
+
+            for job in {*ranked, *active}:
+                if job in remaining and job in produced:
+                    heapq.heappush(started, rank(job))
+
+            layouts.append({
+                'runs': runs,
+                'sheet_orientation': 'landscape' if turned else 'portrait',
+                'utilization': round(area / sheet_area * 100, 1),
+                'placements': placements
+            })
+
+        return layouts, produced, sheet_share
+
+    def plan(self, jobs):
+        """
+        Plan a cart or day's queue. Each job is a dict with id, width, height,
+        quantity and paper_code; jobs are only ganged with others on the same stock.
+        """
+        groups = defaultdict(list)
+        results = {'sheets': [], 'jobs': [], 'errors': []}
+
+        for index, job in enumerate(jobs):
+            imposition = self.imposition_calc.calculate_imposition(job['width'], job['height'])
+            if imposition.get('error') or job.get('quantity', 0) <= 0:
+                results['errors'].append({'id': job.get('id', index),
+                                          'error': imposition.get('error') or 'Quantity must be positive'})
+                continue
+            job = {**job, 'id': job.get('id', index)}
+            groups[job.get('paper_code')].append((index, job))
+
+        total_sheets = 0
+        standalone_total = 0
+        for paper_code, group in groups.items():
+            layouts, produced, sheet_share = self._plan_group(group)
+            group_sheets = sum(layout['runs'] for layout in layouts)
+            total_sheets += group_sheets
+            results['sheets'].append({'paper_code': paper_code, 'sheets': group_sheets,
+                                      'make_readies': len(layouts), 'layouts': layouts})
+
+            costs = self._group_costs(paper_code, group_sheets, len(layouts))
+            for index, job in group:
+                standalone = math.ceil(job['quantity'] / self.imposition_calc.calculate_imposition(
+                    job['width'], job['height'])['copies'])
+                standalone_total += standalone
+                entry = {
+                    'id': job['id'],
+                    'paper_code': paper_code,
+                    'quantity': job['quantity'],
+                    'produced': produced[index],
+                    'overrun': produced[index] - job['quantity'],
+                    'sheet_share': round(sheet_share[index], 3),
+                    'standalone_sheets': standalone
+                }
+                if costs:
+                    entry['cost_share'] = round(costs * sheet_share[index] / group_sheets, 2)
+                results['jobs'].append(entry)
+
+        results['total_sheets'] = total_sheets
+        results['standalone_sheets'] = standalone_total
+        results['make_readies'] = sum(group['make_readies'] for group in results['sheets'])
+        return results
+
+    def _group_costs(self, paper_code, sheets, make_readies):
+        """Setup, production and paper cost of a ganged group (needs a calculator)"""
+        if not self.calc or not sheets:
+            return None
+        formula = self.calc.config['formula']
+        paper = self.calc.paper_stocks.get(paper_code) or {}
+        setup = formula['setup_fee'] * make_readies
+        production = (sheets ** formula['efficiency_exponent']) * formula['base_production_rate']
+        paper_cost = sheets * paper.get('cost_per_sheet', 0)
+        return setup + production + paper_cost
+
+
+def read_jobs(stream, fmt):
+    """
+    Gang jobs from CSV/JSONL rows with width and height in inches, quantity,
+    paper_code and an optional id (the row number by default)
+    """
+    jobs = []
+    for number, row in enumerate(read_rows(stream, fmt), 1):
+        if '_error' in row:
+            raise ValueError(row['_error'])
+        try:
+            jobs.append({'id': number if row.get('id') in (None, '') else row['id'],
+                         'width': _number(row['width']),
+                         'height': _number(row['height']),
+                         'quantity': int(_number(row['quantity'])),
+                         'paper_code': row.get('paper_code')})
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Job {number} needs a numeric width, height and quantity') from None
+    return jobs
+
+
+def run_gang(args):
+    """Entry point for `python -m pricing gang`"""
+    started = time.perf_counter()
+    source = sys.stdin if args.jobs == '-' else open(args.jobs, newline='', encoding='utf-8')
+    try:
+        jobs = read_jobs(source, _detect_format(args.jobs, args.format))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    planner = GangRunPlanner(PricingCalculator(), makeready_sheets=args.makeready_sheets,
+                             candidate_jobs=args.candidate_jobs, run_candidates=args.run_candidates)
+    result = planner.plan(jobs)
+    output = json.dumps(result, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    print(f'Ganged {len(jobs) - len(result["errors"])} jobs ({len(result["errors"])} rejected) onto '
+          f'{result["total_sheets"]} sheets with {result["make_readies"]} make-readies '
+          f'({result["standalone_sheets"]} run alone) in {time.perf_counter() - started:.2f}s', file=sys.stderr)
+    return 0
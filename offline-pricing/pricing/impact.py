@@ -0,0 +1,554 @@
+import copy
+import json
+import sqlite3
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+import numpy as np
+
+from .batch import _near_tie, _tier_column
+from .bulk import read_rows
+from .calculator import PricingCalculator
+from .dispatch import DIRECT_PRODUCTS, PAPER_ARGUMENTS, compile_normalized, normalize_request, price_normalized
+from .plans import BookletPlan, NotebookPlan, NotepadPlan, PerfectBoundPlan, PosterPlan, SheetPlan
+from .snapshot import PAPER_COST_KEYS, ConfigSnapshot, changed_sections, compile_snapshot
+
+
+# Rows per chunk; each chunk is parsed, repriced under both configs and folded
+# into the running aggregates before the next is read
+CHUNK_ROWS = 100000
+
+# Row fields naming the customer, in order of preference
+CUSTOMER_FIELDS = ('customer_email', 'customer_company', 'customer_name', 'customer')
+
+# Per-configuration plan parameters kept as columns; plan attributes are
+# mapped onto the shared names per plan type
+COLUMNS = ('S', 'F_setup', 'k', 'e', 'v', 'f', 'imposition', 'sheets', 'divisor', 'labor', 'binding',
+           'text_cost', 'clicks_cost', 'backing_cost', 'square_footage', 'charge_rate',
+           'min_quantity', 'max_quantity')
+
+INVALID, SHEET, BOOKLET, NOTEBOOK, NOTEPAD, POSTER, PERFECT_BOUND, DIRECT = range(8)
+
+PLAN_KINDS = {
+    SheetPlan: (SHEET, {}),
+    BookletPlan: (BOOKLET, {'sheets': 'sheets_per_booklet', 'divisor': 'multi_up_factor'}),
+    NotebookPlan: (NOTEBOOK, {'sheets': 'sheets_per_notebook', 'labor': 'labor_cost',
+                              'binding': 'binding_hardware'}),
+    NotepadPlan: (NOTEPAD, {'sheets': 'sheets', 'text_cost': 'text_cost', 'clicks_cost': 'clicks_cost',
+                            'backing_cost': 'backing_cost'}),
+    PosterPlan: (POSTER, {'square_footage': 'square_footage', 'charge_rate': 'charge_rate'}),
+    PerfectBoundPlan: (PERFECT_BOUND, {'sheets': 'total_sheets'})
+}
+
+# Summed per product, paper and customer
+SUM_COLUMNS = ('rows', 'quantity', 'old_total', 'new_total', 'old_material', 'new_material')
+
+
+# Vectorized PricingPlan._costs of each plan type, in the same operation order;
+# each returns (subtotal, material_cost) arrays
+
+def _sheet_costs(p, q, snapshot):
+    S_total = np.ceil(q / p('imposition'))
+    production_cost = np.power(S_total, p('e')) * p('k')
+    material_cost = q * p('v')
+    subtotal = p('S') + p('F_setup') + production_cost + material_cost + q * p('f')
+    return subtotal, material_cost
+
+
+def _booklet_costs(p, q, snapshot):
+    S_total = q * p('sheets') / p('divisor')
+    production = np.power(S_total, p('e')) * p('k')
+    materials = q * p('v')
+    subtotal = p('S') + production + materials + p('F_setup') + q * p('f')
+    return subtotal, materials
+
+
+def _notebook_costs(p, q, snapshot):
+    S_total = q * p('sheets')
+    production_cost = np.power(S_total, p('e')) * p('k')
+    materials_cost_total = q * p('v')
+    subtotal = (p('S') + p('F_setup') + production_cost + materials_cost_total
+                + q * p('labor') + q * p('binding'))
+    return subtotal, materials_cost_total
+
+
+def _notepad_costs(p, q, snapshot):
+    press_sheets_needed = (q * p('sheets')) / p('imposition')
+    text_cost_per_unit = (press_sheets_needed * p('text_cost')) / q
+    click_cost_per_unit = (press_sheets_needed * p('clicks_cost')) / q
+    materials_cost_per_unit = (text_cost_per_unit + p('backing_cost') + click_cost_per_unit) * 1.25
+    production_cost = np.power(press_sheets_needed, p('e')) * p('k')
+    materials_cost_total = q * materials_cost_per_unit
+    subtotal = p('S') + p('F_setup') + production_cost + materials_cost_total + q * p('f')
+    return subtotal, materials_cost_total
+
+
+def _poster_costs(p, q, snapshot):
+    square_footage = p('square_footage')
+    multiplier = _tier_column(snapshot.poster_tiers, square_footage * q, 'multiplier')
+    total_material_cost = square_footage * p('charge_rate') * multiplier * q
+    return total_material_cost, total_material_cost
+
+
+def _perfect_bound_costs(p, q, snapshot):
+    S_total = q * p('sheets')
+    production_cost = np.power(S_total, p('e')) * p('k')
+    materials_cost = q * p('v')
+    subtotal = p('S') + p('F_setup') + production_cost + materials_cost + q * p('f')
+    return subtotal, materials_cost
+
+
+KIND_COSTS = {
+    SHEET: _sheet_costs,
+    BOOKLET: _booklet_costs,
+    NOTEBOOK: _notebook_costs,
+    NOTEPAD: _notepad_costs,
+    POSTER: _poster_costs,
+    PERFECT_BOUND: _perfect_bound_costs
+}
+
+
+def _round_cents(values):
+    """np.round to the cent, with round() on values near a half-cent tie so cents match the scalar path"""
+    rounded = np.round(values, 2)
+    for i in np.flatnonzero(_near_tie(values, 2)):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+class PlanTable:
+    """
+    The compiled plans of a list of configurations under one calculator,
+    as parameter columns, so any mix of configurations, quantities and rush
+    types is priced with array arithmetic. Envelopes, magnets and stickers
+    have no plan and are priced through calculate_* once per distinct
+    (configuration, quantity, rush type).
+    """
+
+    def __init__(self, calculator):
+        self.calc = calculator
+        self.snapshot = calculator.snapshot
+        self.configs = []
+        self._columns = {name: [] for name in ('kind',) + COLUMNS}
+        self._arrays = None
+        self._rush = {}
+        self._direct = {}
+
+    def add(self, product, options):
+        """Compile one configuration (options without quantity and rush type)"""
+        self.configs.append((product, options))
+        values = dict.fromkeys(COLUMNS, 0.0)
+        if product in DIRECT_PRODUCTS:
+            kind = DIRECT
+        else:
+            plan = compile_normalized(self.calc, product, options)
+            if isinstance(plan, dict):
+                kind = INVALID
+            else:
+                kind, fields = PLAN_KINDS[type(plan)]
+                for name in ('S', 'F_setup', 'k', 'e', 'v', 'f', 'imposition'):
+                    values[name] = getattr(plan, name) or 0.0
+                for name, attribute in fields.items():
+                    values[name] = getattr(plan, attribute)
+                values['min_quantity'] = plan.min_quantity
+                values['max_quantity'] = plan.max_quantity
+        self._columns['kind'].append(kind)
+        for name in COLUMNS:
+            self._columns[name].append(values[name])
+        self._arrays = None
+
+    def _rush_multipliers(self, rush_types):
+        for rush_type in rush_types[len(self._rush):]:
+            self._rush[rush_type] = self.calc._get_rush_multiplier(rush_type)
+        return np.array([self._rush[rush_type] for rush_type in rush_types], dtype=np.float64)
+
+    def evaluate(self, configs, quantities, rush, rush_types):
+        """
+        Price rows given as configuration indexes, quantities and indexes into
+        rush_types. Returns (total_cost, material_cost, priced) arrays, rounded
+        to the cent like the calculate_* results; priced is False for rows
+        the configuration cannot price.
+        """
+        if self._arrays is None:
+            self._arrays = {name: np.asarray(values, dtype=np.int8 if name == 'kind' else np.float64)
+                            for name, values in self._columns.items()}
+        arrays = self._arrays
+        kind = arrays['kind'][configs]
+        q = quantities.astype(np.float64)
+        subtotal = np.zeros(q.size)
+        material = np.zeros(q.size)
+        priced = ((kind != INVALID) & (kind != DIRECT)
+                  & (q >= arrays['min_quantity'][configs]) & (q <= arrays['max_quantity'][configs]))
+
+        for code, costs in KIND_COSTS.items():
+            rows = np.flatnonzero(priced & (kind == code))
+            if rows.size:
+                row_configs = configs[rows]
+                subtotal[rows], material[rows] = costs(lambda name: arrays[name][row_configs], q[rows],
+                                                       self.snapshot)
+
+        total = _round_cents(subtotal * self._rush_multipliers(rush_types)[rush])
+        material = _round_cents(material)
+
+        for row in np.flatnonzero(kind == DIRECT):
+            total[row], material[row], priced[row] = self._price_direct(
+                int(configs[row]), int(quantities[row]), rush_types[rush[row]])
+        return total, material, priced
+
+    def _price_direct(self, config, quantity, rush_type):
+        key = (config, quantity, rush_type)
+        priced = self._direct.get(key)
+        if priced is None:
+            product, options = self.configs[config]
+            result = price_normalized(self.calc, product, {**options, 'quantity': quantity, 'rush_type': rush_type})
+            if 'error' in result:
+                priced = (0.0, 0.0, False)
+            else:
+                priced = (result['total_cost'], result.get('material_cost', result.get('supplier_cost', 0)), True)
+            self._direct[key] = priced
+        return priced
+
+
+class _Labels:
+    """Label -> dense index, for bincount aggregation"""
+
+    def __init__(self):
+        self.index = {}
+        self.labels = []
+
+    def __call__(self, label):
+        i = self.index.get(label)
+        if i is None:
+            i = self.index[label] = len(self.labels)
+            self.labels.append(label)
+        return i
+
+
+class ImpactAnalysis:
+    """
+    Reprices a historical quote corpus under an old and a new pricing config
+    and aggregates the difference by product, paper and customer.
+
+    Rows are added in chunks. Each row is parsed once; its configuration
+    (everything but quantity and rush type) is compiled once per config for
+    the whole corpus, and the chunk is then priced with array arithmetic over
+    the plan parameters (see PlanTable). Margin here is the price less its
+    material cost component. Rows neither config can price are counted as
+    errors. Rows only the old config can price are counted as lost, rows only
+    the new one can price as gained, and both are aggregated at a price of
+    zero under the config that cannot price them.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.tables = (PlanTable(old), PlanTable(new))
+        self.rows = 0
+        self.errors = Counter()
+        self.lost = Counter()
+        self.gained = Counter()
+        self._configs = {}
+        self._config_product = []
+        self._config_paper = []
+        self._rush_types = _Labels()
+        self._dimensions = {'product': _Labels(), 'paper': _Labels(), 'customer': _Labels()}
+        self._sums = {dimension: np.zeros((0, len(SUM_COLUMNS))) for dimension in self._dimensions}
+        self._buckets = []
+
+    def _config(self, product, options):
+        key = (product, tuple(sorted(options.items())))
+        i = self._configs.get(key)
+        if i is None:
+            i = self._configs[key] = len(self._config_product)
+            for table in self.tables:
+                table.add(product, options)
+            paper = next((options[name] for name in PAPER_ARGUMENTS if options.get(name)), None)
+            self._config_product.append(self._dimensions['product'](product))
+            self._config_paper.append(self._dimensions['paper'](paper))
+        return i
+
+    def add(self, rows):
+        """Reprice one chunk of corpus rows (bulk CLI / quote_items format)"""
+        configs, quantities, rush, customers = [], [], [], []
+        rush_type_index = self._rush_types
+        customer_index = self._dimensions['customer']
+        for row in rows:
+            self.rows += 1
+            product, kwargs, error = normalize_request(row)
+            if error:
+                self.errors[error] += 1
+                continue
+            quantity = kwargs.pop('quantity')
+            rush.append(rush_type_index(kwargs.pop('rush_type', 'standard')))
+            configs.append(self._config(product, kwargs))
+            quantities.append(quantity)
+            customers.append(customer_index(next((row[name] for name in CUSTOMER_FIELDS if row.get(name)), None)))
+        if not configs:
+            return
+
+        configs = np.asarray(configs, dtype=np.int64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        rush = np.asarray(rush, dtype=np.int64)
+        rush_types = self._rush_types.labels
+        old_total, old_material, old_priced = self.tables[0].evaluate(configs, quantities, rush, rush_types)
+        new_total, new_material, new_priced = self.tables[1].evaluate(configs, quantities, rush, rush_types)
+
+        keep = old_priced | new_priced
+        unpriced = int(np.count_nonzero(~keep))
+        if unpriced:
+            self.errors['Not priceable under either config'] += unpriced
+        product_labels = self._dimensions['product'].labels
+        for counter, only in ((self.lost, old_priced & ~new_priced), (self.gained, new_priced & ~old_priced)):
+            if only.any():
+                for product, count in Counter(np.asarray(self._config_product)[configs[only]]).items():
+                    counter[product_labels[product]] += count
+        old_total, old_material = np.where(old_priced, old_total, 0), np.where(old_priced, old_material, 0)
+        new_total, new_material = np.where(new_priced, new_total, 0), np.where(new_priced, new_material, 0)
+        configs, quantities, rush = configs[keep], quantities[keep], rush[keep]
+        columns = (np.ones(configs.size), quantities.astype(np.float64), old_total[keep], new_total[keep],
+                   old_material[keep], new_material[keep])
+
+        labels = {
+            'product': np.asarray(self._config_product, dtype=np.int64)[configs],
+            'paper': np.asarray(self._config_paper, dtype=np.int64)[configs],
+            'customer': np.asarray(customers, dtype=np.int64)[keep]
+        }
+        for dimension, label in labels.items():
+            size = len(self._dimensions[dimension].labels)
+            sums = self._sums[dimension]
+            if sums.shape[0] < size:
+                sums = self._sums[dimension] = np.vstack([sums, np.zeros((size - sums.shape[0], len(SUM_COLUMNS)))])
+            for j, column in enumerate(columns):
+                sums[:, j] += np.bincount(label, weights=column, minlength=size)
+
+        # Distinct (configuration, quantity, rush type) with row counts, for
+        # the Monte Carlo sweep
+        keys = (configs << 40) | (quantities << 8) | rush
+        self._buckets.append(np.unique(keys, return_counts=True))
+
+    def buckets(self):
+        """The priced corpus as distinct (configs, quantities, rush) arrays and their row counts"""
+        if not self._buckets:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, empty
+        keys, inverse = np.unique(np.concatenate([keys for keys, _ in self._buckets]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate([counts for _, counts in self._buckets]))
+        self._buckets = [(keys, counts.astype(np.int64))]
+        return keys >> 40, (keys >> 8) & 0xFFFFFFFF, keys & 0xFF, counts
+
+    def report(self, top=20):
+        changed = changed_sections(self.old.snapshot, self.new.snapshot)
+        sums = self._sums
+        customers = _summaries(self._dimensions['customer'].labels, sums['customer'])
+        customers.sort(key=lambda entry: entry['delta'], reverse=True)
+        return {
+            'old_version': self.old.snapshot.version,
+            'new_version': self.new.snapshot.version,
+            'changed': sorted(changed),
+            'rows': self.rows,
+            'priced': int(sums['product'][:, 0].sum()),
+            'errors': dict(self.errors.most_common(10)),
+            'lost': dict(self.lost),
+            'gained': dict(self.gained),
+            'overall': _summary(sums['product'].sum(axis=0)),
+            'by_product': _summaries(self._dimensions['product'].labels, sums['product']),
+            'by_paper': _summaries(self._dimensions['paper'].labels, sums['paper']),
+            'hardest_hit_customers': customers[:top]
+        }
+
+    def monte_carlo(self, draws=200, sigma=0.1, seed=None):
+        """
+        Reprice the corpus under the new config with every paper's cost
+        scaled by an independent lognormal factor (mean 1, log-sd sigma) per
+        draw. Draws run over the distinct (configuration, quantity, rush
+        type) buckets weighted by their row counts, not over the rows.
+        Returns percentiles of total revenue and margin, overall and per
+        product, and the probability that revenue rises over the old config.
+        """
+        configs, quantities, rush, counts = self.buckets()
+        rush_types = self._rush_types.labels
+        product_labels = np.asarray(self._config_product, dtype=np.int64)[configs]
+        products = len(self._dimensions['product'].labels)
+        base = self.new.snapshot
+        papers = base.paper_stocks
+        codes = sorted(papers)
+        rng = np.random.default_rng(seed)
+
+        old_total, _, _ = self.tables[0].evaluate(configs, quantities, rush, rush_types)
+        old_revenue = float(old_total @ counts)
+        revenue = np.empty(draws)
+        margin = np.empty(draws)
+        product_revenue = np.empty((draws, products))
+        for draw in range(draws):
+            factors = rng.lognormal(-sigma * sigma / 2, sigma, len(codes))
+            paper_stocks = {code: _scale_costs(papers[code], factor) for code, factor in zip(codes, factors)}
+            snapshot = ConfigSnapshot(f'{base.version}-mc{draw}', base.config, base.promo_config, paper_stocks)
+            table = PlanTable(PricingCalculator(snapshot=snapshot))
+            for product, options in self.tables[1].configs:
+                table.add(product, options)
+            total, material, _ = table.evaluate(configs, quantities, rush, rush_types)
+            revenue[draw] = total @ counts
+            margin[draw] = (total - material) @ counts
+            product_revenue[draw] = np.bincount(product_labels, weights=total * counts, minlength=products)
+
+        return {
+            'draws': draws,
+            'sigma': sigma,
+            'old_revenue': round(old_revenue, 2),
+            'revenue': _percentiles(revenue),
+            'margin': _percentiles(margin),
+            'probability_revenue_up': round(float(np.mean(revenue > old_revenue)), 4),
+            'by_product': {product: _percentiles(product_revenue[:, i])
+                           for i, product in enumerate(self._dimensions['product'].labels)}
+        }
+
+
+def _scale_costs(paper, factor):
+    return {**paper, **{key: paper[key] * factor for key in PAPER_COST_KEYS if key in paper}}
+
+
+def _percentiles(values):
+    p5, p50, p95 = np.percentile(values, (5, 50, 95))
+    return {'mean': round(float(values.mean()), 2), 'p5': round(float(p5), 2),
+            'p50': round(float(p50), 2), 'p95': round(float(p95), 2)}
+
+
+def _summary(sums):
+    rows, quantity, old_total, new_total, old_material, new_material = (float(value) for value in sums)
+    old_margin = old_total - old_material
+    new_margin = new_total - new_material
+    return {
+        'rows': int(rows),
+        'quantity': int(quantity),
+        'old_total': round(old_total, 2),
+        'new_total': round(new_total, 2),
+        'delta': round(new_total - old_total, 2),
+        'delta_pct': round((new_total - old_total) / old_total * 100, 3) if old_total else None,
+        'old_margin': round(old_margin, 2),
+        'new_margin': round(new_margin, 2),
+        'margin_delta': round(new_margin - old_margin, 2)
+    }
+
+
+def _summaries(labels, sums):
+    return [{'label': label, **_summary(row)} for label, row in zip(labels, sums) if row[0]]
+
+
+def _set_path(config, path, value):
+    *parents, name = path.split('.')
+    for parent in parents:
+        config = config[parent]
+    if name not in config:
+        raise ValueError(f'Unknown config key {path}')
+    config[name] = value
+
+
+def scenario_snapshot(base, overrides=None, paper_costs=None, paper_scale=None):
+    """
+    A what-if snapshot derived from base: overrides maps dotted config paths
+    ('formula.efficiency_exponent', 'rush_multipliers.2-day.multiplier') to
+    new values, paper_costs maps paper codes to a new cost (per sheet, per
+    square foot or per unit, whichever the stock has), and paper_scale
+    multiplies every paper cost. Raises ValueError if the result is invalid.
+    """
+    config = copy.deepcopy(base.config)
+    for path, value in (overrides or {}).items():
+        try:
+            _set_path(config, path, value)
+        except (KeyError, TypeError):
+            raise ValueError(f'Unknown config key {path}')
+
+    paper_stocks = dict(base.paper_stocks)
+    if paper_scale is not None:
+        paper_stocks = {code: _scale_costs(paper, paper_scale) for code, paper in paper_stocks.items()}
+    for code, cost in (paper_costs or {}).items():
+        paper = paper_stocks.get(code)
+        if paper is None:
+            raise ValueError(f'Unknown paper {code}')
+        key = next(key for key in PAPER_COST_KEYS if key in paper)
+        paper_stocks[code] = {**paper, key: cost}
+    return compile_snapshot(config, paper_stocks, base.promo_config)
+
+
+def read_corpus(path, chunk_rows=CHUNK_ROWS, fmt=None):
+    """
+    Yield the corpus in chunks of rows: a quote store database (quote_items
+    joined to their quote's customer) or a CSV/JSONL file in the bulk format
+    """
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            cursor = connection.execute(
+                'SELECT i.product_type, i.quantity, i.configuration, q.customer_email, q.customer_company '
+                'FROM quote_items i JOIN quotes q ON q.id = i.quote_id')
+            while True:
+                batch = cursor.fetchmany(chunk_rows)
+                if not batch:
+                    return
+                yield [{'product_type': product, 'quantity': quantity, 'configuration': configuration,
+                        'customer_email': email, 'customer_company': company}
+                       for product, quantity, configuration, email, company in batch]
+        finally:
+            connection.close()
+
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='', encoding='utf-8') as stream:
+        rows = read_rows(stream, fmt)
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return
+            yield chunk
+
+
+def _assignment(text):
+    name, _, value = text.partition('=')
+    if not value:
+        raise ValueError(f'Expected NAME=VALUE, got {text!r}')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def run_impact(args):
+    """Entry point for `python -m pricing impact`"""
+    from .reload import source_for
+
+    started = time.perf_counter()
+    old = PricingCalculator()
+    try:
+        if args.new:
+            snapshot = source_for(args.new).poll()
+            if snapshot is None:
+                print(f'Cannot read a pricing config from {args.new}', file=sys.stderr)
+                return 1
+        else:
+            snapshot = old.snapshot
+        snapshot = scenario_snapshot(snapshot, dict(map(_assignment, args.set)),
+                                     dict(map(_assignment, args.paper_cost)), args.paper_scale)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    analysis = ImpactAnalysis(old, PricingCalculator(snapshot=snapshot))
+    for chunk in read_corpus(args.corpus, args.chunk_rows, args.format):
+        analysis.add(chunk)
+    report = analysis.report(args.top)
+    if args.monte_carlo:
+        report['monte_carlo'] = analysis.monte_carlo(args.monte_carlo, args.paper_sigma, args.seed)
+
+    output = json.dumps(report, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    overall = report['overall']
+    print(f'Repriced {report["priced"]} of {report["rows"]} rows in {time.perf_counter() - started:.1f}s: '
+          f'{overall["old_total"]:.2f} -> {overall["new_total"]:.2f} ({overall["delta_pct"]}%)',
+          file=sys.stderr)
+    return 0
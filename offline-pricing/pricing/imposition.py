@@ -0,0 +1,186 @@
+import math
+from _thread import allocate_lock
+
+
+class ImpositionCalculator:
+    """
+    Imposition calculator with HP Indigo production specifications (port of impositionCalculator.js)
+    Calculates how many copies fit on a 12.48x18.26" maximum image area with 0.125" bleed.
+
+    Trim sizes on the 1/8" grid are answered from a table shared by every
+    instance with the same sheet specification. It fills on demand so a cold
+    process pays only for the sizes it quotes; long-running services can
+    prewarm() it. Off-grid sizes fall back to a bounded per-instance LRU cache.
+
+    One instance can be shared by a thread pool. Table lookups take no lock
+    (a racing miss computes the same entry twice and keeps the first); the
+    LRU and its counters are only touched under the instance lock.
+    """
+
+    _tables = {}
+
+    BLEED = 0.125
+    PRINTABLE_WIDTH = 12.48
+    PRINTABLE_HEIGHT = 18.26
+    MAX_TRIM_WIDTH = 12.23
+    MAX_TRIM_HEIGHT = 18.01
+    MIN_SIZE = 1
+    GRID = 8
+    CACHE_SIZE = 1024
+
+    def __init__(self, cache_size=None):
+        self.cache_size = cache_size or self.CACHE_SIZE
+        self._table = None
+        # Insertion-ordered dict used as an LRU; collections costs ~2ms of cold start
+        self._cache = {}
+        self._stats = {'table_hits': 0, 'cache_hits': 0, 'misses': 0}
+        # _thread rather than threading, which would add milliseconds to cold start
+        self._lock = allocate_lock()
+
+    def _compute_imposition(self, trim_width, trim_height):
+        """Calculate imposition for a trim size from scratch"""
+        if trim_width < self.MIN_SIZE or trim_height < self.MIN_SIZE:
+            return {
+                'copies': 0,
+                'efficiency': 0,
+                'error': 'Dimensions must be at least 1 inch'
+            }
+
+        bleed_width = trim_width + (self.BLEED * 2)
+        bleed_height = trim_height + (self.BLEED * 2)
+
+        if bleed_width > self.PRINTABLE_WIDTH or bleed_height > self.PRINTABLE_HEIGHT:
+            return {
+                'copies': 0,
+                'efficiency': 0,
+                'error': f'Size too large. Maximum trim size: {self.MAX_TRIM_WIDTH}" x {self.MAX_TRIM_HEIGHT}" (HP Indigo limit)'
+            }
+
+        portrait_copies = math.floor(self.PRINTABLE_WIDTH / bleed_width) * math.floor(self.PRINTABLE_HEIGHT / bleed_height)
+        landscape_copies = math.floor(self.PRINTABLE_WIDTH / bleed_height) * math.floor(self.PRINTABLE_HEIGHT / bleed_width)
+
+        copies = max(portrait_copies, landscape_copies)
+        orientation = 'portrait' if portrait_copies >= landscape_copies else 'landscape'
+
+        sheet_area = self.PRINTABLE_WIDTH * self.PRINTABLE_HEIGHT
+        efficiency = (copies * bleed_width * bleed_height / sheet_area) * 100
+
+        return {
+            'copies': copies,
+            'efficiency': round(efficiency, 1),
+            'orientation': orientation,
+            'bleed_width': round(bleed_width, 3),
+            'bleed_height': round(bleed_height, 3),
+            'error': None
+        }
+
+    def _shared_table(self):
+        table = self._table
+        if table is None:
+            table = self._table = ImpositionCalculator._tables.setdefault(self._spec_key(), {})
+        return table
+
+    def _grid_bounds(self):
+        return (self.MIN_SIZE * self.GRID, math.floor(self.MAX_TRIM_WIDTH * self.GRID),
+                math.floor(self.MAX_TRIM_HEIGHT * self.GRID))
+
+    def prewarm(self):
+        """Fill the shared table with every 1/8" trim size up to the maximum trim size"""
+        table = self._shared_table()
+        first, last_width, last_height = self._grid_bounds()
+        for w in range(first, last_width + 1):
+            for h in range(first, last_height + 1):
+                if (w, h) not in table:
+                    table.setdefault((w, h), self._compute_imposition(w / self.GRID, h / self.GRID))
+
+    def _spec_key(self):
+        """Sheet specification the precomputed table depends on"""
+        return (self.BLEED, self.PRINTABLE_WIDTH, self.PRINTABLE_HEIGHT,
+                self.MAX_TRIM_WIDTH, self.MAX_TRIM_HEIGHT, self.MIN_SIZE, self.GRID)
+
+    def _grid_key(self, trim_width, trim_height):
+        """Table key for sizes on the 1/8" grid, None otherwise"""
+        w = trim_width * self.GRID
+        h = trim_height * self.GRID
+        if w != int(w) or h != int(h):
+            return None
+        return int(w), int(h)
+
+    def calculate_imposition(self, trim_width, trim_height):
+        """
+        Look up imposition for a trim size (results are shared; treat them as read-only)
+        """
+        table = self._table
+        if table is None:
+            table = self._shared_table()
+
+        key = self._grid_key(trim_width, trim_height)
+        if key is not None:
+            result = table.get(key)
+            if result is not None:
+                # Unlocked, so under concurrent use this count is approximate
+                self._stats['table_hits'] += 1
+                return result
+            first, last_width, last_height = self._grid_bounds()
+            if first <= key[0] <= last_width and first <= key[1] <= last_height:
+                with self._lock:
+                    self._stats['misses'] += 1
+                return table.setdefault(key, self._compute_imposition(trim_width, trim_height))
+
+        key = (trim_width, trim_height)
+        with self._lock:
+            result = self._cache.pop(key, None)
+            if result is not None:
+                self._cache[key] = result
+                self._stats['cache_hits'] += 1
+                return result
+            self._stats['misses'] += 1
+
+        # Computed outside the lock; a racing thread may store the same result first
+        result = self._compute_imposition(trim_width, trim_height)
+        with self._lock:
+            result = self._cache.setdefault(key, result)
+            if len(self._cache) > self.cache_size:
+                del self._cache[next(iter(self._cache))]
+        return result
+
+    def cache_info(self):
+        """Hit/miss statistics for the precomputed table and the LRU fallback"""
+        with self._lock:
+            stats = dict(self._stats)
+            cache_size = len(self._cache)
+        lookups = stats['table_hits'] + stats['cache_hits'] + stats['misses']
+        hits = stats['table_hits'] + stats['cache_hits']
+        return {
+            **stats,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0,
+            'table_size': len(self._table) if self._table is not None else 0,
+            'cache_size': cache_size,
+            'cache_max_size': self.cache_size
+        }
+
+    def invalidate(self):
+        """
+        Drop the precomputed table and LRU cache (call after changing bleed or sheet specs)
+        """
+        ImpositionCalculator._tables.pop(self._spec_key(), None)
+        self._table = None
+        with self._lock:
+            self._cache.clear()
+            self._stats = {'table_hits': 0, 'cache_hits': 0, 'misses': 0}
+
+    def get_efficiency_rating(self, efficiency):
+        """Get efficiency rating based on percentage"""
+        if efficiency >= 70:
+            return {'level': 'excellent', 'message': 'Excellent sheet utilization'}
+        if efficiency >= 50:
+            return {'level': 'good', 'message': 'Good sheet utilization'}
+        if efficiency >= 30:
+            return {'level': 'fair', 'message': 'Consider optimizing size for better efficiency'}
+        return {'level': 'poor', 'message': 'Poor efficiency - strongly consider resizing'}
+
+    def calculate_sheets_required(self, quantity, copies):
+        """Calculate sheets required for a given quantity"""
+        if copies <= 0:
+            return 0
+        return math.ceil(quantity / copies)
@@ -0,0 +1,338 @@
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from .dispatch import PAPER_ARGUMENTS
+
+
+# Latency bucket upper bounds in seconds (Prometheus-style, cumulative on export)
+LATENCY_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+                   0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+
+# Error message prefix -> reason label, first match wins
+ERROR_REASONS = (
+    (('Invalid paper', 'Invalid text paper', 'Please select a valid', 'Please select an envelope',
+      'Material ', 'Cover stock must be'), 'invalid_paper'),
+    (('Quantity must be', 'Minimum quantity', 'Maximum quantity'), 'quantity_out_of_range'),
+    (('Unable to calculate imposition', 'Size too large', 'Dimensions must be at least'), 'imposition_failure'),
+    (('Page count',), 'invalid_pages'),
+    (('Custom dimensions', 'Width', 'Height', 'Total area', 'Invalid size', 'Size '), 'invalid_size')
+)
+
+PRODUCT_METHODS = {
+    'calculate_flat_print_price': 'flat-prints',
+    'calculate_folded_print_price': 'folded-prints',
+    'calculate_booklet_price': 'booklets',
+    'calculate_notebook_price': 'notebooks',
+    'calculate_notepad_price': 'notepads',
+    'calculate_poster_price': 'posters',
+    'calculate_perfect_bound_price': 'perfect-bound-books',
+    'calculate_envelope_price': 'envelopes',
+    'calculate_magnet_price': 'magnets',
+    'calculate_sticker_price': 'stickers'
+}
+
+
+def error_reason(message):
+    for prefixes, reason in ERROR_REASONS:
+        if message.startswith(prefixes):
+            return reason
+    return 'other'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (not thread-safe; Instrumentation locks it)"""
+
+    __slots__ = ('counts', 'count', 'total')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        for bound in LATENCY_BUCKETS:
+            if seconds <= bound:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (None past the last bucket)"""
+        if not self.count:
+            return 0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+
+class HotKeys:
+    """
+    Approximate heavy hitters over sampled calls: counts are kept for at most
+    capacity keys and the least frequent half is dropped when that fills
+    """
+
+    def __init__(self, capacity=1000, sample_every=10):
+        self.capacity = capacity
+        self.sample_every = sample_every
+        self.counts = Counter()
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def should_sample(self):
+        with self._lock:
+            self._tick += 1
+            return self._tick % self.sample_every == 0
+
+    def add(self, key):
+        with self._lock:
+            self.counts[key] += self.sample_every
+            if len(self.counts) > self.capacity:
+                self.counts = Counter(dict(self.counts.most_common(self.capacity // 2)))
+
+    def top(self, n=20):
+        with self._lock:
+            return self.counts.most_common(n)
+
+    def clear(self):
+        with self._lock:
+            self.counts.clear()
+
+
+class SamplingProfiler:
+    """Samples the innermost frame of every other thread at a fixed interval"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = [(frame.f_code, frame.f_lineno) for thread_id, frame in sys._current_frames().items()
+                      if thread_id != me]
+            with self._lock:
+                for code, line in frames:
+                    self.samples[(code.co_filename, line, code.co_name)] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pricing-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self, limit=30):
+        with self._lock:
+            samples = self.samples.copy()
+        total = sum(samples.values()) or 1
+        lines = [f'{count:>7} {count / total:>6.1%}  {name} ({filename}:{line})'
+                 for (filename, line, name), count in samples.most_common(limit)]
+        return '\n'.join(lines)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _prometheus(instrumentation):
+    snapshot = instrumentation.snapshot()
+    lines = ['# TYPE pricing_calls_total counter']
+    for method, count in snapshot['calls'].items():
+        lines.append(f'pricing_calls_total{{method="{method}"}} {count}')
+    lines.append('# TYPE pricing_errors_total counter')
+    for method, reasons in snapshot['errors'].items():
+        for reason, count in reasons.items():
+            lines.append(f'pricing_errors_total{{method="{method}",reason="{reason}"}} {count}')
+    lines.append('# TYPE pricing_latency_seconds histogram')
+    for method, (counts, total, count) in instrumentation.histograms().items():
+        cumulative = 0
+        for bound, bucket in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+            cumulative += bucket
+            lines.append(f'pricing_latency_seconds_bucket{{method="{method}",le="{bound}"}} {cumulative}')
+        lines.append(f'pricing_latency_seconds_sum{{method="{method}"}} {total}')
+        lines.append(f'pricing_latency_seconds_count{{method="{method}"}} {count}')
+    lines.append('# TYPE pricing_imposition_cache_hit_ratio gauge')
+    lines.append(f'pricing_imposition_cache_hit_ratio {snapshot["imposition_cache"].get("hit_ratio", 0)}')
+    lines.append('# TYPE pricing_hot_key_calls gauge')
+    for entry in snapshot['hot_keys']:
+        lines.append(f'pricing_hot_key_calls{{product="{_label(entry["product"])}",'
+                     f'paper="{_label(entry["paper"])}",size="{_label(entry["size"])}"}} {entry["calls"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _json(instrumentation):
+    return json.dumps(instrumentation.snapshot(), indent=2, sort_keys=True)
+
+
+EXPORTERS = {
+    'prometheus': _prometheus,
+    'json': _json
+}
+
+
+def register_exporter(name, exporter):
+    """Add an exporter: a function taking the Instrumentation and returning text"""
+    EXPORTERS[name] = exporter
+
+
+class Instrumentation:
+    """
+    Opt-in metrics for a PricingCalculator and its ImpositionCalculator.
+    attach() shadows the public pricing methods on that one instance with
+    timing wrappers and detach() removes them again, so an uninstrumented
+    calculator runs exactly the original code. The wrappers may be called
+    from many threads; counters and histograms are only touched under _lock.
+    """
+
+    def __init__(self, hot_key_capacity=1000, sample_every=10):
+        self.calls = Counter()
+        self.errors = Counter()
+        self.latency = {}
+        self.hot_keys = HotKeys(hot_key_capacity, sample_every)
+        self._lock = threading.Lock()
+        self._attached = []
+        self.imposition = None
+        self._profile = None
+        self._sampler = None
+
+    def _wrap(self, name, method):
+        calls, errors, hot_keys, lock = self.calls, self.errors, self.hot_keys, self._lock
+        histogram = self.latency.setdefault(name, Histogram())
+        product = PRODUCT_METHODS.get(name.replace('_batch', ''))
+        parameters = method.__code__.co_varnames[1:method.__code__.co_argcount]
+        clock = time.perf_counter
+
+        def instrumented(*args, **kwargs):
+            started = clock()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                with lock:
+                    errors[(name, f'exception:{type(e).__name__}')] += 1
+                raise
+            finally:
+                elapsed = clock() - started
+                with lock:
+                    histogram.observe(elapsed)
+                    calls[name] += 1
+            if type(result) is dict and result.get('error'):
+                reason = error_reason(result['error'])
+                with lock:
+                    errors[(name, reason)] += 1
+            if product and hot_keys.should_sample():
+                hot_keys.add(self._hot_key(product, {**dict(zip(parameters, args)), **kwargs}))
+            return result
+
+        instrumented.__wrapped__ = method
+        return instrumented
+
+    @staticmethod
+    def _hot_key(product, options):
+        paper = next((options[name] for name in PAPER_ARGUMENTS if options.get(name)), None)
+        size = options.get('size') or options.get('preset_size')
+        if not size and options.get('width') and options.get('height'):
+            size = f"{options['width']}x{options['height']}"
+        return product, paper, size
+
+    def attach(self, calculator):
+        """Instrument a calculator instance (and its imposition calculator)"""
+        names = [name for name in dir(type(calculator))
+                 if name.startswith(('calculate_', 'find_')) or name == 'compile_plan']
+        targets = [(calculator, name) for name in names]
+        targets.append((calculator.imposition_calc, 'calculate_imposition'))
+        for target, name in targets:
+            if name in vars(target):
+                continue
+            setattr(target, name, self._wrap(name, getattr(target, name)))
+            self._attached.append((target, name))
+        self.imposition = calculator.imposition_calc
+        return self
+
+    def detach(self):
+        """Restore the original methods"""
+        for target, name in self._attached:
+            delattr(target, name)
+        self._attached = []
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+            for histogram in self.latency.values():
+                histogram.__init__()
+        self.hot_keys.clear()
+
+    def histograms(self):
+        """(bucket counts, total seconds, count) of every method called so far"""
+        with self._lock:
+            return {method: (list(histogram.counts), histogram.total, histogram.count)
+                    for method, histogram in self.latency.items() if histogram.count}
+
+    def start_profile(self, sampling=False, interval=0.005):
+        """Start cProfile (deterministic) or the low-overhead sampling profiler"""
+        if sampling:
+            self._sampler = SamplingProfiler(interval)
+            self._sampler.start()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop_profile(self, limit=30):
+        """Stop whichever profiler is running and return its report as text"""
+        if self._sampler:
+            self._sampler.stop()
+            report, self._sampler = self._sampler.report(limit), None
+            return report
+        if self._profile:
+            self._profile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(limit)
+            self._profile = None
+            return out.getvalue()
+        return ''
+
+    def snapshot(self):
+        with self._lock:
+            calls = dict(self.calls)
+            counted = list(self.errors.items())
+            latency = {
+                method: {
+                    'count': histogram.count,
+                    'mean_us': round(histogram.total / histogram.count * 1e6, 3),
+                    'p50_le_us': None if histogram.quantile(0.5) is None else histogram.quantile(0.5) * 1e6,
+                    'p99_le_us': None if histogram.quantile(0.99) is None else histogram.quantile(0.99) * 1e6
+                }
+                for method, histogram in self.latency.items() if histogram.count
+            }
+        errors = {}
+        for (method, reason), count in counted:
+            errors.setdefault(method, {})[reason] = count
+        return {
+            'calls': calls,
+            'errors': errors,
+            'latency': latency,
+            'imposition_cache': self.imposition.cache_info() if self.imposition else {},
+            'hot_keys': [{'product': product, 'paper': paper, 'size': size, 'calls': calls}
+                         for (product, paper, size), calls in self.hot_keys.top()]
+        }
+
+    def export(self, fmt='json'):
+        return EXPORTERS[fmt](self)
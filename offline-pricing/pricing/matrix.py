@@ -0,0 +1,350 @@
+import gzip
+import importlib.util
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .calculator import PricingCalculator
+from .dispatch import PRODUCTS, _number
+from .quote import price_quote_normalized
+from .snapshot import config_version
+
+
+# Bump when the shard layout or the pricing code changes in a way the
+# config inputs do not capture, so every shard is rebuilt
+MATRIX_FORMAT = 1
+MATRIX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'build', 'price-matrix')
+INDEX_NAME = 'index.json'
+
+# Configurations per chunk; each chunk is priced, written and released in turn
+CHUNK_CONFIGS = 512
+
+QUANTITY_BREAKS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+PRINTING_SIDES = ('single-sided', 'double-sided')
+PAGE_CONTENT = ('blank', 'lined', 'graph')
+NOTEPAD_CONTENT = ('blank', 'lined', 'graph', 'custom')
+NOTEPAD_SHEETS = (25, 50, 75, 100)
+NOTEBOOK_PAGES = (20, 50, 100, 150, 200)
+PERFECT_BOUND_PAGES = (40, 60, 80, 100, 120, 160, 200, 250, 300, 400, 500)
+PERFECT_BOUND_SIZES = ('5.5x8.5', '6x9', '8.5x11')
+
+# Preset sizes of the legacy product pages, by the streamlined category they price as
+FLAT_PRESETS = ('postcards', 'flyers', 'bookmarks', 'name-tags')
+FOLDED_PRESETS = ('brochures', 'table-tents')
+
+# Top-level pricing config sections each product's prices depend on
+PRODUCT_SECTIONS = {
+    'flat-prints': ('formula', 'product_constraints', 'imposition_data', 'rush_multipliers'),
+    'folded-prints': ('formula', 'product_constraints', 'imposition_data', 'finishing_costs',
+                      'rush_multipliers'),
+    'booklets': ('formula', 'product_constraints', 'imposition_data', 'finishing_costs',
+                 'rush_multipliers'),
+    'notebooks': ('formula', 'product_constraints', 'imposition_data', 'finishing_costs',
+                  'rush_multipliers'),
+    'notepads': ('formula', 'product_constraints', 'imposition_data', 'rush_multipliers'),
+    'posters': ('product_constraints', 'imposition_data', 'large_format_volume_discounts',
+                'rush_multipliers'),
+    'perfect-bound-books': ('formula', 'product_formulas', 'product_constraints', 'finishing_costs',
+                            'rush_multipliers'),
+    'envelopes': ('envelope_config', 'product_constraints', 'rush_multipliers'),
+    'magnets': (),
+    'stickers': ()
+}
+PROMO_PRODUCTS = ('magnets', 'stickers')
+
+
+def offered(product, snapshot):
+    """Whether the config has the optional section a product is priced from"""
+    if product == 'envelopes':
+        return 'envelope_config' in snapshot.config
+    if product in PROMO_PRODUCTS:
+        return product in snapshot.promo_config['products']
+    return True
+
+
+def _papers(paper_stocks, *types):
+    return sorted(code for code, paper in paper_stocks.items() if paper.get('type') in types)
+
+
+def _presets(config, *products):
+    sizes = {}
+    for product in products:
+        sizes.update(config['imposition_data'].get(product, {}))
+    return sorted(sizes, key=lambda size: tuple(float(part) for part in size.split('x')))
+
+
+def _dimensions(sizes):
+    """Size axis whose labels ('4x6') expand to width/height options"""
+    values = []
+    for size in sizes:
+        width, height = size.split('x')
+        values.append((size, {'width': _number(width), 'height': _number(height)}))
+    return values
+
+
+def _axis(name, values):
+    return name, [(value, {name: value}) for value in values]
+
+
+def product_axes(product, config, paper_stocks, promo_config):
+    """
+    Option axes of a product's matrix, outermost first, as
+    [(name, [(label, options)])]; rush is always the innermost option axis
+    """
+    text = _papers(paper_stocks, 'text_stock')
+    cover = _papers(paper_stocks, 'cover_stock')
+    rush = sorted(config['rush_multipliers'])
+
+    if product == 'flat-prints':
+        axes = [('size', _dimensions(_presets(config, *FLAT_PRESETS))),
+                _axis('paper_code', text + cover), _axis('printing_sides', PRINTING_SIDES),
+                _axis('hole_punch', (False, True)), _axis('lanyard', (False, True))]
+    elif product == 'folded-prints':
+        axes = [_axis('size', _presets(config, *FOLDED_PRESETS)), _axis('paper_code', text + cover),
+                _axis('fold_type', sorted(config['finishing_costs']['folding'])),
+                _axis('printing_sides', PRINTING_SIDES)]
+    elif product == 'booklets':
+        constraints = config['product_constraints']['booklets']
+        axes = [_axis('size', _presets(config, 'booklets')),
+                _axis('pages', range(constraints['min_pages'], constraints['max_pages'] + 1,
+                                     constraints['page_multiple'])),
+                _axis('cover_paper_code', ['SELF_COVER'] + cover), _axis('text_paper_code', text),
+                _axis('printing_sides', PRINTING_SIDES)]
+    elif product == 'notebooks':
+        axes = [('size', _dimensions(_presets(config, 'notebooks'))), _axis('pages', NOTEBOOK_PAGES),
+                _axis('binding_type', sorted(config['finishing_costs']['notebook_binding'])),
+                _axis('cover_paper_code', cover), _axis('text_paper_code', text),
+                _axis('page_content', PAGE_CONTENT), _axis('printing_sides', PRINTING_SIDES)]
+    elif product == 'notepads':
+        axes = [('size', _dimensions(_presets(config, 'notepads'))), _axis('sheets', NOTEPAD_SHEETS),
+                _axis('text_paper_code', text), _axis('backing_paper_code', cover),
+                _axis('page_content', NOTEPAD_CONTENT)]
+    elif product == 'posters':
+        materials = sorted(code for code, paper in paper_stocks.items()
+                           if paper.get('type', '').startswith('large_format'))
+        axes = [_axis('preset_size', _presets(config, 'posters')), _axis('material_code', materials)]
+    elif product == 'perfect-bound-books':
+        axes = [('size', _dimensions(PERFECT_BOUND_SIZES)), _axis('pages', PERFECT_BOUND_PAGES),
+                _axis('text_paper_code', text), _axis('cover_paper_code', cover),
+                _axis('printing_sides', PRINTING_SIDES)]
+    elif product == 'envelopes':
+        axes = [_axis('envelope_code', _papers(paper_stocks, 'envelope_stock')),
+                _axis('print_type', sorted(config['envelope_config']['impression_rates']))]
+    elif product in PROMO_PRODUCTS:
+        settings = promo_config['products'][product]
+        axes = [_axis('size', sorted(settings['supplier_costs']))]
+        rush = sorted(promo_config['pricing']['rush_multipliers'])
+    else:
+        raise ValueError(f'No price matrix for {product}')
+    return axes + [_axis('rush_type', rush)]
+
+
+def product_quantities(product, config, promo_config):
+    """Quantity axis: the standard breaks inside the product's range, plus its min and max"""
+    if product in PROMO_PRODUCTS:
+        return list(promo_config['products'][product]['quantity_brackets'])
+    constraints = config['product_constraints'][product]
+    low, high = constraints['min_quantity'], constraints['max_quantity']
+    return sorted({low, high} | {q for q in QUANTITY_BREAKS if low <= q <= high})
+
+
+def _inputs_hash(product, snapshot, axes, quantities):
+    """Content hash of everything a product's shard is computed from"""
+    config = snapshot.config
+    sections = {name: config[name] for name in PRODUCT_SECTIONS[product] if name in config}
+    papers = {label: snapshot.paper_stocks[label] for _, values in axes for label, _ in values
+              if isinstance(label, str) and label in snapshot.paper_stocks}
+    promo = snapshot.promo_config if product in PROMO_PRODUCTS else {}
+    layout = [MATRIX_FORMAT, CHUNK_CONFIGS, [[name, [label for label, _ in values]] for name, values in axes],
+              quantities]
+    return config_version([sections, layout], papers, promo)
+
+
+def _configurations(axes):
+    """(labels, options) for every option combination in matrix order (last axis fastest)"""
+    for combination in itertools.product(*(values for _, values in axes)):
+        options = {}
+        for _, value_options in combination:
+            options.update(value_options)
+        yield tuple(label for label, _ in combination), options
+
+
+class _ParquetSink:
+    """
+    Long-format Parquet copy of a shard, one row group per chunk
+    (pyarrow is optional; build_matrix only asks for this when it is installed)
+    """
+
+    def __init__(self, path, axes, quantities):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.path = path
+        self.names = [name for name, _ in axes]
+        self.quantities = quantities
+        self.writer = None
+
+    def write(self, labels, totals, units):
+        columns = {name: [str(row[i]) for row in labels for _ in self.quantities]
+                   for i, name in enumerate(self.names)}
+        columns['quantity'] = self.quantities * len(labels)
+        columns['total_cost'] = totals
+        columns['unit_price'] = units
+        table = self.pa.table(columns)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema, compression='zstd')
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def build_product(product, output_dir, parquet=True):
+    """
+    Price one product's full matrix and write its shard; returns its index entry.
+    Runs in a worker process, so it builds its own calculator.
+    """
+    calculator = PricingCalculator()
+    snapshot = calculator.snapshot
+    axes = product_axes(product, snapshot.config, snapshot.paper_stocks, snapshot.promo_config)
+    quantities = product_quantities(product, snapshot.config, snapshot.promo_config)
+    shard = f'{product}.json.gz'
+    path = os.path.join(output_dir, shard)
+    temporary = f'{path}.{os.getpid()}.tmp'
+
+    sink = None
+    if parquet:
+        parquet_path = os.path.join(output_dir, f'{product}.parquet')
+        sink = _ParquetSink(f'{parquet_path}.{os.getpid()}.tmp', axes, quantities)
+
+    configs = 0
+    errors = 0
+    configurations = _configurations(axes)
+    with gzip.open(temporary, 'wt', encoding='utf-8', compresslevel=9) as f:
+        f.write('{"product":%s,"chunk_configs":%d,"chunks":[' % (json.dumps(product), CHUNK_CONFIGS))
+        while True:
+            batch = list(itertools.islice(configurations, CHUNK_CONFIGS))
+            if not batch:
+                break
+            requests = [(product, {**options, 'quantity': quantity}, None)
+                        for _, options in batch for quantity in quantities]
+            items = price_quote_normalized(calculator, requests)['items']
+            totals = [item.get('total_cost') for item in items]
+            units = [item.get('unit_price') for item in items]
+            errors += sum(total is None for total in totals)
+            if configs:
+                f.write(',')
+            f.write(json.dumps({'start': configs, 'total_cost': totals, 'unit_price': units},
+                               separators=(',', ':')))
+            if sink:
+                sink.write([labels for labels, _ in batch], totals, units)
+            configs += len(batch)
+        f.write(']}')
+    os.replace(temporary, path)
+    if sink:
+        sink.close()
+        os.replace(sink.path, parquet_path)
+
+    entry = {
+        'shard': shard,
+        'inputs': _inputs_hash(product, snapshot, axes, quantities),
+        'config_version': snapshot.version,
+        'axes': [{'name': name, 'values': [label for label, _ in values]} for name, values in axes],
+        'quantities': quantities,
+        'configs': configs,
+        'cells': configs * len(quantities),
+        'errors': errors,
+        'built_at': time.time()
+    }
+    if sink:
+        entry['parquet'] = f'{product}.parquet'
+    return product, entry
+
+
+def read_index(output_dir):
+    try:
+        with open(os.path.join(output_dir, INDEX_NAME), encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('format') == MATRIX_FORMAT else None
+
+
+def _write_index(output_dir, index):
+    path = os.path.join(output_dir, INDEX_NAME)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(temporary, path)
+
+
+def stale_products(output_dir, products, snapshot, parquet=True):
+    """Products whose shard is missing or was built from different config inputs"""
+    previous = (read_index(output_dir) or {}).get('products', {})
+    stale = []
+    for product in products:
+        axes = product_axes(product, snapshot.config, snapshot.paper_stocks, snapshot.promo_config)
+        quantities = product_quantities(product, snapshot.config, snapshot.promo_config)
+        entry = previous.get(product)
+        if (entry is None or entry.get('inputs') != _inputs_hash(product, snapshot, axes, quantities)
+                or not os.path.exists(os.path.join(output_dir, entry['shard']))
+                or (parquet and 'parquet' in entry
+                    and not os.path.exists(os.path.join(output_dir, entry['parquet'])))):
+            stale.append(product)
+    return stale
+
+
+def build_matrix(output_dir=MATRIX_DIR, products=None, workers=None, parquet=True, force=False):
+    """
+    Build (or incrementally rebuild) the price matrix.
+
+    The index lists, per product, its shard, option axes and quantities. A
+    shard holds that product's matrix as chunks of two flat columns,
+    total_cost and unit_price (null where the combination cannot be
+    ordered). A cell's position is mixed-radix over the axes, quantity
+    fastest: config = sum(value_position * stride), chunk = config //
+    chunk_configs, offset = (config - chunk.start) * len(quantities) +
+    quantity_position, so a client looks a price up in O(1).
+    """
+    if parquet and importlib.util.find_spec('pyarrow') is None:
+        print('pyarrow is not installed; writing JSON shards only', file=sys.stderr)
+        parquet = False
+
+    os.makedirs(output_dir, exist_ok=True)
+    snapshot = PricingCalculator().snapshot
+    products = list(products or (product for product in PRODUCTS if offered(product, snapshot)))
+    stale = products if force else stale_products(output_dir, products, snapshot, parquet)
+    index = read_index(output_dir) or {'format': MATRIX_FORMAT, 'products': {}}
+
+    workers = min(workers or os.cpu_count() or 1, max(len(stale), 1))
+    if workers == 1:
+        built = [build_product(product, output_dir, parquet) for product in stale]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            built = list(pool.map(build_product, stale, itertools.repeat(output_dir),
+                                  itertools.repeat(parquet)))
+
+    index['products'].update(built)
+    index['config_version'] = snapshot.version
+    index['generated_at'] = time.time()
+    _write_index(output_dir, index)
+    return index, [product for product, _ in built]
+
+
+def run_matrix(args):
+    """Entry point for `python -m pricing matrix`"""
+    started = time.perf_counter()
+    index, built = build_matrix(args.output, args.products, args.workers,
+                                parquet=not args.no_parquet, force=args.force)
+    cells = sum(index['products'][product]['cells'] for product in built)
+    print(f'Built {len(built)} of {len(index["products"])} price matrix shards '
+          f'({cells} prices) in {time.perf_counter() - started:.1f}s: {", ".join(built) or "none stale"}',
+          file=sys.stderr)
+    return 0
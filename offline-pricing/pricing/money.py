@@ -0,0 +1,339 @@
+from .calculator import PricingCalculator
+
+
+# Amounts are carried as integer micro-cents: exact to 10^-8 dollars, far
+# below any price component, so converting a float component once snaps away
+# binary noise (2.675 is stored as 2.67499999...) before anything is rounded
+MICROS_PER_CENT = 10 ** 6
+MICROS_PER_DOLLAR = 100 * MICROS_PER_CENT
+
+# Multipliers (rush, markup) are carried in millionths
+RATE_SCALE = 10 ** 6
+
+ROUNDING_RULES = ('half_up', 'half_even', 'half_down', 'up', 'down')
+
+
+def to_micros(amount):
+    """Dollars (float) to integer micro-cents"""
+    return round(amount * MICROS_PER_DOLLAR)
+
+
+def to_rate(multiplier):
+    return round(multiplier * RATE_SCALE)
+
+
+def _half_up(numerator, denominator):
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def _half_even(numerator, denominator):
+    quotient, remainder = divmod(numerator, denominator)
+    return quotient + (2 * remainder > denominator or (2 * remainder == denominator and quotient & 1))
+
+
+def _half_down(numerator, denominator):
+    return (2 * numerator + denominator - 1) // (2 * denominator)
+
+
+def _up(numerator, denominator):
+    return -(-numerator // denominator)
+
+
+# Rounding of a non-negative numerator, by rule; divide handles the sign
+DIVIDERS = {
+    'half_up': _half_up,
+    'half_even': _half_even,
+    'half_down': _half_down,
+    'up': _up,
+    'down': int.__floordiv__
+}
+
+
+def divide(numerator, denominator, rule):
+    """
+    numerator / denominator rounded to an integer by rule, named as in the
+    decimal module: half_up and half_down resolve ties away from and towards
+    zero, half_even to the even neighbour (banker's rounding), up and down
+    round any remainder away from and towards zero
+    """
+    try:
+        divider = DIVIDERS[rule]
+    except KeyError:
+        raise ValueError(f'Unknown rounding rule {rule!r}') from None
+    if numerator < 0:
+        return -divider(-numerator, denominator)
+    return divider(numerator, denominator)
+
+
+def apply_rate(micros, rate):
+    """micros * rate (in RATE_SCALE units), kept in micro-cents"""
+    return divide(micros * rate, RATE_SCALE, 'half_even')
+
+
+def allocate(parts, total_cents):
+    """
+    Cents for each part (micro-cents) summing exactly to total_cents: every
+    part gets its whole cents and the cents left over go to the parts with
+    the largest remainders
+    """
+    if len(parts) == 1:
+        return [total_cents]
+    cents = [part // MICROS_PER_CENT for part in parts]
+    short = total_cents - sum(cents)
+    if short:
+        remainders = [part % MICROS_PER_CENT for part in parts]
+        if short == 1:
+            cents[remainders.index(max(remainders))] += 1
+        else:
+            for i in sorted(range(len(parts)), key=remainders.__getitem__, reverse=True)[:short]:
+                cents[i] += 1
+    return cents
+
+
+def _allocated_dollars(parts, subtotal, total_cents):
+    """
+    allocate(parts, total_cents) in dollars for parts summing to subtotal;
+    the remainders give the cents left over, saving a pass over the parts
+    """
+    if len(parts) == 1:
+        return [total_cents / 100]
+    remainders = [part % MICROS_PER_CENT for part in parts]
+    short = total_cents - (subtotal - sum(remainders)) // MICROS_PER_CENT
+    dollars = [part // MICROS_PER_CENT / 100 for part in parts]
+    if short == 1:
+        i = remainders.index(max(remainders))
+        dollars[i] = (parts[i] // MICROS_PER_CENT + 1) / 100
+    elif short:
+        for i in sorted(range(len(parts)), key=remainders.__getitem__, reverse=True)[:short]:
+            dollars[i] = (parts[i] // MICROS_PER_CENT + 1) / 100
+    return dollars
+
+
+def _dollars(cents, digits=2):
+    return cents / 10 ** digits
+
+
+class ExactPricingCalculator(PricingCalculator):
+    """
+    PricingCalculator with exact money: each component is converted once to
+    integer micro-cents, the subtotal is their exact sum and is rounded to
+    the cent once by the configured rule, the total is the subtotal times
+    the rush multiplier rounded once more, and the displayed components are
+    allocated so they add up to the displayed subtotal to the cent. The
+    formulas themselves are unchanged.
+
+    Plan-based products are priced through compiled plans cached per
+    configuration, so repeated configurations skip the paper and imposition
+    lookups; with integer rounding in place of round(x, 2) exact quotes
+    cost about the same as the float ones or less.
+    """
+
+    def __init__(self, snapshot=None, store=None, rounding='half_up', plan_cache_size=4096):
+        if rounding not in ROUNDING_RULES:
+            raise ValueError(f'Unknown rounding rule {rounding!r}; expected one of {", ".join(ROUNDING_RULES)}')
+        super().__init__(snapshot, store)
+        self.rounding = rounding
+        # Rounding of non-negative amounts; anything negative goes through divide
+        self._divider = DIVIDERS[rounding]
+        self.plan_cache_size = plan_cache_size
+        self._plans = {}
+        self._rates = {}
+
+    def on_config_swap(self, old, new, changed):
+        super().on_config_swap(old, new, changed)
+        self._plans = {}
+        self._rates = {}
+
+    def _divide(self, numerator, denominator):
+        if numerator < 0:
+            return divide(numerator, denominator, self.rounding)
+        return self._divider(numerator, denominator)
+
+    def _rush_rate(self, rush_type):
+        """The rush multiplier and its RATE_SCALE integer, cached per rush type"""
+        # Taken before reading the config, like the plan cache
+        rates = self._rates
+        rate = rates.get(rush_type)
+        if rate is None:
+            rush_multiplier = self._get_rush_multiplier(rush_type)
+            rate = rates[rush_type] = (rush_multiplier, to_rate(rush_multiplier))
+        return rate
+
+    def _promo_rates(self, product_key, rush_type):
+        """Markup and rush multiplier of a promo product with their RATE_SCALE integers, cached"""
+        key = (product_key, rush_type)
+        rates = self._rates
+        rate = rates.get(key)
+        if rate is None:
+            promo_config = self.promo_config
+            markup = promo_config['products'][product_key]['markup_percentage']
+            rush_multiplier = promo_config['pricing']['rush_multipliers'].get(rush_type, 1.0)
+            rate = rates[key] = (markup, to_rate(1 + markup), rush_multiplier, to_rate(rush_multiplier))
+        return rate
+
+    def _plan_breakdown(self, plan, quantity, costs, rush_multiplier):
+        return self._exact_breakdown(plan, quantity, costs, rush_multiplier,
+                                     round(rush_multiplier * RATE_SCALE))
+
+    def _exact_breakdown(self, plan, quantity, costs, rush_multiplier, rush_rate):
+        # The hot path of every plan-based quote: the same steps as
+        # _envelope_costs, for any number of parts
+        parts, _, side, facts = costs
+        parts = [round(part * MICROS_PER_DOLLAR) for part in parts]
+        subtotal = sum(parts)
+        divider = self._divider if subtotal >= 0 else self._divide
+        subtotal_cents = divider(subtotal, MICROS_PER_CENT)
+        if rush_rate == RATE_SCALE:
+            total_cents = subtotal_cents
+        elif not rush_rate % RATE_SCALE:
+            # A whole multiplier (same-day's 2.0) scales the micro-cents exactly
+            total_cents = divider(subtotal * (rush_rate // RATE_SCALE), MICROS_PER_CENT)
+        elif subtotal >= 0:
+            total_cents = divider(_half_even(subtotal * rush_rate, RATE_SCALE), MICROS_PER_CENT)
+        else:
+            total_cents = divider(apply_rate(subtotal, rush_rate), MICROS_PER_CENT)
+        unit_digits = plan.unit_digits
+        return plan._result(
+            quantity,
+            _allocated_dollars(parts, subtotal, subtotal_cents),
+            subtotal_cents / 100,
+            rush_multiplier,
+            total_cents / 100,
+            divider(total_cents * 10 ** (unit_digits - 2), quantity) / 10 ** unit_digits,
+            side if side is None else self._divide(round(side * MICROS_PER_DOLLAR), MICROS_PER_CENT) / 100,
+            facts
+        )
+
+    def _price_plan(self, quantity, rush_type, key):
+        """
+        Price through the cached plan for key: the product followed by the
+        calculate_* arguments between quantity and rush_type
+        """
+        # Taken before compiling: a plan compiled from a snapshot a swap has
+        # since replaced lands in the dropped cache, never in the new one
+        plans = self._plans
+        try:
+            plan = plans[key]
+        except KeyError:
+            if len(plans) >= self.plan_cache_size:
+                plans = self._plans = {}
+            plan = plans.setdefault(key, self.compile_plan(*key))
+        if isinstance(plan, dict):
+            return dict(plan)
+        if quantity < plan.min_quantity or quantity > plan.max_quantity:
+            return {'error': f'Quantity must be between {plan.min_quantity} and {plan.max_quantity}'}
+        try:
+            rush_multiplier, rush_rate = self._rates[rush_type]
+        except KeyError:
+            rush_multiplier, rush_rate = self._rush_rate(rush_type)
+        return self._exact_breakdown(plan, quantity, plan._costs(quantity), rush_multiplier, rush_rate)
+
+    def calculate_flat_print_price(self, quantity, width, height, paper_code,
+                                   printing_sides='double-sided', hole_punch=False,
+                                   lanyard=False, rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('flat-prints', width, height, paper_code,
+                                                      printing_sides, hole_punch, lanyard))
+
+    def calculate_folded_print_price(self, quantity, size, paper_code, fold_type='none',
+                                     printing_sides='double-sided', rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('folded-prints', size, paper_code,
+                                                      fold_type, printing_sides))
+
+    def calculate_booklet_price(self, quantity, size, pages, cover_paper_code, text_paper_code,
+                                printing_sides='double-sided', rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('booklets', size, pages, cover_paper_code,
+                                                      text_paper_code, printing_sides))
+
+    def calculate_notebook_price(self, quantity, width, height, pages, binding_type,
+                                 cover_paper_code, text_paper_code, page_content='blank',
+                                 printing_sides='double-sided', rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('notebooks', width, height, pages, binding_type,
+                                                      cover_paper_code, text_paper_code,
+                                                      page_content, printing_sides))
+
+    def calculate_notepad_price(self, quantity, width, height, sheets, text_paper_code,
+                                backing_paper_code, page_content='blank',
+                                printing_sides='single-sided', rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('notepads', width, height, sheets,
+                                                      text_paper_code, backing_paper_code,
+                                                      page_content, printing_sides))
+
+    def calculate_poster_price(self, quantity, material_code, width=None, height=None,
+                               preset_size=None, rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('posters', material_code, width, height,
+                                                      preset_size))
+
+    def calculate_perfect_bound_price(self, quantity, width, height, pages, text_paper_code,
+                                      cover_paper_code, printing_sides='double-sided',
+                                      rush_type='standard'):
+        return self._price_plan(quantity, rush_type, ('perfect-bound-books', width, height, pages,
+                                                      text_paper_code, cover_paper_code,
+                                                      printing_sides))
+
+    def _envelope_costs(self, setup_fee, envelope_cost, printing_cost, rush_multiplier, quantity):
+        parts = [round(setup_fee * MICROS_PER_DOLLAR), round(envelope_cost * MICROS_PER_DOLLAR),
+                 round(printing_cost * MICROS_PER_DOLLAR)]
+        subtotal = sum(parts)
+        divider = self._divider if subtotal >= 0 else self._divide
+        subtotal_cents = divider(subtotal, MICROS_PER_CENT)
+        if rush_multiplier == 1:
+            total_cents = subtotal_cents
+        elif subtotal >= 0:
+            total_cents = divider(_half_even(subtotal * to_rate(rush_multiplier), RATE_SCALE), MICROS_PER_CENT)
+        else:
+            total_cents = divider(apply_rate(subtotal, to_rate(rush_multiplier)), MICROS_PER_CENT)
+        setup, envelope, printing = _allocated_dollars(parts, subtotal, subtotal_cents)
+        return {
+            'printing_setup_cost': setup,
+            'finishing_setup_cost': 0,
+            'needs_finishing': False,
+            'production_cost': 0,
+            'envelope_cost': envelope,
+            'material_cost': envelope,
+            'printing_cost': printing,
+            'finishing_cost': 0,
+            'subtotal': subtotal_cents / 100,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cents / 100,
+            'unit_price': divider(total_cents * 10, quantity) / 1000
+        }
+
+    def _vinyl_costs(self, material, original, setup_fee, rush_multiplier, quantity):
+        rule = self.rounding
+        parts = [to_micros(material), to_micros(setup_fee)]
+        subtotal = sum(parts)
+        subtotal_cents = divide(subtotal, MICROS_PER_CENT, rule)
+        material_cents, setup_cents = allocate(parts, subtotal_cents)
+        total_cents = divide(apply_rate(subtotal, to_rate(rush_multiplier)), MICROS_PER_CENT, rule)
+        return {
+            'material_cost': _dollars(material_cents),
+            'setup_fee': _dollars(setup_cents),
+            'subtotal': _dollars(subtotal_cents),
+            'total_cost': _dollars(total_cents),
+            'unit_price': _dollars(divide(total_cents, quantity, rule)),
+            'volume_savings': _dollars(divide(to_micros(original) - parts[0], MICROS_PER_CENT, rule))
+        }
+
+    def _promo_price(self, product_key, quantity, size, rush_type, supplier_cost):
+        markup, markup_rate, rush_multiplier, rush_rate = self._promo_rates(product_key, rush_type)
+        supplier = round(supplier_cost * MICROS_PER_DOLLAR)
+        if supplier >= 0:
+            divider = self._divider
+            price_after_markup = _half_even(supplier * markup_rate, RATE_SCALE)
+            total = _half_even(price_after_markup * rush_rate, RATE_SCALE)
+        else:
+            divider = self._divide
+            price_after_markup = apply_rate(supplier, markup_rate)
+            total = apply_rate(price_after_markup, rush_rate)
+        total_cents = divider(total, MICROS_PER_CENT)
+        return {
+            'quantity': quantity,
+            'size': size,
+            'supplier_cost': divider(supplier, MICROS_PER_CENT) / 100,
+            'markup': markup,
+            'price_after_markup': divider(price_after_markup, MICROS_PER_CENT) / 100,
+            'rush_multiplier': rush_multiplier,
+            'total_cost': total_cents / 100,
+            'unit_price': divider(total_cents * 10, quantity) / 1000,
+            'config_version': self.snapshot.version
+        }
@@ -0,0 +1,553 @@
+import math
+from types import MappingProxyType
+
+
+class _Frozen:
+    """Slotted base whose attributes can only be set during construction"""
+
+    __slots__ = ()
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+
+class PricingPlan(_Frozen):
+    """
+    Pre-resolved evaluator for one product configuration.
+    All paper, constraint, finishing, imposition and rush lookups happen at
+    compile time; price(q) only does the arithmetic of the scalar path, in
+    the same order, so results match calculate_* to the cent.
+    """
+
+    __slots__ = ('product', 'min_quantity', 'max_quantity', 'S', 'F_setup', 'k', 'e',
+                 'v', 'f', 'r', 'imposition', 'unit_digits', 'details', 'config_version',
+                 '_template')
+
+    # The calculate_* result keys in order with their fixed values (None where
+    # _result fills in each quantity's); details not listed here follow them
+    # and config_version comes last
+    RESULT = MappingProxyType(dict.fromkeys((
+        'printing_setup_cost', 'finishing_setup_cost', 'needs_finishing', 'production_cost',
+        'material_cost', 'finishing_cost', 'subtotal', 'rush_multiplier', 'total_cost',
+        'unit_price', 'sheets_required')))
+
+    def __init__(self, product, constraints, S, F_setup, k, e, v, f, r, imposition,
+                 unit_digits, details, **extra):
+        details = dict(details)
+        # Copied for each result: cheaper than building it key by key
+        template = dict(self.RESULT)
+        template.update(details)
+        self._set(product=product, min_quantity=constraints['min_quantity'],
+                  max_quantity=constraints['max_quantity'], S=S, F_setup=F_setup, k=k, e=e,
+                  v=v, f=f, r=r, imposition=imposition, unit_digits=unit_digits,
+                  details=MappingProxyType(details), config_version=None, _template=template,
+                  **extra)
+
+    def price(self, quantity):
+        """Price one quantity, returning the calculate_* result (or an error dict)"""
+        if quantity < self.min_quantity or quantity > self.max_quantity:
+            return {'error': f'Quantity must be between {self.min_quantity} and {self.max_quantity}'}
+        return self._evaluate(quantity)
+
+    def _evaluate(self, quantity):
+        return self._breakdown(quantity, self._costs(quantity), self.r)
+
+    def _costs(self, quantity):
+        """
+        The rush-independent part of the price, as (parts, subtotal, side,
+        facts): the money components in result order, their sum in the
+        scalar path's order, the one other money field (or None) and the
+        non-money fields that depend on quantity
+        """
+        raise NotImplementedError
+
+    def _breakdown(self, quantity, costs, rush_multiplier):
+        parts, subtotal, side, facts = costs
+        total_cost = subtotal * rush_multiplier
+        return self._result(quantity, [round(part, 2) for part in parts], round(subtotal, 2),
+                            rush_multiplier, round(total_cost, 2),
+                            round(total_cost / quantity, self.unit_digits),
+                            None if side is None else round(side, 2), facts)
+
+    def _result(self, quantity, parts, subtotal, rush_multiplier, total_cost, unit_price, side, facts):
+        """The calculate_* result from rounded money fields"""
+        result = self._template.copy()
+        (result['printing_setup_cost'], result['finishing_setup_cost'], result['production_cost'],
+         result['material_cost'], result['finishing_cost']) = parts
+        result['subtotal'] = subtotal
+        result['rush_multiplier'] = rush_multiplier
+        result['total_cost'] = total_cost
+        result['unit_price'] = unit_price
+        result['sheets_required'] = facts
+        result['config_version'] = self.config_version
+        return result
+
+    def __repr__(self):
+        return f'{type(self).__name__}(product={self.product!r}, imposition={self.imposition})'
+
+
+class SheetPlan(PricingPlan):
+    """Flat and folded prints: S_total = ceil(Q / imposition)"""
+
+    __slots__ = ()
+
+    def _costs(self, quantity):
+        S_total = math.ceil(quantity / self.imposition)
+        production_cost = (S_total ** self.e) * self.k
+        material_cost = quantity * self.v
+        finishing_cost = quantity * self.f
+        subtotal = self.S + self.F_setup + production_cost + material_cost + finishing_cost
+        return (self.S, self.F_setup, production_cost, material_cost, finishing_cost), subtotal, None, S_total
+
+
+class BookletPlan(PricingPlan):
+    """Saddle-stitched booklets: S_total = Q * sheets_per_booklet / multi_up_factor"""
+
+    __slots__ = ('sheets_per_booklet', 'multi_up_factor', 'cover_sheets_per_booklet',
+                 'text_sheets_per_booklet')
+
+    def _costs(self, quantity):
+        S_total = quantity * self.sheets_per_booklet / self.multi_up_factor
+        production = (S_total ** self.e) * self.k
+        materials = quantity * self.v
+        finishing = quantity * self.f
+        subtotal = self.S + production + materials + self.F_setup + finishing
+        sheets_required = (math.ceil(quantity * self.cover_sheets_per_booklet)
+                           + math.ceil(quantity * self.text_sheets_per_booklet))
+        return (self.S, self.F_setup, production, materials, finishing), subtotal, None, sheets_required
+
+
+class NotebookPlan(PricingPlan):
+    """Notebooks: finishing is labor plus binding hardware per unit"""
+
+    __slots__ = ('sheets_per_notebook', 'labor_cost', 'binding_hardware')
+
+    RESULT = MappingProxyType(dict.fromkeys((
+        'quantity', 'width', 'height', 'pages', 'binding_type', 'cover_paper', 'text_paper',
+        'page_content', 'unit_price', 'total_cost', 'printing_setup_cost', 'finishing_setup_cost',
+        'total_setup_cost', 'production_cost', 'material_cost', 'labor_cost', 'binding_cost',
+        'subtotal', 'rush_multiplier', 'imposition')))
+
+    def _costs(self, quantity):
+        S_total = quantity * self.sheets_per_notebook
+        production_cost = (S_total ** self.e) * self.k
+        materials_cost_total = quantity * self.v
+        labor_cost_total = quantity * self.labor_cost
+        binding_cost_total = quantity * self.binding_hardware
+        total_setup = self.S + self.F_setup
+        subtotal = (total_setup + production_cost + materials_cost_total
+                    + labor_cost_total + binding_cost_total)
+        return ((self.S, self.F_setup, production_cost, materials_cost_total, labor_cost_total,
+                 binding_cost_total), subtotal, total_setup, None)
+
+    def _result(self, quantity, parts, subtotal, rush_multiplier, total_cost, unit_price, side, facts):
+        result = self._template.copy()
+        result['quantity'] = quantity
+        result['unit_price'] = unit_price
+        result['total_cost'] = total_cost
+        (result['printing_setup_cost'], result['finishing_setup_cost'], result['production_cost'],
+         result['material_cost'], result['labor_cost'], result['binding_cost']) = parts
+        result['total_setup_cost'] = side
+        result['subtotal'] = subtotal
+        result['rush_multiplier'] = rush_multiplier
+        result['config_version'] = self.config_version
+        return result
+
+
+class NotepadPlan(PricingPlan):
+    """Notepads: per-pad material cost depends on press sheets for the whole run"""
+
+    __slots__ = ('sheets', 'text_cost', 'clicks_cost', 'backing_cost')
+
+    RESULT = MappingProxyType(dict.fromkeys((
+        'quantity', 'size', 'sheets', 'text_paper', 'backing_paper', 'page_content', 'unit_price',
+        'total_cost', 'printing_setup_cost', 'finishing_setup_cost', 'total_setup_cost',
+        'production_cost', 'material_cost', 'labor_cost', 'finishing_cost', 'subtotal',
+        'rush_multiplier', 'sheets_required', 'imposition')))
+
+    def _costs(self, quantity):
+        press_sheets_needed = (quantity * self.sheets) / self.imposition
+        text_cost_per_unit = (press_sheets_needed * self.text_cost) / quantity
+        click_cost_per_unit = (press_sheets_needed * self.clicks_cost) / quantity
+        materials_cost_per_unit = (text_cost_per_unit + self.backing_cost + click_cost_per_unit) * 1.25
+        production_cost = (press_sheets_needed ** self.e) * self.k
+        materials_cost_total = quantity * materials_cost_per_unit
+        labor_cost_total = quantity * self.f
+        total_setup = self.S + self.F_setup
+        subtotal = total_setup + production_cost + materials_cost_total + labor_cost_total
+        return ((self.S, self.F_setup, production_cost, materials_cost_total, labor_cost_total),
+                subtotal, total_setup, math.ceil(press_sheets_needed))
+
+    def _result(self, quantity, parts, subtotal, rush_multiplier, total_cost, unit_price, side, facts):
+        result = self._template.copy()
+        result['quantity'] = quantity
+        result['unit_price'] = unit_price
+        result['total_cost'] = total_cost
+        (result['printing_setup_cost'], result['finishing_setup_cost'], result['production_cost'],
+         result['material_cost'], result['labor_cost']) = parts
+        result['total_setup_cost'] = side
+        result['finishing_cost'] = result['labor_cost']
+        result['subtotal'] = subtotal
+        result['rush_multiplier'] = rush_multiplier
+        result['sheets_required'] = facts
+        result['config_version'] = self.config_version
+        return result
+
+
+class PosterPlan(PricingPlan):
+    """Large format: square footage at the material rate with volume discount tiers"""
+
+    __slots__ = ('square_footage', 'charge_rate', 'tiers')
+
+    RESULT = MappingProxyType({
+        'printing_setup_cost': 0, 'finishing_setup_cost': 0, 'needs_finishing': False,
+        'production_cost': 0, 'material_cost': None, 'finishing_cost': 0, 'subtotal': None,
+        'rush_multiplier': None, 'total_cost': None, 'unit_price': None, 'square_footage': None,
+        'total_square_footage': None, 'material_rate': None, 'material_used': None,
+        'volume_discount': None, 'volume_savings': None})
+
+    def _costs(self, quantity):
+        total_square_footage = self.square_footage * quantity
+        volume_discount = self.tiers.lookup(total_square_footage)
+        total_material_cost = self.square_footage * self.charge_rate * volume_discount['multiplier'] * quantity
+        original_material_cost = self.square_footage * self.charge_rate * quantity
+        return ((total_material_cost,), total_material_cost, original_material_cost - total_material_cost,
+                (total_square_footage, volume_discount['discount']))
+
+    def _result(self, quantity, parts, subtotal, rush_multiplier, total_cost, unit_price, side, facts):
+        result = self._template.copy()
+        result['material_cost'] = parts[0]
+        result['subtotal'] = subtotal
+        result['rush_multiplier'] = rush_multiplier
+        result['total_cost'] = total_cost
+        result['unit_price'] = unit_price
+        total_square_footage, result['volume_discount'] = facts
+        result['total_square_footage'] = round(total_square_footage, 1)
+        result['volume_savings'] = side
+        result['config_version'] = self.config_version
+        return result
+
+
+class PerfectBoundPlan(PricingPlan):
+    """Perfect bound books: S_total = Q * (interior sheets + cover sheet)"""
+
+    __slots__ = ('total_sheets',)
+
+    RESULT = MappingProxyType(dict.fromkeys((
+        'printing_setup_cost', 'finishing_setup_cost', 'production_cost', 'material_cost',
+        'finishing_cost', 'subtotal', 'rush_multiplier', 'total_cost', 'unit_price',
+        'sheets_required', 'size', 'text_paper', 'cover_paper', 'pages', 'quantity',
+        'interior_sheets', 'cover_sheets')))
+
+    def _costs(self, quantity):
+        S_total = quantity * self.total_sheets
+        production_cost = (S_total ** self.e) * self.k
+        materials_cost = quantity * self.v
+        finishing_cost = quantity * self.f
+        subtotal = self.S + self.F_setup + production_cost + materials_cost + finishing_cost
+        return (self.S, self.F_setup, production_cost, materials_cost, finishing_cost), subtotal, None, None
+
+    def _result(self, quantity, parts, subtotal, rush_multiplier, total_cost, unit_price, side, facts):
+        result = self._template.copy()
+        (result['printing_setup_cost'], result['finishing_setup_cost'], result['production_cost'],
+         result['material_cost'], result['finishing_cost']) = parts
+        result['subtotal'] = subtotal
+        result['rush_multiplier'] = rush_multiplier
+        result['total_cost'] = total_cost
+        result['unit_price'] = unit_price
+        result['quantity'] = quantity
+        result['config_version'] = self.config_version
+        return result
+
+
+class PlanCompiler:
+    """
+    Resolves a product configuration against a PricingCalculator's config,
+    paper stocks and imposition into an immutable PricingPlan
+    """
+
+    def __init__(self, calculator):
+        self.calc = calculator
+        # One snapshot for the whole compile, even if the config is reloaded meanwhile
+        self.snapshot = calculator.snapshot
+        self.config = self.snapshot.config
+        self.paper_stocks = self.snapshot.paper_stocks
+        self._compilers = {
+            'flat-prints': self._compile_flat_print,
+            'folded-prints': self._compile_folded_print,
+            'booklets': self._compile_booklet,
+            'notebooks': self._compile_notebook,
+            'notepads': self._compile_notepad,
+            'posters': self._compile_poster,
+            'perfect-bound-books': self._compile_perfect_bound
+        }
+
+    def compile(self, product, *args, **options):
+        compiler = self._compilers.get(product)
+        if not compiler:
+            return {'error': f'Unknown product {product}'}
+        plan = compiler(*args, **options)
+        if isinstance(plan, PricingPlan):
+            plan._set(config_version=self.snapshot.version)
+        return plan
+
+    def _formula(self):
+        formula = self.config['formula']
+        return formula['setup_fee'], formula['finishing_setup_fee'], formula['base_production_rate'], formula['efficiency_exponent']
+
+    def _compile_flat_print(self, width, height, paper_code, printing_sides='double-sided',
+                            hole_punch=False, lanyard=False, rush_type='standard'):
+        paper = self.paper_stocks.get(paper_code)
+        if not paper:
+            return {'error': 'Invalid paper selection'}
+
+        S, _, k, e = self._formula()
+        clicks_per_piece = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        imposition_result = self.calc.imposition_calc.calculate_imposition(width, height)
+        if imposition_result.get('error'):
+            return {'error': imposition_result['error']}
+        imposition = imposition_result['copies']
+        if imposition == 0:
+            return {'error': 'Unable to calculate imposition for given dimensions'}
+
+        v = (paper['cost_per_sheet'] + clicks_per_piece) * 1.5 / imposition
+
+        f = 0
+        if paper_code != 'PAC51319WP':
+            if hole_punch:
+                f += 0.05
+            if lanyard:
+                f += 1.25
+
+        return SheetPlan('flat-prints', self.config['product_constraints']['flat-prints'],
+                         S, 0, k, e, v, f, self.calc._get_rush_multiplier(rush_type), imposition, 3,
+                         {'needs_finishing': f > 0, 'paper_used': paper['display_name'],
+                          'imposition': imposition, 'size': f'{width}"x{height}"'})
+
+    def _compile_folded_print(self, size, paper_code, fold_type='none',
+                              printing_sides='double-sided', rush_type='standard'):
+        paper = self.paper_stocks.get(paper_code)
+        if not paper:
+            return {'error': 'Invalid paper selection'}
+
+        S, F_setup, k, e = self._formula()
+        clicks_per_piece = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        width, height = self.calc._parse_size_string(size)
+        if fold_type == 'table-tent':
+            height = height * 2.5
+        imposition_result = self.calc.imposition_calc.calculate_imposition(width, height)
+        if imposition_result.get('error'):
+            return {'error': imposition_result['error']}
+        imposition = imposition_result['copies']
+        if imposition == 0:
+            return {'error': 'Unable to calculate imposition for given size'}
+
+        v = (paper['cost_per_sheet'] + clicks_per_piece) * 1.5 / imposition
+        f = self.config['finishing_costs']['folding'].get(fold_type, 0)
+        needs_finishing = fold_type and fold_type != 'none' and f > 0
+
+        return SheetPlan('folded-prints', self.config['product_constraints']['folded-prints'],
+                         S, F_setup if needs_finishing else 0, k, e, v, f,
+                         self.calc._get_rush_multiplier(rush_type), imposition, 3,
+                         {'needs_finishing': needs_finishing, 'paper_used': paper['display_name'],
+                          'imposition': imposition, 'fold_type': fold_type})
+
+    def _compile_booklet(self, size, pages, cover_paper_code, text_paper_code,
+                         printing_sides='double-sided', rush_type='standard'):
+        constraints = self.config['product_constraints']['booklets']
+        if pages < constraints['min_pages'] or pages > constraints['max_pages']:
+            return {'error': f"Page count must be between {constraints['min_pages']} and {constraints['max_pages']}"}
+        if pages % constraints['page_multiple'] != 0:
+            return {'error': f"Page count must be a multiple of {constraints['page_multiple']}"}
+
+        is_self_cover = cover_paper_code == 'SELF_COVER'
+        if is_self_cover:
+            text_paper = self.paper_stocks.get(text_paper_code)
+            cover_paper = text_paper
+            if not text_paper:
+                return {'error': 'Invalid text paper selection'}
+            cover_sheets_per_booklet = 0
+            text_sheets_per_booklet = pages / 4
+        else:
+            cover_paper = self.paper_stocks.get(cover_paper_code)
+            text_paper = self.paper_stocks.get(text_paper_code)
+            if not cover_paper or not text_paper:
+                return {'error': 'Invalid paper selection'}
+            cover_sheets_per_booklet = 1
+            text_sheets_per_booklet = (pages - 4) / 4
+
+        clicks_cost = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        width, height = self.calc._parse_size_string(size)
+        imposition = self.calc.imposition_calc.calculate_imposition(width, height).get('copies', 4)
+        multi_up_factor = 2 if (width <= 6.5 and height <= 9) else 1
+
+        sheets_per_booklet = cover_sheets_per_booklet + text_sheets_per_booklet
+        cover_cost = (cover_sheets_per_booklet * cover_paper['cost_per_sheet']) / multi_up_factor
+        text_cost = (text_sheets_per_booklet * text_paper['cost_per_sheet']) / multi_up_factor
+        click_cost = (sheets_per_booklet / multi_up_factor) * clicks_cost
+        v = (cover_cost + text_cost + click_cost) * 1.25
+
+        booklet_finishing = self.config['finishing_costs']['booklet_finishing']
+        cover_creasing = 0 if is_self_cover else booklet_finishing['cover_creasing']
+        f = booklet_finishing['base_labor'] + cover_creasing + (booklet_finishing['binding_per_sheet'] * text_sheets_per_booklet)
+
+        S, F_setup, k, e = self._formula()
+        return BookletPlan('booklets', constraints, (S * 2) + (2 * pages), F_setup, k, e, v, f,
+                           self.calc._get_rush_multiplier(rush_type), imposition, 3,
+                           {'needs_finishing': True,
+                            'cover_paper_used': 'Self Cover' if is_self_cover else cover_paper['display_name'],
+                            'text_paper_used': text_paper['display_name'],
+                            'pages': pages, 'imposition': imposition},
+                           sheets_per_booklet=sheets_per_booklet, multi_up_factor=multi_up_factor,
+                           cover_sheets_per_booklet=cover_sheets_per_booklet,
+                           text_sheets_per_booklet=text_sheets_per_booklet)
+
+    def _compile_notebook(self, width, height, pages, binding_type, cover_paper_code,
+                          text_paper_code, page_content='blank', printing_sides='double-sided',
+                          rush_type='standard'):
+        cover_paper = self.paper_stocks.get(cover_paper_code)
+        text_paper = self.paper_stocks.get(text_paper_code)
+        if not cover_paper or not text_paper:
+            return {'error': 'Invalid paper selection'}
+
+        S, F_setup, k, e = self._formula()
+        base_setup = 0 if page_content == 'blank' else S
+
+        imposition = self.calc.imposition_calc.calculate_imposition(width, height).get('copies', 2)
+        sides_multiplier = 2 if printing_sides == 'double-sided' else 1
+        clicks_cost = 0.10 if printing_sides == 'double-sided' else 0.05
+
+        cover_sheets_per_notebook = 1 / imposition
+        text_sheets_per_notebook = pages / (imposition * sides_multiplier)
+        total_clicks = 1 + round(text_sheets_per_notebook * sides_multiplier)
+
+        cover_cost = cover_sheets_per_notebook * cover_paper['cost_per_sheet']
+        text_cost = text_sheets_per_notebook * text_paper['cost_per_sheet']
+        v = (cover_cost + text_cost + total_clicks * clicks_cost) * 1.25
+
+        finishing_costs = self.config['finishing_costs']
+        return NotebookPlan('notebooks', self.config['product_constraints']['notebooks'],
+                            base_setup, F_setup, k, e, v, 0,
+                            self.calc._get_rush_multiplier(rush_type), imposition, 2,
+                            {'width': width, 'height': height, 'pages': pages,
+                             'binding_type': binding_type, 'cover_paper': cover_paper['display_name'],
+                             'text_paper': text_paper['display_name'], 'page_content': page_content,
+                             'imposition': imposition},
+                            sheets_per_notebook=cover_sheets_per_notebook + text_sheets_per_notebook,
+                            labor_cost=finishing_costs['notebook_labor'].get(binding_type, 2.50),
+                            binding_hardware=finishing_costs['notebook_binding'].get(binding_type, 0))
+
+    def _compile_notepad(self, width, height, sheets, text_paper_code, backing_paper_code,
+                         page_content='blank', printing_sides='single-sided', rush_type='standard'):
+        text_paper = self.paper_stocks.get(text_paper_code)
+        backing_paper = self.paper_stocks.get(backing_paper_code)
+        if not text_paper or not backing_paper:
+            return {'error': 'Invalid paper selection'}
+
+        S, F_setup, k, e = self._formula()
+        base_setup = S if page_content == 'custom' else 0
+
+        imposition = self.calc.imposition_calc.calculate_imposition(width, height).get('copies')
+        if not imposition:
+            return {'error': 'Unable to calculate imposition for given dimensions'}
+
+        return NotepadPlan('notepads', self.config['product_constraints']['notepads'],
+                           base_setup, F_setup, k, e, None, sheets * 0.01,
+                           self.calc._get_rush_multiplier(rush_type), imposition, 2,
+                           {'size': f'{width}" x {height}"', 'sheets': sheets,
+                            'text_paper': text_paper['display_name'],
+                            'backing_paper': backing_paper['display_name'],
+                            'page_content': page_content, 'imposition': imposition},
+                           sheets=sheets, text_cost=text_paper['cost_per_sheet'],
+                           clicks_cost=0.10 if printing_sides == 'double-sided' else 0.05,
+                           backing_cost=(1 / imposition) * backing_paper['cost_per_sheet'])
+
+    def _compile_poster(self, material_code, width=None, height=None, preset_size=None,
+                        rush_type='standard'):
+        material = self.paper_stocks.get(material_code)
+        if not material:
+            return {'error': f'Material {material_code} not found'}
+
+        if preset_size:
+            size_data = self.config['imposition_data']['posters'].get(preset_size)
+            if not size_data:
+                return {'error': f'Size {preset_size} not found for posters'}
+            square_footage = size_data['sqft']
+        else:
+            if not width or not height:
+                return {'error': 'Width and height required for custom size'}
+            if width < 6 or height < 6:
+                return {'error': 'Custom dimensions must be at least 6 inches'}
+            max_width = material.get('max_width', 54)
+            if width > max_width:
+                return {'error': f'Width cannot exceed {max_width} inches for this material'}
+            if height > 120:
+                return {'error': 'Height cannot exceed 120 inches'}
+            square_footage = (width * height) / 144
+            if square_footage > 50:
+                return {'error': 'Total area cannot exceed 50 square feet'}
+
+        return PosterPlan('posters', self.config['product_constraints']['posters'],
+                          0, 0, 0, 0, None, 0, self.calc._get_rush_multiplier(rush_type), None, 2,
+                          {'square_footage': round(square_footage, 1),
+                           'material_rate': round(material['charge_rate'], 2),
+                           'material_used': material['display_name']},
+                          square_footage=square_footage, charge_rate=material['charge_rate'],
+                          tiers=self.snapshot.poster_tiers)
+
+    def _compile_perfect_bound(self, width, height, pages, text_paper_code, cover_paper_code,
+                               printing_sides='double-sided', rush_type='standard'):
+        constraints = self.config['product_constraints']['perfect-bound-books']
+        if pages < constraints['min_pages'] or pages > constraints['max_pages']:
+            return {'error': f"Page count must be between {constraints['min_pages']} and {constraints['max_pages']}"}
+        if pages % constraints['page_multiple'] != 0:
+            return {'error': f"Page count must be in multiples of {constraints['page_multiple']}"}
+
+        text_paper = self.paper_stocks.get(text_paper_code)
+        cover_paper = self.paper_stocks.get(cover_paper_code)
+        if not text_paper or text_paper['type'] != 'text_stock':
+            return {'error': 'Please select a valid text paper'}
+        if not cover_paper or cover_paper['type'] != 'cover_stock':
+            return {'error': 'Please select a valid cover paper (cover stock required)'}
+        if int(cover_paper['weight'].replace('#', '')) < 80:
+            return {'error': 'Cover stock must be 80# or heavier for perfect binding'}
+
+        imposition_result = self.calc.imposition_calc.calculate_imposition(width, height)
+        if imposition_result.get('error'):
+            return {'error': imposition_result['error']}
+
+        sides_multiplier = 2 if printing_sides == 'double-sided' else 1
+        clicks_per_sheet = 0.10 if printing_sides == 'double-sided' else 0.05
+        pages_per_sheet = imposition_result['copies'] * sides_multiplier
+
+        interior_sheets = math.ceil((pages - 4) / pages_per_sheet)
+        cover_sheets = 1
+        total_sheets = interior_sheets + cover_sheets
+
+        interior_cost = interior_sheets * text_paper['cost_per_sheet']
+        cover_cost = cover_sheets * cover_paper['cost_per_sheet']
+        click_cost = interior_sheets * clicks_per_sheet + cover_sheets * 0.10
+        v = (interior_cost + cover_cost + click_cost) * 1.25
+
+        S, _, k, e = self._formula()
+        product_formula = self.config['product_formulas']['perfect-bound-books']
+        return PerfectBoundPlan('perfect-bound-books', constraints,
+                                S * product_formula['setup_fee_multiplier'],
+                                product_formula['finishing_setup_fee'], k, e, v,
+                                self.config['finishing_costs']['perfect_binding']['base_labor'],
+                                self.calc._get_rush_multiplier(rush_type), imposition_result['copies'], 3,
+                                {'size': f'{width}" x {height}"', 'text_paper': text_paper['display_name'],
+                                 'cover_paper': cover_paper['display_name'], 'pages': pages,
+                                 'interior_sheets': interior_sheets, 'cover_sheets': cover_sheets,
+                                 'sheets_required': total_sheets},
+                                total_sheets=total_sheets)
@@ -0,0 +1,95 @@
+from .dispatch import DIRECT_PRODUCTS, compile_normalized, normalize_request, price_normalized
+
+
+def _group_key(product, kwargs):
+    """Everything that determines the plan: the options without quantity and rush type"""
+    return product, tuple(sorted((name, value) for name, value in kwargs.items()
+                                 if name not in ('quantity', 'rush_type')))
+
+
+def price_quote(calculator, items):
+    """
+    Price a multi-item quote or cart. Items are loosely typed rows in the
+    bulk CLI / cart format; see price_quote_normalized for the result.
+    """
+    return price_quote_normalized(calculator, [normalize_request(item) for item in items])
+
+
+def price_quote_normalized(calculator, requests):
+    """
+    Price (product, kwargs, error) requests as one quote.
+
+    Items are grouped by configuration: each group's plan is compiled once
+    (one paper, imposition and finishing resolution), each distinct quantity
+    in it is evaluated once, and rush is applied per item on top, so the same
+    product at several quantities and rush types shares all of that work.
+    Repeated identical lines are priced once.
+    Returns {'items': [result per request, in order], 'totals': {...}} with
+    results equal to those of calculate_*.
+    """
+    plans = {}
+    costs = {}
+    rush_multipliers = {}
+    priced = {}
+    results = []
+    total_cents = 0
+    errors = 0
+
+    for product, kwargs, error in requests:
+        if error:
+            results.append({'error': error})
+            errors += 1
+            continue
+
+        # Identical lines (same configuration, quantity and rush) are priced once
+        item_key = (product, tuple(sorted(kwargs.items())))
+        result = priced.get(item_key)
+        if result is None:
+            if product in DIRECT_PRODUCTS:
+                result = price_normalized(calculator, product, kwargs)
+            else:
+                key = _group_key(product, kwargs)
+                plan = plans.get(key)
+                if plan is None:
+                    plan = plans[key] = compile_normalized(calculator, product, kwargs)
+                result = _plan_result(calculator, plan, key, kwargs, costs, rush_multipliers)
+            priced[item_key] = result
+        result = dict(result)
+
+        if 'error' in result:
+            errors += 1
+        else:
+            total_cents += round(result['total_cost'] * 100)
+        results.append(result)
+
+    return {
+        'items': results,
+        'totals': {
+            'items': len(results),
+            'errors': errors,
+            'total_cost': total_cents / 100,
+            'distinct_items': len(priced),
+            'configurations': len(plans),
+            'evaluations': len(costs),
+            'config_version': calculator.snapshot.version
+        }
+    }
+
+
+def _plan_result(calculator, plan, key, kwargs, costs, rush_multipliers):
+    if isinstance(plan, dict):
+        return plan
+
+    quantity = kwargs['quantity']
+    if quantity < plan.min_quantity or quantity > plan.max_quantity:
+        return {'error': f'Quantity must be between {plan.min_quantity} and {plan.max_quantity}'}
+    quantity_costs = costs.get((key, quantity))
+    if quantity_costs is None:
+        quantity_costs = costs[(key, quantity)] = plan._costs(quantity)
+
+    rush_type = kwargs.get('rush_type', 'standard')
+    rush_multiplier = rush_multipliers.get(rush_type)
+    if rush_multiplier is None:
+        rush_multiplier = rush_multipliers[rush_type] = calculator._get_rush_multiplier(rush_type)
+
+    return calculator._plan_breakdown(plan, quantity, quantity_costs, rush_multiplier)
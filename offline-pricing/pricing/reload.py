@@ -0,0 +1,168 @@
+import copy
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from .snapshot import compile_snapshot, default_store, read_snapshot
+
+
+# Local stand-in for the pricing_configs and paper_stocks tables in sql/schema.sql,
+# with its updated_at triggers: poll() detects changes by row count and newest
+# updated_at, so every UPDATE must bump the timestamp
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS pricing_configs (
+    config_key TEXT PRIMARY KEY,
+    config_value TEXT NOT NULL,
+    description TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS paper_stocks (
+    code TEXT PRIMARY KEY,
+    brand TEXT,
+    type TEXT NOT NULL,
+    finish TEXT,
+    size TEXT,
+    weight TEXT,
+    cost_per_sheet REAL NOT NULL,
+    display_name TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TRIGGER IF NOT EXISTS update_pricing_configs_updated_at AFTER UPDATE ON pricing_configs
+WHEN NEW.updated_at = OLD.updated_at BEGIN
+    UPDATE pricing_configs SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE rowid = NEW.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS update_paper_stocks_updated_at AFTER UPDATE ON paper_stocks
+WHEN NEW.updated_at = OLD.updated_at BEGIN
+    UPDATE paper_stocks SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE rowid = NEW.rowid;
+END;
+'''
+
+PAPER_COLUMNS = ('brand', 'type', 'finish', 'size', 'weight', 'cost_per_sheet', 'display_name')
+
+
+class FileSnapshotSource:
+    """Reloads when the snapshot file written by `python -m pricing snapshot` changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._stamp = None
+
+    def poll(self):
+        """Return a new snapshot if the file changed since the last poll, else None"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return None
+        self._stamp = stamp
+        return read_snapshot(self.path)
+
+
+class SQLiteConfigSource:
+    """
+    Overlays active pricing_configs rows (one top-level config key each, value
+    as JSON) and paper_stocks rows onto the base snapshot. Inactive paper rows
+    remove that stock.
+    """
+
+    def __init__(self, path, base=None):
+        self.path = path
+        self.base = base or default_store().snapshot
+        self._stamp = None
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(SQLITE_SCHEMA)
+        return connection
+
+    def poll(self):
+        with self.connect() as connection:
+            stamp = connection.execute(
+                'SELECT (SELECT count(*) || max(updated_at) FROM pricing_configs), '
+                '(SELECT count(*) || max(updated_at) FROM paper_stocks)').fetchone()
+            if stamp == self._stamp:
+                return None
+            configs = connection.execute(
+                'SELECT config_key, config_value FROM pricing_configs WHERE is_active').fetchall()
+            papers = connection.execute(
+                f'SELECT code, is_active, {", ".join(PAPER_COLUMNS)} FROM paper_stocks').fetchall()
+        self._stamp = stamp
+
+        config = copy.deepcopy(self.base.config)
+        for key, value in configs:
+            config[key] = json.loads(value)
+
+        paper_stocks = dict(self.base.paper_stocks)
+        for code, is_active, *values in papers:
+            if not is_active:
+                paper_stocks.pop(code, None)
+                continue
+            row = {name: value for name, value in zip(PAPER_COLUMNS, values) if value is not None}
+            paper_stocks[code] = {**paper_stocks.get(code, {}), **row}
+
+        return compile_snapshot(config, paper_stocks, self.base.promo_config)
+
+
+def source_for(path):
+    """SQLite databases by extension, anything else is a snapshot file"""
+    if path.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SQLiteConfigSource(path)
+    return FileSnapshotSource(path)
+
+
+class ConfigWatcher:
+    """
+    Polls a source and swaps new versions into a ConfigStore. An invalid
+    config is reported and skipped; the store keeps serving the last good one.
+    """
+
+    def __init__(self, source, store=None, interval=2.0):
+        self.source = source
+        self.store = store or default_store()
+        self.interval = interval
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Poll once; returns the changed sections of a swap, or None"""
+        try:
+            snapshot = self.source.poll()
+        except (ValueError, sqlite3.Error) as e:
+            self.last_error = str(e)
+            print(f'Pricing config reload failed: {e}', file=sys.stderr)
+            return None
+        if snapshot is None or snapshot.version == self.store.version:
+            return None
+        self.last_error = None
+        changed = self.store.swap(snapshot)
+        print(f'Pricing config reloaded: version {snapshot.version} '
+              f'({", ".join(sorted(changed))})', file=sys.stderr)
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Anything else (a broken source or swap listener) is reported
+                # the same way; the thread keeps polling for the next change
+                self.last_error = f'{type(e).__name__}: {e}'
+                print(f'Pricing config reload failed: {self.last_error}', file=sys.stderr)
+
+    def start(self):
+        self.check()
+        self._thread = threading.Thread(target=self._run, name='pricing-config-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
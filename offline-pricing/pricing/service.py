@@ -0,0 +1,402 @@
+import asyncio
+import json
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from .calculator import PricingCalculator
+from .dispatch import normalize_request, price_normalized
+from .instrumentation import EXPORTERS, Instrumentation
+from .quote import price_quote_normalized
+from .reload import ConfigWatcher, source_for
+
+
+# Public calculator methods reachable as POST /<method>
+EXPOSED_METHODS = (
+    'calculate_flat_print_price',
+    'calculate_folded_print_price',
+    'calculate_booklet_price',
+    'calculate_notebook_price',
+    'calculate_notepad_price',
+    'calculate_poster_price',
+    'calculate_vinyl_sticker_price',
+    'calculate_perfect_bound_price',
+    'calculate_envelope_price',
+    'calculate_magnet_price',
+    'calculate_sticker_price',
+    'find_quantity_for_unit_price',
+    'find_quantity_for_total_price',
+    'find_price_breaks',
+    'suggest_sizes'
+)
+
+# Solver calls can take milliseconds, so they run on the worker thread where
+# identical concurrent requests are coalesced; plain quotes are cheaper than the
+# thread hop and run inline on the event loop.
+OFFLOADED_METHODS = ('find_quantity_for_unit_price', 'find_quantity_for_total_price', 'find_price_breaks',
+                     'calculate_vinyl_sticker_price')
+
+# Quotes built only from the promo config; everything else depends on the pricing config
+PROMO_METHODS = ('calculate_magnet_price', 'calculate_sticker_price')
+PROMO_PRODUCTS = ('magnets', 'stickers')
+
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+
+def _cache_tags(promo, kwargs):
+    """Config sections a response was computed from (see snapshot.changed_sections)"""
+    tags = {'promo' if promo else 'pricing'}
+    tags.update(f'paper:{value}' for name, value in kwargs.items()
+                if name.endswith('_code') and isinstance(value, str))
+    return frozenset(tags)
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache whose entries also expire after ttl seconds. Keys start
+    with the config version they were computed under and entries carry the
+    config sections they depend on, so a reload evicts only those and moves
+    the rest to the new version.
+    """
+
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value, tags=frozenset()):
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, old_version, new_version, changed):
+        """
+        Re-key entries from old_version to new_version, dropping those that
+        depend on any of the changed config sections or on another version
+        """
+        entries = OrderedDict()
+        for key, entry in self._entries.items():
+            if key[0] == new_version:
+                entries[key] = entry
+            elif key[0] == old_version and not entry[2] & changed:
+                entries[(new_version, *key[1:])] = entry
+        stale = len(self._entries) - len(entries)
+        self._entries = entries
+        self.evictions += stale
+        return stale
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LatencyRecorder:
+    """Keeps the most recent request latencies for percentile reporting"""
+
+    def __init__(self, window=10000):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p):
+        if not self._samples:
+            return 0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def snapshot(self):
+        return {
+            'requests': self.count,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p99_ms': round(self.percentile(99) * 1000, 3)
+        }
+
+
+class PricingService:
+    """
+    asyncio HTTP/JSON front end for PricingCalculator.
+    Identical concurrent requests are coalesced into one computation and
+    results are kept in a TTL/LRU cache keyed on normalized parameters.
+    """
+
+    def __init__(self, calculator=None, cache_size=10000, cache_ttl=300, instrument=False):
+        self.calc = calculator or PricingCalculator()
+        self.instrumentation = Instrumentation().attach(self.calc) if instrument else None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pricing')
+        self.cache = ResponseCache(cache_size, cache_ttl)
+        self.latency = LatencyRecorder()
+        self._in_flight = {}
+        self.coalesced = 0
+        self._loop = None
+        if self.calc.store is not None:
+            self.calc.store.subscribe(self)
+
+    def on_config_swap(self, old, new, changed):
+        """Called from the watcher thread; the cache is only touched on the event loop"""
+        if old is None:
+            return
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self.cache.evict, old.version, new.version, changed)
+        else:
+            self.cache.evict(old.version, new.version, changed)
+
+    def _key(self, method, kwargs):
+        # Versioned, so a response is never served under a config it wasn't computed with
+        return self.calc.snapshot.version, method, json.dumps(kwargs, sort_keys=True, separators=(',', ':'))
+
+    async def _compute(self, key, compute, tags, offload=False):
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # The key carries the config version, so requests are only coalesced
+        # with work started under the same config
+        version = key[0]
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            if offload:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, compute)
+            else:
+                result = compute()
+            # A reload that landed mid-computation would make this entry stale
+            if 'error' not in result and self.calc.snapshot.version == version:
+                self.cache.put(key, result, tags)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Marks it retrieved, so a failure nobody coalesced onto is not logged twice
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    async def call(self, method, kwargs):
+        """Run one exposed calculator method"""
+        if method not in EXPOSED_METHODS:
+            return {'error': f'Unknown method {method}'}
+        if not isinstance(kwargs, dict):
+            return {'error': 'Request body must be a JSON object'}
+
+        def compute():
+            try:
+                return getattr(self.calc, method)(**kwargs)
+            except TypeError as e:
+                return {'error': f'Missing or unexpected option: {e}'}
+            except (KeyError, ValueError, ZeroDivisionError) as e:
+                return {'error': f'Unable to run {method}: {e!r}'}
+
+        return await self._compute(self._key(method, kwargs), compute,
+                                   _cache_tags(method in PROMO_METHODS, kwargs),
+                                   method in OFFLOADED_METHODS)
+
+    async def quote(self, row):
+        """Price a loosely typed product row (same format as the bulk CLI)"""
+        if not isinstance(row, dict):
+            return {'error': 'Request body must be a JSON object'}
+        product, kwargs, error = normalize_request(row)
+        if error:
+            return {'error': error}
+        return await self._compute(self._key(product, kwargs),
+                                   lambda: price_normalized(self.calc, product, kwargs),
+                                   _cache_tags(product in PROMO_PRODUCTS, kwargs))
+
+    async def price_quote(self, payload):
+        """Price a whole quote: {"items": [rows]} or a bare list of rows, as one request"""
+        items = payload.get('items') if isinstance(payload, dict) else payload
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return {'error': 'Request body must be a list of item objects (or {"items": [...]})'}
+        requests = [normalize_request(item) for item in items]
+        tags = set()
+        for product, kwargs, error in requests:
+            if not error:
+                tags.update(_cache_tags(product in PROMO_PRODUCTS, kwargs))
+        # Large quotes take milliseconds, so they run on the worker thread
+        return await self._compute(self._key('price_quote', requests),
+                                   lambda: price_quote_normalized(self.calc, requests),
+                                   frozenset(tags), offload=True)
+
+    async def dispatch(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {'status': 'ok'}
+        if method == 'GET' and path == '/metrics':
+            return HTTPStatus.OK, self.metrics()
+        if path.startswith(('/metrics/', '/profile/')):
+            return self._instrumentation_route(method, path)
+        if method != 'POST':
+            return HTTPStatus.NOT_FOUND, {'error': f'No route for {method} {path}'}
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {'error': 'Invalid JSON body'}
+
+        name = path.strip('/')
+        if name == 'price_quote':
+            return HTTPStatus.OK, await self.price_quote(payload)
+        if name == 'quote':
+            handler = self.quote
+        elif name in EXPOSED_METHODS:
+            handler = lambda kwargs: self.call(name, kwargs)
+        else:
+            return HTTPStatus.NOT_FOUND, {'error': f'No route for {method} {path}'}
+
+        # A JSON array body is a batch: each element is priced independently
+        if isinstance(payload, list):
+            results = await asyncio.gather(*(handler(item) for item in payload), return_exceptions=True)
+            return HTTPStatus.OK, [{'error': f'Internal error: {result!r}'} if isinstance(result, Exception) else result
+                                   for result in results]
+        return HTTPStatus.OK, await handler(payload)
+
+    def _instrumentation_route(self, method, path):
+        """GET /metrics/<exporter>, POST /profile/start[?sampling] and POST /profile/stop"""
+        if self.instrumentation is None:
+            return HTTPStatus.NOT_FOUND, {'error': 'Instrumentation is disabled (serve --instrument)'}
+        route, _, query = path.partition('?')
+        if method == 'GET' and route.startswith('/metrics/'):
+            fmt = route[len('/metrics/'):]
+            if fmt not in EXPORTERS:
+                return HTTPStatus.NOT_FOUND, {'error': f'Unknown exporter {fmt}'}
+            return HTTPStatus.OK, self.instrumentation.export(fmt)
+        if method == 'POST' and route == '/profile/start':
+            self.instrumentation.start_profile(sampling='sampling' in query)
+            return HTTPStatus.OK, {'profiling': True}
+        if method == 'POST' and route == '/profile/stop':
+            return HTTPStatus.OK, self.instrumentation.stop_profile()
+        return HTTPStatus.NOT_FOUND, {'error': f'No route for {method} {path}'}
+
+    def metrics(self):
+        metrics = {
+            **self.latency.snapshot(),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'cache_entries': len(self.cache),
+            'cache_evictions': self.cache.evictions,
+            'config_version': self.calc.snapshot.version,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+            'imposition': self.calc.imposition_calc.cache_info()
+        }
+        if self.instrumentation is not None:
+            metrics['instrumentation'] = self.instrumentation.snapshot()
+        return metrics
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it closes"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'Malformed request line'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {'error': 'Invalid Content-Length'}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'Request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+
+                started = time.perf_counter()
+                if not path.startswith('/profile/'):
+                    path = path.split('?', 1)[0]
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except Exception as e:
+                    # A bug in one route must still answer, not drop the connection
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f'Internal error: {e!r}'}
+                self.latency.record(time.perf_counter() - started)
+
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        # Exporters and profiler reports are plain text; everything else is JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload, separators=(',', ':')).encode(), 'application/json'
+        head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        self._loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        print(f'Pricing service listening on http://{host}:{port}', file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def run_service(args):
+    """Entry point for `python -m pricing serve`"""
+    service = PricingService(cache_size=args.cache_size, cache_ttl=args.cache_ttl,
+                             instrument=args.instrument)
+    service.calc.imposition_calc.prewarm()
+    watcher = None
+    if args.watch:
+        watcher = ConfigWatcher(source_for(args.watch), service.calc.store, args.watch_interval).start()
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher:
+            watcher.stop()
+    return 0
@@ -0,0 +1,187 @@
+import bisect
+import math
+
+
+# Products priced from a free width x height that goes through imposition
+SIZE_PRODUCTS = ('flat-prints', 'notebooks', 'notepads', 'perfect-bound-books')
+
+
+class SizeIndex:
+    """
+    Imposition breakpoints for one sheet specification.
+
+    A layout of `across` x `down` copies fits every trim size up to a corner
+    (the largest 1/8" grid size whose bleed box still fits that many times
+    across and down, in either orientation). Corners no other corner beats on
+    width, height and copies at once are kept, sorted by width, so a query is
+    a bisect on the smallest width the tolerance allows followed by a scan of
+    the few wider corners. Indexes are shared by every calculator with the
+    same sheet specification, like the imposition table.
+    """
+
+    _indexes = {}
+
+    def __init__(self, imposition_calc):
+        self.imposition_calc = imposition_calc
+        self.grid = imposition_calc.GRID
+        self.corners = self._corners()
+        self.widths = [width for width, _, _ in self.corners]
+
+    @classmethod
+    def for_calculator(cls, imposition_calc):
+        index = cls._indexes.get(imposition_calc._spec_key())
+        if index is None:
+            # Threads racing to build the same index all end up sharing the first one stored
+            index = cls._indexes.setdefault(imposition_calc._spec_key(), cls(imposition_calc))
+        return index
+
+    def _largest_fit(self, extent, count, limit):
+        """Largest grid trim (in grid steps, at most limit) fitting count times into extent"""
+        calc = self.imposition_calc
+        steps = min(math.floor((extent / count - 2 * calc.BLEED) * self.grid), limit)
+        while steps > 0 and math.floor(extent / (steps / self.grid + 2 * calc.BLEED)) < count:
+            steps -= 1
+        return steps
+
+    def _corners(self):
+        calc = self.imposition_calc
+        first, last_width, last_height = calc._grid_bounds()
+        min_bleed = calc.MIN_SIZE + 2 * calc.BLEED
+        corners = {}
+        for across in range(1, math.floor(calc.PRINTABLE_WIDTH / min_bleed) + 1):
+            for down in range(1, math.floor(calc.PRINTABLE_HEIGHT / min_bleed) + 1):
+                # Portrait stacks the trim width across the sheet width;
+                # landscape turns it so the trim height runs across
+                candidates = (
+                    (self._largest_fit(calc.PRINTABLE_WIDTH, across, last_width),
+                     self._largest_fit(calc.PRINTABLE_HEIGHT, down, last_height)),
+                    (self._largest_fit(calc.PRINTABLE_HEIGHT, down, last_width),
+                     self._largest_fit(calc.PRINTABLE_WIDTH, across, last_height))
+                )
+                for width, height in candidates:
+                    if width >= first and height >= first:
+                        copies = calc.calculate_imposition(width / self.grid, height / self.grid)['copies']
+                        corners[(width, height)] = max(copies, corners.get((width, height), 0))
+
+        # Drop corners another corner covers with at least as many copies
+        kept = []
+        for (width, height), copies in sorted(corners.items(), key=lambda item: -item[1]):
+            if not any(w >= width and h >= height for w, h, _ in kept):
+                kept.append((width, height, copies))
+        return sorted(kept)
+
+    def candidates(self, width, height, tolerance, current_copies):
+        """
+        Grid sizes within tolerance of width x height (shrinking only) that
+        fit more than current_copies, as (width, height) in inches
+        """
+        calc = self.imposition_calc
+        grid = self.grid
+        min_width = max(width * (1 - tolerance), calc.MIN_SIZE)
+        min_height = max(height * (1 - tolerance), calc.MIN_SIZE)
+        sizes = set()
+        for i in range(bisect.bisect_left(self.widths, min_width * grid - 1e-9), len(self.corners)):
+            corner_width, corner_height, copies = self.corners[i]
+            if copies <= current_copies or corner_height < min_height * grid - 1e-9:
+                continue
+            # The nearest size under this corner keeps whichever side already fits
+            suggested_width = width if width <= corner_width / grid else corner_width / grid
+            suggested_height = height if height <= corner_height / grid else corner_height / grid
+            sizes.add((suggested_width, suggested_height))
+        return sizes
+
+
+def suggest_sizes(calculator, width, height, tolerance=0.2, limit=3, product='flat-prints',
+                  quantity=None, **options):
+    """
+    Nearest trim sizes within tolerance (a fraction of each side) that raise
+    copies per sheet, nearest first; each further suggestion fits more copies
+    than the one before. With a quantity (and the product's other options)
+    each suggestion also carries its price and the per-unit saving.
+    """
+    if product not in SIZE_PRODUCTS:
+        return {'error': f'Size suggestions need a product priced by width and height ({", ".join(SIZE_PRODUCTS)})'}
+    if not 0 <= tolerance < 1:
+        return {'error': 'Tolerance must be at least 0 and below 1'}
+
+    imposition_calc = calculator.imposition_calc
+    current = imposition_calc.calculate_imposition(width, height)
+    # An oversized request fits nothing, so any size within tolerance that fits is an improvement
+    if current.get('copies') == 0 and 'too large' not in (current.get('error') or ''):
+        return {'error': current['error']}
+
+    index = SizeIndex.for_calculator(imposition_calc)
+    ranked = []
+    for suggested_width, suggested_height in index.candidates(width, height, tolerance, current['copies']):
+        imposition = imposition_calc.calculate_imposition(suggested_width, suggested_height)
+        ranked.append((1 - suggested_width * suggested_height / (width * height), -imposition['copies'],
+                       suggested_width, suggested_height, imposition))
+    ranked.sort(key=lambda entry: entry[:2])
+
+    suggestions = []
+    best = current['copies']
+    for area_change, _, suggested_width, suggested_height, imposition in ranked:
+        if imposition['copies'] <= best:
+            continue
+        best = imposition['copies']
+        suggestions.append({
+            'width': suggested_width,
+            'height': suggested_height,
+            'copies': imposition['copies'],
+            'efficiency': imposition['efficiency'],
+            'orientation': imposition['orientation'],
+            'improvement': imposition['copies'] - current['copies'],
+            'area_change_percent': round(-area_change * 100, 1)
+        })
+        if len(suggestions) >= limit:
+            break
+
+    result = {
+        'width': width,
+        'height': height,
+        'copies': current['copies'],
+        'efficiency': current['efficiency'],
+        'suggestions': suggestions
+    }
+    if quantity is not None:
+        _add_savings(calculator, result, product, quantity, options)
+    return result
+
+
+def _plan_price(calculator, product, width, height, quantity, options):
+    try:
+        plan = calculator.compile_plan(product, width=width, height=height, **options)
+    except TypeError as e:
+        return None, f'Missing or unexpected option: {e}'
+    if isinstance(plan, dict):
+        return None, plan['error']
+    if quantity < plan.min_quantity or quantity > plan.max_quantity:
+        return None, f'Quantity must be between {plan.min_quantity} and {plan.max_quantity}'
+    # Through the calculator's breakdown so exact-money calculators round their own way
+    return calculator._plan_breakdown(plan, quantity, plan._costs(quantity), plan.r), None
+
+
+def _add_savings(calculator, result, product, quantity, options):
+    """Price the requested size and every suggestion at quantity"""
+    current, error = _plan_price(calculator, product, result['width'], result['height'], quantity, options)
+    if error:
+        result['pricing_error'] = error
+        # The suggestions share the options, so only an oversized request can still price them
+        if result['copies']:
+            return
+    else:
+        result['unit_price'] = current['unit_price']
+        result['total_cost'] = current['total_cost']
+    for suggestion in result['suggestions']:
+        price, error = _plan_price(calculator, product, suggestion['width'], suggestion['height'],
+                                   quantity, options)
+        if error:
+            suggestion['pricing_error'] = error
+            continue
+        suggestion['unit_price'] = price['unit_price']
+        suggestion['total_cost'] = price['total_cost']
+        if current is not None:
+            suggestion['unit_savings'] = round(current['unit_price'] - price['unit_price'], 3)
+            suggestion['total_savings'] = round(current['total_cost'] - price['total_cost'], 2)
+            suggestion['savings_percent'] = round((current['total_cost'] - price['total_cost'])
+                                                  / current['total_cost'] * 100, 1) if current['total_cost'] else 0
@@ -0,0 +1,397 @@
+import marshal
+import os
+import sys
+import time
+from _thread import allocate_lock
+from _weakrefset import WeakSet  # weakref itself adds ~1ms to cold start
+
+from .tiers import BracketCurve, TierIndex
+
+
+# marshal output is only stable within one interpreter version, so that is
+# part of the format key and a snapshot from another Python is ignored
+SNAPSHOT_FORMAT = (1, marshal.version, sys.version_info[:2])
+SNAPSHOT_ENV = 'PRICING_SNAPSHOT'
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'build', 'pricing-snapshot.bin')
+
+# module -> attribute holding its dict
+CONFIG_SOURCES = {
+    'config.pricing_config': 'PRICING_CONFIG',
+    'config.paper_stocks': 'PAPER_STOCKS',
+    'config.promo_config': 'PROMO_CONFIG'
+}
+
+# Sources that may be absent; without promo_config no promo products are offered
+OPTIONAL_SOURCES = {
+    'config.promo_config': {'products': {}, 'pricing': {'rush_multipliers': {}}}
+}
+
+# envelope_config is optional: without it envelopes are not offered
+REQUIRED_CONFIG_KEYS = ('formula', 'product_constraints', 'finishing_costs', 'rush_multipliers',
+                        'large_format_volume_discounts', 'imposition_data')
+REQUIRED_FORMULA_KEYS = ('setup_fee', 'finishing_setup_fee', 'base_production_rate', 'efficiency_exponent')
+PAPER_COST_KEYS = ('cost_per_sheet', 'charge_rate', 'cost_per_unit')
+# Expected type of each section (when present); the other checks look inside them
+CONFIG_SECTION_TYPES = {
+    'formula': dict, 'product_formulas': dict, 'product_constraints': dict, 'imposition_data': dict,
+    'finishing_costs': dict, 'rush_multipliers': dict, 'large_format_volume_discounts': list,
+    'envelope_config': dict, 'vinyl_stickers': dict
+}
+PROMO_SECTION_TYPES = {'pricing': dict, 'products': dict}
+
+# In-house kiss-cut vinyl stickers, used when the pricing config has no
+# vinyl_stickers section (a section there overrides these keys). Each tier
+# runs from its min_sqft up to the next tier's, on the whole order's square
+# footage; per-sticker square feet are rounded to sqft_digits before pricing
+# as on the price sheet (None prices the exact area).
+DEFAULT_VINYL_STICKERS = {
+    'rate_per_sqft': 12.00,
+    'setup_fee_per_design': 30.00,
+    'max_width': 54,
+    'sqft_digits': 3,
+    'volume_discounts': [
+        {'min_sqft': 0, 'discount': 0, 'multiplier': 1.00, 'description': 'Standard Rate'},
+        {'min_sqft': 15, 'discount': 5, 'multiplier': 0.95, 'description': '5% Volume Discount'},
+        {'min_sqft': 30, 'discount': 10, 'multiplier': 0.90, 'description': '10% Volume Discount'},
+        {'min_sqft': 45, 'discount': 15, 'multiplier': 0.85, 'description': '15% Volume Discount'},
+        {'min_sqft': 60, 'discount': 20, 'multiplier': 0.80, 'description': '20% Volume Discount'},
+        {'min_sqft': 75, 'discount': 25, 'multiplier': 0.75, 'description': '25% Maximum Discount'}
+    ]
+}
+
+
+class ConfigSnapshot:
+    """
+    Validated pricing config, promo config and compiled tier indexes, with a
+    content-derived version. Paper stocks are the bulk of the data and most
+    processes only touch a few, so a snapshot loaded from disk keeps them
+    serialized until first accessed.
+
+    A snapshot is never changed once built: a config change is a new
+    snapshot installed with ConfigStore.swap(), so calculators shared across
+    threads read it without locks.
+    """
+
+    __slots__ = ('version', 'built_at', 'config', 'promo_config', 'poster_tiers',
+                 'envelope_rates', 'envelope_discounts', 'vinyl_stickers', 'vinyl_tiers',
+                 '_paper_stocks', '_paper_blob')
+
+    def __init__(self, version, config, promo_config, paper_stocks=None, paper_blob=None,
+                 built_at=None):
+        self.version = version
+        self.built_at = built_at or time.time()
+        self.config = config
+        self.promo_config = promo_config
+        self._paper_stocks = paper_stocks
+        self._paper_blob = paper_blob
+        self._compile_tiers()
+
+    def _compile_tiers(self):
+        self.poster_tiers = TierIndex.from_records(
+            self.config['large_format_volume_discounts'], 'min_sqft', 'max_sqft',
+            default={'discount': 0, 'multiplier': 1.00})
+
+        envelope_config = self.config.get('envelope_config')
+        if envelope_config is None:
+            self.envelope_rates = {}
+            self.envelope_discounts = None
+        else:
+            self.envelope_rates = {
+                print_type: TierIndex.from_thresholds(
+                    {float(tier): rate for tier, rate in rates.items() if tier != 'base'},
+                    default=rates['base'])
+                for print_type, rates in envelope_config['impression_rates'].items()
+            }
+            discount_tiers = envelope_config['volume_discount_tiers']
+            self.envelope_discounts = TierIndex.from_records(
+                discount_tiers, 'min_qty', 'max_qty', default=discount_tiers[0])
+
+        self.vinyl_stickers = {**DEFAULT_VINYL_STICKERS, **self.config.get('vinyl_stickers', {})}
+        vinyl_tiers = self.vinyl_stickers['volume_discounts']
+        self.vinyl_tiers = TierIndex.from_thresholds(
+            {tier['min_sqft']: tier for tier in vinyl_tiers}, default=vinyl_tiers[0])
+
+    @property
+    def paper_stocks(self):
+        paper_stocks = self._paper_stocks
+        if paper_stocks is None:
+            blob = self._paper_blob
+            if blob is None:
+                # Another thread decoded it between the two reads
+                return self._paper_stocks
+            paper_stocks = self._paper_stocks = marshal.loads(blob)
+            self._paper_blob = None
+        return paper_stocks
+
+    def __repr__(self):
+        return f'ConfigSnapshot(version={self.version!r})'
+
+
+def _import_source(module_name):
+    try:
+        __import__(module_name)
+        module = sys.modules[module_name]
+    except ModuleNotFoundError as e:
+        if e.name != module_name or module_name not in OPTIONAL_SOURCES:
+            raise
+        return OPTIONAL_SOURCES[module_name]
+    return getattr(module, CONFIG_SOURCES[module_name])
+
+
+def _detached_source(module_name):
+    """Private copy of a config module's dict (the same round trip a snapshot file makes)"""
+    return marshal.loads(marshal.dumps(_import_source(module_name)))
+
+
+def _canonical(value):
+    """JSON-safe form with dict keys stringified and sorted, for hashing"""
+    if isinstance(value, dict):
+        return [[str(k), _canonical(v)] for k, v in sorted(value.items(), key=lambda item: str(item[0]))]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def config_version(config, paper_stocks, promo_config):
+    """Short content hash identifying one set of pricing data"""
+    # Only needed when building or when no snapshot file exists, so these
+    # stay off the cold-start import path
+    import hashlib
+    import json
+
+    payload = json.dumps(_canonical([config, paper_stocks, promo_config]), separators=(',', ':'),
+                         default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def validate_config(config, paper_stocks, promo_config):
+    """Return a list of problems that would make pricing fail or misprice"""
+    problems = _shape_problems(config, paper_stocks, promo_config)
+    if problems:
+        return problems
+    for key in REQUIRED_CONFIG_KEYS:
+        if key not in config:
+            problems.append(f'pricing config is missing {key}')
+    for key in REQUIRED_FORMULA_KEYS:
+        if not isinstance(config.get('formula', {}).get(key), (int, float)):
+            problems.append(f'formula.{key} must be a number')
+
+    for product, constraints in config.get('product_constraints', {}).items():
+        bounds = [constraints.get(key, 0) for key in ('min_quantity', 'max_quantity')]
+        if any(not isinstance(bound, (int, float)) for bound in bounds):
+            problems.append(f'{product}: min_quantity and max_quantity must be numbers')
+        elif bounds[0] > bounds[1]:
+            problems.append(f'{product}: min_quantity exceeds max_quantity')
+
+    try:
+        ConfigSnapshot('check', config, promo_config, paper_stocks)
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+        problems.append(f'volume tiers: {e!r}')
+
+    for code, paper in paper_stocks.items():
+        if 'display_name' not in paper or 'type' not in paper:
+            problems.append(f'paper {code} needs display_name and type')
+        costs = [paper[key] for key in PAPER_COST_KEYS if key in paper]
+        if not costs or any(not isinstance(cost, (int, float)) or cost < 0 for cost in costs):
+            problems.append(f'paper {code} needs a non-negative {"/".join(PAPER_COST_KEYS)}')
+
+    for product, settings in promo_config.get('products', {}).items():
+        for size, costs in settings.get('supplier_costs', {}).items():
+            try:
+                BracketCurve(settings.get('quantity_brackets', ()), costs)
+            except (TypeError, ValueError) as e:
+                problems.append(f'promo {product} {size}: {e}')
+    return problems
+
+
+def _shape_problems(config, paper_stocks, promo_config):
+    """Sections of the wrong type, which would break the checks that look inside them"""
+    for name, value in (('pricing config', config), ('paper stocks', paper_stocks),
+                        ('promo config', promo_config)):
+        if not isinstance(value, dict):
+            return [f'{name} must be a dict, not {type(value).__name__}']
+
+    problems = []
+    for name, section, expected_types in (('pricing config', config, CONFIG_SECTION_TYPES),
+                                          ('promo config', promo_config, PROMO_SECTION_TYPES)):
+        for key, expected in expected_types.items():
+            if key in section and not isinstance(section[key], expected):
+                problems.append(f'{name} {key} must be a {expected.__name__}, '
+                                f'not {type(section[key]).__name__}')
+    for name, entries in (('product_constraints', config.get('product_constraints')),
+                          ('paper', paper_stocks), ('promo product', promo_config.get('products'))):
+        if isinstance(entries, dict):
+            problems.extend(f'{name} {key} must be a dict, not {type(value).__name__}'
+                            for key, value in entries.items() if not isinstance(value, dict))
+    products = promo_config.get('products')
+    if isinstance(products, dict):
+        for product, settings in products.items():
+            supplier_costs = settings.get('supplier_costs', {}) if isinstance(settings, dict) else {}
+            if not isinstance(supplier_costs, dict):
+                problems.append(f'promo product {product} supplier_costs must be a dict, '
+                                f'not {type(supplier_costs).__name__}')
+    return problems
+
+
+def compile_snapshot(config=None, paper_stocks=None, promo_config=None):
+    """
+    Validate the config modules (or the given dicts) into a ConfigSnapshot.
+    Module dicts are copied, so later edits to them cannot reach a live
+    snapshot; pass fresh dicts to build a changed one.
+    """
+    config = config if config is not None else _detached_source('config.pricing_config')
+    paper_stocks = paper_stocks if paper_stocks is not None else _detached_source('config.paper_stocks')
+    promo_config = promo_config if promo_config is not None else _detached_source('config.promo_config')
+
+    problems = validate_config(config, paper_stocks, promo_config)
+    if problems:
+        raise ValueError('Invalid pricing config: ' + '; '.join(problems))
+    return ConfigSnapshot(config_version(config, paper_stocks, promo_config),
+                          config, promo_config, paper_stocks)
+
+
+def _source_stamps():
+    """(path, mtime_ns) of each imported config module"""
+    stamps = []
+    for module_name in CONFIG_SOURCES:
+        path = getattr(sys.modules.get(module_name), '__file__', None)
+        if path:
+            stamps.append((path, os.stat(path).st_mtime_ns))
+    return stamps
+
+
+def write_snapshot(snapshot, path=SNAPSHOT_PATH):
+    """Atomically write a snapshot file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    payload = (SNAPSHOT_FORMAT, _source_stamps(), snapshot.version, snapshot.built_at,
+               snapshot.config, snapshot.promo_config, marshal.dumps(snapshot.paper_stocks))
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        marshal.dump(payload, f)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path=SNAPSHOT_PATH):
+    """
+    Load a snapshot file; returns None when it is missing, from another
+    format or interpreter version, or older than the config modules it was
+    built from (or one of them was removed)
+    """
+    try:
+        with open(path, 'rb') as f:
+            payload = marshal.load(f)
+        snapshot_format, stamps, version, built_at, config, promo_config, paper_blob = payload
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if snapshot_format != SNAPSHOT_FORMAT:
+        return None
+    for source, mtime in stamps:
+        try:
+            if os.stat(source).st_mtime_ns != mtime:
+                print(f'Ignoring stale pricing snapshot {path} ({source} changed)', file=sys.stderr)
+                return None
+        except FileNotFoundError:
+            print(f'Ignoring stale pricing snapshot {path} ({source} removed)', file=sys.stderr)
+            return None
+        except OSError:
+            pass
+    return ConfigSnapshot(version, config, promo_config, paper_blob=paper_blob, built_at=built_at)
+
+
+def changed_sections(old, new):
+    """
+    What differs between two snapshots, as cache tags: 'pricing' or 'promo'
+    when anything in that config changed, and 'paper:<code>' per paper stock
+    that was added, removed or edited
+    """
+    changed = set()
+    if old.config != new.config:
+        changed.add('pricing')
+    if old.promo_config != new.promo_config:
+        changed.add('promo')
+    old_papers, new_papers = old.paper_stocks, new.paper_stocks
+    for code in old_papers.keys() | new_papers.keys():
+        if old_papers.get(code) != new_papers.get(code):
+            changed.add(f'paper:{code}')
+    return frozenset(changed)
+
+
+class ConfigStore:
+    """
+    Holds the live snapshot. swap() replaces it in one assignment, so readers
+    always see a complete snapshot, then tells subscribers which sections
+    changed so they can evict exactly the entries built from them. Swaps and
+    subscriptions are serialized; reading the snapshot takes no lock.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.swaps = 0
+        self._subscribers = WeakSet()
+        self._lock = allocate_lock()
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    def subscribe(self, subscriber):
+        """
+        Register an object with on_config_swap(old, new, changed); held
+        weakly. The current snapshot is delivered at once, as a swap from
+        None with nothing changed, under the same lock as swaps, so no swap
+        can land between reading the snapshot and subscribing. Returns it.
+        """
+        with self._lock:
+            self._subscribers.add(subscriber)
+            subscriber.on_config_swap(None, self.snapshot, frozenset())
+            return self.snapshot
+
+    def swap(self, snapshot):
+        """Install a new snapshot; returns the changed sections (empty if same version)"""
+        with self._lock:
+            old = self.snapshot
+            if snapshot.version == old.version:
+                return frozenset()
+            changed = changed_sections(old, snapshot)
+            self.snapshot = snapshot
+            self.swaps += 1
+            # Still under the lock, so subscribers see swaps in order
+            for subscriber in list(self._subscribers):
+                subscriber.on_config_swap(old, snapshot, changed)
+        return changed
+
+
+_store = None
+_store_lock = allocate_lock()
+
+
+def default_store():
+    """
+    Process-wide store, starting from the compiled file when one is
+    available, otherwise the config modules compiled in memory
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConfigStore(read_snapshot(os.environ.get(SNAPSHOT_ENV, SNAPSHOT_PATH))
+                                     or compile_snapshot())
+    return _store
+
+
+def current_snapshot():
+    """The live process-wide snapshot"""
+    return default_store().snapshot
+
+
+def run_snapshot(args):
+    """Entry point for `python -m pricing snapshot`"""
+    try:
+        snapshot = compile_snapshot()
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    write_snapshot(snapshot, args.output)
+    print(f'Wrote pricing snapshot {snapshot.version} to {args.output}', file=sys.stderr)
+    return 0
@@ -0,0 +1,156 @@
+from .plans import SheetPlan, PosterPlan
+
+
+class _SheetPieces:
+    """
+    Quantity ranges sharing one sheets_required value (one press sheet step each),
+    computed arithmetically so a 1-up job does not materialise thousands of tuples
+    """
+
+    def __init__(self, min_quantity, max_quantity, imposition):
+        self.min_quantity = min_quantity
+        self.max_quantity = max_quantity
+        self.imposition = imposition
+        self.first = (min_quantity - 1) // imposition
+
+    def __len__(self):
+        return (self.max_quantity - 1) // self.imposition - self.first + 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        j = self.first + i
+        return (max(self.min_quantity, j * self.imposition + 1),
+                min(self.max_quantity, (j + 1) * self.imposition))
+
+
+class PricingSolver:
+    """
+    Inverse pricing over a compiled plan.
+    The quantity range is split into pieces on which the cost curve is
+    monotone: one piece per sheets_required step for flat/folded prints
+    (ceil(Q / imposition)), one per volume tier for posters, and a single
+    piece for products priced on fractional sheets. Within a piece unit
+    price falls and total cost rises with quantity, so each question is a
+    binary search over pieces followed by one inside a piece.
+    """
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.pieces = self._pieces()
+        self._memo = {}
+
+    def _pieces(self):
+        plan = self.plan
+        if isinstance(plan, SheetPlan):
+            return _SheetPieces(plan.min_quantity, plan.max_quantity, plan.imposition)
+
+        if isinstance(plan, PosterPlan):
+            pieces = []
+            start, current = plan.min_quantity, None
+            for quantity in range(plan.min_quantity, plan.max_quantity + 1):
+                multiplier = self._tier_multiplier(quantity)
+                if current is not None and multiplier != current:
+                    pieces.append((start, quantity - 1))
+                    start = quantity
+                current = multiplier
+            pieces.append((start, plan.max_quantity))
+            return pieces
+
+        return [(plan.min_quantity, plan.max_quantity)]
+
+    def _tier_multiplier(self, quantity):
+        return self.plan.tiers.lookup(self.plan.square_footage * quantity)['multiplier']
+
+    def _price(self, quantity):
+        breakdown = self._memo.get(quantity)
+        if breakdown is None:
+            breakdown = self._memo[quantity] = self.plan.price(quantity)
+        return breakdown
+
+    def _first(self, start, end, predicate):
+        """Smallest quantity in [start, end] satisfying a predicate that is monotone false -> true"""
+        while start < end:
+            mid = (start + end) // 2
+            if predicate(mid):
+                end = mid
+            else:
+                start = mid + 1
+        return start
+
+    def _result(self, quantity):
+        breakdown = self._price(quantity)
+        return {
+            'quantity': quantity,
+            'unit_price': breakdown['unit_price'],
+            'total_cost': breakdown['total_cost'],
+            'sheets_required': breakdown.get('sheets_required')
+        }
+
+    def quantity_for_unit_price(self, target_unit_price):
+        """Minimal quantity whose unit price is at or below the target"""
+        def meets(quantity):
+            return self._price(quantity)['unit_price'] <= target_unit_price
+
+        pieces = self.pieces
+        if isinstance(self.plan, PosterPlan):
+            candidates = (piece for piece in pieces if meets(piece[1]))
+            piece = next(candidates, None)
+        else:
+            # Full-piece end points fall monotonically, so search them; only the
+            # last piece can be cut short by max_quantity and is checked last.
+            i = self._first(0, len(pieces) - 1, lambda i: meets(pieces[i][1]))
+            piece = pieces[i] if meets(pieces[i][1]) else None
+
+        if piece is None:
+            return {'error': f'No quantity between {self.plan.min_quantity} and {self.plan.max_quantity} reaches a unit price of {target_unit_price}'}
+        return self._result(self._first(piece[0], piece[1], meets))
+
+    def quantity_for_total_price(self, target_total_price):
+        """Minimal quantity whose total cost reaches the target"""
+        def meets(quantity):
+            return self._price(quantity)['total_cost'] >= target_total_price
+
+        if isinstance(self.plan, PosterPlan):
+            # Volume tiers can lower the total at a boundary, so check each tier
+            piece = next((piece for piece in self.pieces if meets(piece[1])), None)
+        else:
+            piece = (self.plan.min_quantity, self.plan.max_quantity)
+            if not meets(piece[1]):
+                piece = None
+
+        if piece is None:
+            return {'error': f'No quantity between {self.plan.min_quantity} and {self.plan.max_quantity} reaches a total of {target_total_price}'}
+        return self._result(self._first(piece[0], piece[1], meets))
+
+    def price_breaks(self, thresholds=()):
+        """
+        Quantities where sheets_required or the volume tier steps, and where the
+        unit price crosses each threshold (downwards within a piece, upwards or
+        downwards at a piece boundary)
+        """
+        breaks = []
+        kind = 'volume_tier' if isinstance(self.plan, PosterPlan) else 'sheet_step'
+        previous_end = None
+
+        for start, end in self.pieces:
+            if previous_end is not None:
+                breaks.append({'quantity': start, 'kind': kind, **self._result(start)})
+
+            for threshold in thresholds:
+                def meets(quantity):
+                    return self._price(quantity)['unit_price'] <= threshold
+
+                if previous_end is not None and meets(previous_end) and not meets(start):
+                    breaks.append({'kind': 'above_threshold', 'threshold': threshold, **self._result(start)})
+                if meets(end):
+                    crossing = self._first(start, end, meets)
+                    if crossing > start or (previous_end is not None and not meets(previous_end)):
+                        breaks.append({'kind': 'below_threshold', 'threshold': threshold, **self._result(crossing)})
+
+            previous_end = end
+
+        breaks.sort(key=lambda b: b['quantity'])
+        return breaks
@@ -0,0 +1,418 @@
+import json
+import queue
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from .dispatch import PAPER_ARGUMENTS
+
+
+# Local mirror of the quotes, quote_items and audit_logs tables in
+# sql/schema.sql (plus department/assigned_by from fix_quotes_table.sql).
+# UUIDs are TEXT, JSONB is JSON TEXT and timestamps are ISO-8601 UTC TEXT, so
+# date ranges compare as strings. quote_items.paper_code, config_version and
+# source_id are local additions: the paper is pulled out of the configuration
+# so it can be indexed, and source_id keeps the caller's own row id (item ids
+# are always generated UUIDs). Inserts into quotes and quote_items queue the row for
+# upload through triggers, so every write path is covered.
+STORE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS quotes (
+    id TEXT PRIMARY KEY,
+    quote_number TEXT UNIQUE NOT NULL,
+    user_id TEXT,
+    customer_name TEXT NOT NULL DEFAULT '',
+    customer_email TEXT NOT NULL DEFAULT '',
+    customer_phone TEXT,
+    customer_company TEXT,
+    department TEXT,
+    assigned_by TEXT,
+    status TEXT DEFAULT 'draft' CHECK (status IN ('draft', 'sent', 'accepted', 'rejected', 'expired')),
+    valid_until TEXT,
+    notes TEXT,
+    subtotal REAL NOT NULL DEFAULT 0,
+    tax_rate REAL DEFAULT 0,
+    tax_amount REAL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS quote_items (
+    id TEXT PRIMARY KEY,
+    quote_id TEXT NOT NULL REFERENCES quotes(id) ON DELETE CASCADE,
+    product_type TEXT NOT NULL,
+    configuration TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    total_price REAL NOT NULL,
+    notes TEXT,
+    sort_order INTEGER DEFAULT 0,
+    paper_code TEXT,
+    config_version TEXT,
+    source_id TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    action TEXT NOT NULL,
+    table_name TEXT,
+    record_id TEXT,
+    old_data TEXT,
+    new_data TEXT,
+    ip_address TEXT,
+    user_agent TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS sync_queue (
+    id INTEGER PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    operation TEXT NOT NULL DEFAULT 'insert',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+    synced_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_quotes_customer_email ON quotes(customer_email, created_at);
+CREATE INDEX IF NOT EXISTS idx_quotes_customer_company ON quotes(customer_company, created_at);
+CREATE INDEX IF NOT EXISTS idx_quotes_created_at ON quotes(created_at);
+CREATE INDEX IF NOT EXISTS idx_quote_items_quote_id ON quote_items(quote_id, sort_order);
+CREATE INDEX IF NOT EXISTS idx_quote_items_product ON quote_items(product_type, created_at);
+CREATE INDEX IF NOT EXISTS idx_quote_items_paper ON quote_items(paper_code, created_at);
+CREATE INDEX IF NOT EXISTS idx_quote_items_created_at ON quote_items(created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_record ON audit_logs(table_name, record_id);
+CREATE INDEX IF NOT EXISTS idx_sync_queue_pending ON sync_queue(id) WHERE synced_at IS NULL;
+
+CREATE TRIGGER IF NOT EXISTS sync_quotes_insert AFTER INSERT ON quotes BEGIN
+    INSERT INTO sync_queue (table_name, record_id) VALUES ('quotes', NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS sync_quote_items_insert AFTER INSERT ON quote_items BEGIN
+    INSERT INTO sync_queue (table_name, record_id) VALUES ('quote_items', NEW.id);
+END;
+'''
+
+QUOTE_COLUMNS = ('id', 'quote_number', 'user_id', 'customer_name', 'customer_email', 'customer_phone',
+                 'customer_company', 'department', 'assigned_by', 'status', 'valid_until', 'notes',
+                 'subtotal', 'tax_rate', 'tax_amount', 'total')
+ITEM_COLUMNS = ('id', 'quote_id', 'product_type', 'configuration', 'quantity', 'unit_price',
+                'total_price', 'notes', 'sort_order', 'paper_code', 'config_version', 'source_id')
+
+# Fixed statement text: sqlite3 prepares each once per connection and reuses
+# it from the statement cache, and executemany binds every row to it
+# Quotes referenced by bulk rows but not yet in the store
+INSERT_BARE_QUOTE = 'INSERT OR IGNORE INTO quotes (id, quote_number, user_id) VALUES (?, ?, ?)'
+INSERT_ITEM = (f'INSERT INTO quote_items ({", ".join(ITEM_COLUMNS)}) '
+               f'VALUES ({", ".join("?" * len(ITEM_COLUMNS))})')
+INSERT_AUDIT = ('INSERT INTO audit_logs (id, user_id, action, table_name, record_id, old_data, new_data) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+BATCH_SIZE = 5000
+
+
+def _json(value):
+    return None if value is None else json.dumps(value, separators=(',', ':'), sort_keys=True, default=str)
+
+
+def _new_id():
+    return str(uuid.uuid4())
+
+
+class QuoteStore:
+    """
+    Embedded SQLite store for priced quotes, for offline operation and
+    analytics.
+
+    The database runs in WAL mode, so readers never block the writer or each
+    other. All writes go through one connection behind a lock, in batched
+    transactions (SQLite has a single writer anyway); reads borrow a
+    connection from a small pool, so any number of threads can query while a
+    bulk load is running.
+    """
+
+    def __init__(self, path, readers=4):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        with self._write_lock:
+            self._writer.executescript(STORE_SCHEMA)
+            # Stores created before quote_items.source_id existed
+            columns = {row[1] for row in self._writer.execute('PRAGMA table_info(quote_items)')}
+            if 'source_id' not in columns:
+                self._writer.execute('ALTER TABLE quote_items ADD COLUMN source_id TEXT')
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._max_readers = readers
+        self._pool_lock = threading.Lock()
+        self.written = Counter()
+
+    def _connect(self):
+        # Transactions are managed explicitly; the default would commit per statement
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                     cached_statements=64)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA foreign_keys=ON')
+        connection.execute('PRAGMA busy_timeout=5000')
+        return connection
+
+    def close(self):
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read connection; the pool grows up to `readers`, then callers wait"""
+        try:
+            connection = self._readers.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                grow = self._reader_count < self._max_readers
+                if grow:
+                    self._reader_count += 1
+            connection = self._connect() if grow else self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put(connection)
+
+    @contextmanager
+    def transaction(self):
+        """One write transaction on the writer connection"""
+        with self._write_lock:
+            self._writer.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._writer
+            except BaseException:
+                self._writer.execute('ROLLBACK')
+                raise
+            self._writer.execute('COMMIT')
+
+    # Writes
+
+    def save_quote(self, quote, items=(), user_id=None):
+        """
+        Insert a quote and its items in one transaction, with an audit entry.
+        quote uses the quotes column names (id and quote_number are generated
+        if missing); items are price results as returned by calculate_*,
+        with 'product_type', 'quantity' and 'configuration' set. Returns the
+        quote id.
+        """
+        quote = dict(quote)
+        quote_id = quote.setdefault('id', _new_id())
+        quote.setdefault('quote_number', f'Q-{quote_id}')
+        quote.setdefault('user_id', user_id)
+        rows = [self._item_row(item, quote_id, sort_order) for sort_order, item in enumerate(items)]
+        if 'total' not in quote:
+            quote['total'] = round(sum(row[6] for row in rows), 2)
+        quote.setdefault('subtotal', quote['total'])
+        quote.setdefault('status', 'draft')
+        with self.transaction() as connection:
+            # Columns left out take the schema defaults
+            columns = [column for column in QUOTE_COLUMNS if quote.get(column) is not None]
+            connection.execute(f'INSERT INTO quotes ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                               [quote[column] for column in columns])
+            connection.executemany(INSERT_ITEM, rows)
+            connection.execute(INSERT_AUDIT, (_new_id(), user_id, 'create_quote', 'quotes', quote_id,
+                                              None, _json({'quote': quote, 'items': len(rows)})))
+        return quote_id
+
+    @staticmethod
+    def _item_row(item, quote_id, sort_order=0):
+        configuration = item.get('configuration') or {}
+        paper_code = next((configuration[name] for name in PAPER_ARGUMENTS if configuration.get(name)), None)
+        # Item ids are always generated (a UUID, as in the server schema); the
+        # caller's own id, e.g. a bulk row id, is kept as source_id
+        source_id = item.get('item_id')
+        return (_new_id(), quote_id, item['product_type'], _json(configuration),
+                item['quantity'], item['unit_price'], item['total_cost'], item.get('notes'),
+                item.get('sort_order', sort_order), paper_code, item.get('config_version'),
+                None if source_id is None else str(source_id))
+
+    def record(self, results, quote_id=None, batch_size=BATCH_SIZE, user_id=None):
+        """
+        Store priced bulk rows (bulk.price_rows results with configuration)
+        batch_size rows per transaction, yielding each row without its
+        configuration as it arrives, so a bulk run streams through the store.
+        Batches are written on a background thread while the next one is
+        being priced; the generator finishes once the last is committed and
+        re-raises a write error. Rows carrying a quote_id are grouped under
+        that quote (created as a bare draft if new); the rest go under
+        quote_id, or one quote created for this call. Rows with an error are
+        passed through but not stored. Counts accumulate in self.written.
+        """
+        batches = queue.Queue(maxsize=4)
+        failed = []
+        run = {'quote': quote_id, 'stored': 0, 'skipped': 0}
+
+        def write():
+            while True:
+                batch = batches.get()
+                if batch is None:
+                    return
+                if not failed:
+                    try:
+                        self._write_batch(batch, run, user_id)
+                    except BaseException as e:
+                        failed.append(e)
+
+        writer = threading.Thread(target=write, name='quote-store-writer', daemon=True)
+        writer.start()
+        try:
+            results = iter(results)
+            while not failed:
+                batch = [(result, result.pop('configuration', None)) for result in islice(results, batch_size)]
+                if not batch:
+                    break
+                batches.put(batch)
+                for result, _ in batch:
+                    yield result
+        finally:
+            batches.put(None)
+            writer.join()
+        if failed:
+            raise failed[0]
+
+        if run['stored']:
+            self.log('bulk_import', 'quote_items', run['quote'],
+                     new_data={'stored': run['stored'], 'skipped': run['skipped']}, user_id=user_id)
+
+    def _write_batch(self, batch, run, user_id):
+        quotes = {}
+        items = []
+        for result, configuration in batch:
+            if 'error' in result:
+                continue
+            item_quote = result.get('quote_id')
+            if item_quote is None:
+                if run['quote'] is None:
+                    run['quote'] = _new_id()
+                item_quote = run['quote']
+                quotes.setdefault(item_quote, None)
+            else:
+                item_quote = str(item_quote)
+                quotes.setdefault(item_quote, result.get('quote_number'))
+            items.append(self._item_row({**result, 'item_id': result.get('id'), 'configuration': configuration},
+                                        item_quote, result.get('sort_order', result.get('row', 0))))
+        with self.transaction() as connection:
+            connection.executemany(INSERT_BARE_QUOTE, [(quote, number or f'Q-{quote}', user_id)
+                                                       for quote, number in quotes.items()])
+            connection.executemany(INSERT_ITEM, items)
+        run['stored'] += len(items)
+        run['skipped'] += len(batch) - len(items)
+        self.written['stored'] += len(items)
+        self.written['skipped'] += len(batch) - len(items)
+
+    def write_results(self, results, quote_id=None, batch_size=BATCH_SIZE, user_id=None):
+        """Store priced bulk rows (see record); returns (stored, skipped) for this call"""
+        before = self.written.copy()
+        for _ in self.record(results, quote_id, batch_size, user_id):
+            pass
+        return (self.written['stored'] - before['stored'], self.written['skipped'] - before['skipped'])
+
+    def log(self, action, table_name=None, record_id=None, old_data=None, new_data=None, user_id=None):
+        with self.transaction() as connection:
+            connection.execute(INSERT_AUDIT, (_new_id(), user_id, action, table_name, record_id,
+                                              _json(old_data), _json(new_data)))
+
+    # Reads
+
+    def _query(self, sql, params=()):
+        with self.reader() as connection:
+            cursor = connection.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def quote(self, quote_id):
+        """A quote with its items in sort order, or None"""
+        quotes = self._query('SELECT * FROM quotes WHERE id = ?', (quote_id,))
+        if not quotes:
+            return None
+        quote = quotes[0]
+        quote['items'] = self._decode(self._query(
+            'SELECT * FROM quote_items WHERE quote_id = ? ORDER BY sort_order', (quote_id,)))
+        return quote
+
+    def quotes_for_customer(self, email=None, company=None, start=None, end=None, limit=100):
+        """Newest first, by customer email or company, optionally within [start, end)"""
+        if email is None and company is None:
+            raise ValueError('Give a customer email or company')
+        column, value = ('customer_email', email) if email is not None else ('customer_company', company)
+        where, params = self._range(f'{column} = ?', [value], 'created_at', start, end)
+        return self._query(f'SELECT * FROM quotes WHERE {where} ORDER BY created_at DESC LIMIT ?',
+                           params + [limit])
+
+    def items(self, product_type=None, paper_code=None, start=None, end=None, limit=1000):
+        """Quote items by product and/or paper, optionally within [start, end), newest first"""
+        conditions, params = [], []
+        if product_type is not None:
+            conditions.append('product_type = ?')
+            params.append(product_type)
+        if paper_code is not None:
+            conditions.append('paper_code = ?')
+            params.append(paper_code)
+        where, params = self._range(' AND '.join(conditions) or '1', params, 'created_at', start, end)
+        return self._decode(self._query(
+            f'SELECT * FROM quote_items WHERE {where} ORDER BY created_at DESC LIMIT ?', params + [limit]))
+
+    def summary(self, start=None, end=None, by='product_type'):
+        """Item count, quantity and revenue per product_type or paper_code"""
+        if by not in ('product_type', 'paper_code'):
+            raise ValueError("by must be 'product_type' or 'paper_code'")
+        where, params = self._range('1', [], 'created_at', start, end)
+        return self._query(
+            f'SELECT {by}, count(*) AS items, sum(quantity) AS quantity, round(sum(total_price), 2) AS revenue '
+            f'FROM quote_items WHERE {where} GROUP BY {by} ORDER BY revenue DESC', params)
+
+    @staticmethod
+    def _range(where, params, column, start, end):
+        if start is not None:
+            where += f' AND {column} >= ?'
+            params.append(start)
+        if end is not None:
+            where += f' AND {column} < ?'
+            params.append(end)
+        return where, params
+
+    @staticmethod
+    def _decode(items):
+        for item in items:
+            item['configuration'] = json.loads(item['configuration'])
+        return items
+
+    # Sync queue
+
+    def pending_sync(self, limit=500):
+        """Queued rows not yet uploaded, oldest first: [{'id', 'table_name', 'record_id', ...}]"""
+        return self._query('SELECT * FROM sync_queue WHERE synced_at IS NULL ORDER BY id LIMIT ?', (limit,))
+
+    def mark_synced(self, queue_ids):
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE sync_queue SET synced_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = ?",
+                [(queue_id,) for queue_id in queue_ids])
+
+    def mark_failed(self, queue_id, error):
+        """Leave the row queued, recording the attempt"""
+        with self.transaction() as connection:
+            connection.execute('UPDATE sync_queue SET attempts = attempts + 1, last_error = ? WHERE id = ?',
+                               (str(error), queue_id))
+
+    def purge_synced(self, before):
+        """Drop queue rows synced before an ISO timestamp; returns the number removed"""
+        with self.transaction() as connection:
+            return connection.execute('DELETE FROM sync_queue WHERE synced_at < ?', (before,)).rowcount
@@ -0,0 +1,99 @@
+import math
+from bisect import bisect_left, bisect_right
+
+
+class TierIndex:
+    """
+    Sorted, non-overlapping [low, high] ranges with O(log n) lookup.
+    A value that falls in a gap between ranges (e.g. 29.995 sqft between the
+    0-29.99 and 30-59.99 poster tiers) gets the default, exactly like the
+    first-match scans over the config lists it replaces.
+    """
+
+    __slots__ = ('lows', 'highs', 'values', 'default')
+
+    def __init__(self, ranges, default=None):
+        ranges = sorted(ranges, key=lambda r: r[0])
+        for (_, high, _), (low, _, _) in zip(ranges, ranges[1:]):
+            if low <= high:
+                raise ValueError(f'Tier starting at {low} overlaps the previous tier')
+        self.lows = tuple(r[0] for r in ranges)
+        self.highs = tuple(r[1] for r in ranges)
+        self.values = tuple(r[2] for r in ranges)
+        self.default = default
+
+    @classmethod
+    def from_records(cls, records, low_key, high_key, value_key=None, default=None):
+        """Index config dicts by their range keys; values are the dicts (or one field)"""
+        return cls(((record[low_key], record[high_key],
+                     record if value_key is None else record[value_key]) for record in records),
+                   default)
+
+    @classmethod
+    def from_thresholds(cls, thresholds, default=None):
+        """
+        Index {threshold: value} where each value applies from its threshold up
+        to (but not including) the next one, and the last has no upper bound
+        """
+        lows = sorted(thresholds)
+        highs = [math.nextafter(low, -math.inf) for low in lows[1:]] + [math.inf]
+        return cls(((low, high, thresholds[low]) for low, high in zip(lows, highs)), default)
+
+    def position(self, x):
+        """Index of the range containing x, or -1"""
+        i = bisect_right(self.lows, x) - 1
+        if i >= 0 and x <= self.highs[i]:
+            return i
+        return -1
+
+    def lookup(self, x):
+        i = self.position(x)
+        return self.default if i < 0 else self.values[i]
+
+    def boundaries(self):
+        """Lower bound of every range, in order"""
+        return self.lows
+
+    def __len__(self):
+        return len(self.lows)
+
+    def __repr__(self):
+        return f'TierIndex({len(self.lows)} tiers)'
+
+
+class BracketCurve:
+    """
+    Piecewise-linear cost curve through (bracket, cost) points, as used by the
+    promo supplier price lists. Below the first bracket the first cost applies;
+    above the last, the cost is either held or extrapolated along the final
+    segment's slope.
+    """
+
+    __slots__ = ('brackets', 'costs', 'rises', 'runs', 'slopes', 'extrapolate')
+
+    def __init__(self, brackets, costs, extrapolate=False):
+        if len(brackets) != len(costs) or len(brackets) < 2:
+            raise ValueError('Bracket curves need at least two matching brackets and costs')
+        if any(q2 <= q1 for q1, q2 in zip(brackets, brackets[1:])):
+            raise ValueError('Brackets must be strictly increasing')
+        self.brackets = tuple(brackets)
+        self.costs = tuple(costs)
+        self.rises = tuple(c2 - c1 for c1, c2 in zip(costs, costs[1:]))
+        self.runs = tuple(q2 - q1 for q1, q2 in zip(brackets, brackets[1:]))
+        self.slopes = tuple(rise / run for rise, run in zip(self.rises, self.runs))
+        self.extrapolate = extrapolate
+
+    def value(self, x):
+        brackets = self.brackets
+        if x <= brackets[0]:
+            return self.costs[0]
+        if x >= brackets[-1]:
+            if self.extrapolate:
+                return self.costs[-1] + (x - brackets[-1]) * self.slopes[-1]
+            return self.costs[-1]
+        i = bisect_left(brackets, x) - 1
+        # Same operation order as promoCalculator.js so cents match the site
+        return self.costs[i] + (x - brackets[i]) * self.rises[i] / self.runs[i]
+
+    def __repr__(self):
+        return f'BracketCurve({len(self.brackets)} brackets)'
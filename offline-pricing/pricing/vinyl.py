@@ -0,0 +1,70 @@
+import json
+import sys
+import time
+
+from .batch import BatchPricingCalculator, ExactBatchPricingCalculator
+from .bulk import _detect_format, read_rows
+from .dispatch import _number
+
+
+def read_designs(stream, fmt, quantity=None):
+    """
+    Design columns (names, widths, heights, quantities) from CSV/JSONL rows
+    with width and height in inches, quantity and an optional name; a
+    quantity given here replaces every row's
+    """
+    names, widths, heights, quantities = [], [], [], []
+    for number, row in enumerate(read_rows(stream, fmt), 1):
+        if '_error' in row:
+            raise ValueError(row['_error'])
+        try:
+            widths.append(_number(row['width']))
+            heights.append(_number(row['height']))
+            quantities.append(quantity if quantity is not None else int(_number(row['quantity'])))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Design {number} needs a numeric width, height and quantity') from None
+        names.append(row.get('name'))
+    return names, widths, heights, quantities
+
+
+def price_order(calculator, names, widths, heights, quantities, rush_type='standard'):
+    """Price one order in a single vectorized pass, with the per-design breakdown as rows"""
+    result = calculator.calculate_vinyl_sticker_price_batch(widths, heights, quantities, rush_type)
+    if 'error' in result:
+        return result
+    columns = result.pop('designs')
+    values = zip(*(columns[field].tolist() for field in columns))
+    return {'designs': [{'name': name, **dict(zip(columns, row))} for name, row in zip(names, values)],
+            **result}
+
+
+def run_vinyl(args):
+    """Entry point for `python -m pricing vinyl`"""
+    started = time.perf_counter()
+    calculator = ExactBatchPricingCalculator(rounding=args.exact) if args.exact else BatchPricingCalculator()
+    source = sys.stdin if args.designs == '-' else open(args.designs, newline='', encoding='utf-8')
+    try:
+        columns = read_designs(source, _detect_format(args.designs, args.format), args.quantity)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    result = price_order(calculator, *columns, args.rush_type)
+    if 'error' in result:
+        print(result['error'], file=sys.stderr)
+        return 1
+
+    output = json.dumps(result, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+    print(f'Priced {result["design_count"]} designs ({result["total_square_footage"]} sq ft, '
+          f'{result["volume_discount"]}% volume discount): ${result["total_cost"]:.2f} '
+          f'in {(time.perf_counter() - started) * 1000:.1f}ms', file=sys.stderr)
+    return 0
@@ -0,0 +1,105 @@
+"""
+CartPricer totals: a cart of the benchmark scenarios must price every line
+like calculate_* and keep the cart total equal to the sum of the line
+totals through edits, rush changes, removals and config reloads.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import importlib.util
+import unittest
+
+from pricing.benchmark import SCENARIOS
+from pricing.dispatch import PRODUCTS
+
+PRODUCT_OF = {method: product for product, (method, _) in PRODUCTS.items()}
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+class CartPricerTest(unittest.TestCase):
+
+    def make_cart(self, calculator=None):
+        from pricing.calculator import PricingCalculator
+        from pricing.cart import CartPricer
+        cart = CartPricer(calculator or PricingCalculator())
+        for name, method, kwargs in SCENARIOS:
+            cart.add(name, PRODUCT_OF[method], **kwargs)
+        return cart
+
+    def expected(self, cart, overrides=None):
+        """calculate_* result of every line, with per-line keyword overrides"""
+        results = {}
+        for name, method, kwargs in SCENARIOS:
+            kwargs = {**kwargs, **(overrides or {}).get(name, {})}
+            results[name] = getattr(cart.calc, method)(**kwargs)
+        return results
+
+    def assertCartMatches(self, cart, expected):
+        self.assertEqual(cart.results(), expected)
+        cents = sum(round(result['total_cost'] * 100) for result in expected.values() if 'error' not in result)
+        totals = cart.totals()
+        self.assertEqual(totals['total_cost'], cents / 100)
+        self.assertEqual(totals['items'], len(expected))
+        self.assertEqual(totals['errors'], sum('error' in result for result in expected.values()))
+
+    def test_lines_and_total_match_calculate(self):
+        cart = self.make_cart()
+        self.assertCartMatches(cart, self.expected(cart))
+
+    def test_exact_money_cart(self):
+        from pricing.money import ExactPricingCalculator
+        cart = self.make_cart(ExactPricingCalculator())
+        self.assertCartMatches(cart, self.expected(cart))
+
+    def test_edits_keep_the_total(self):
+        cart = self.make_cart()
+        cart.recomputed.clear()
+        cart.update('flat_postcard_small', quantity=1000)
+        self.assertEqual(cart.recomputed, {'costs': 1, 'total': 1})
+        cart.update('booklet_max', rush_type='next-day')
+        self.assertEqual(cart.recomputed, {'costs': 1, 'rush': 1, 'total': 2})
+        cart.update('notepad_custom', sheets=100)
+        self.assertEqual(cart.recomputed['plan'], 1)
+        # Quantity outside the product's range: the line errors and drops out of the total
+        cart.update('poster_preset', quantity=100000)
+        self.assertCartMatches(cart, self.expected(cart, {
+            'flat_postcard_small': {'quantity': 1000},
+            'booklet_max': {'rush_type': 'next-day'},
+            'notepad_custom': {'sheets': 100},
+            'poster_preset': {'quantity': 100000}
+        }))
+
+    def test_set_rush_and_remove(self):
+        cart = self.make_cart()
+        totals = cart.set_rush('same-day')
+        overrides = {name: {'rush_type': 'same-day'} for name, _, _ in SCENARIOS}
+        expected = self.expected(cart, overrides)
+        self.assertEqual(totals['total_cost'],
+                         sum(round(result['total_cost'] * 100) for result in expected.values()
+                             if 'error' not in result) / 100)
+
+        cart.remove('envelope_color')
+        cart.remove('perfect_bound_small')
+        del expected['envelope_color'], expected['perfect_bound_small']
+        self.assertCartMatches(cart, expected)
+
+    def test_reload_reprices_every_line(self):
+        from pricing.calculator import PricingCalculator
+        from pricing.snapshot import ConfigStore, compile_snapshot
+
+        store = ConfigStore(compile_snapshot())
+        cart = self.make_cart(PricingCalculator(store=store))
+        before = cart.totals()
+        config = dict(store.snapshot.config)
+        config['rush_multipliers'] = {**config['rush_multipliers'], 'same-day': {'multiplier': 3.0}}
+        store.swap(compile_snapshot(config, store.snapshot.paper_stocks, store.snapshot.promo_config))
+
+        after = cart.totals()
+        self.assertEqual(after['config_version'], store.version)
+        self.assertGreater(after['total_cost'], before['total_cost'])
+        self.assertCartMatches(cart, self.expected(cart))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Cold start budget: importing pricing plus the first quote in a fresh
+interpreter, measured the way `python -m pricing bench` does.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+
+PRICING_COLD_START_BUDGET_MS overrides the budget for slower machines.
+"""
+import compileall
+import importlib.util
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from pricing.benchmark import COLD_START_BUDGET_MS, measure_cold_start
+from pricing.snapshot import SNAPSHOT_ENV, compile_snapshot, write_snapshot
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pricing')
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+class ColdStartTest(unittest.TestCase):
+
+    def test_import_and_first_quote_within_budget(self):
+        budget = float(os.environ.get('PRICING_COLD_START_BUDGET_MS', COLD_START_BUDGET_MS))
+        # The budget assumes what a deployment has: bytecode and a config snapshot
+        compileall.compile_dir(PACKAGE_DIR, quiet=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pricing-snapshot.bin')
+            write_snapshot(compile_snapshot(), path)
+            with mock.patch.dict(os.environ, {SNAPSHOT_ENV: path}):
+                cold_start = measure_cold_start()
+        self.assertLessEqual(cold_start, budget,
+                             f'import plus first quote took {cold_start}ms, budget {budget}ms')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+ImpactAnalysis row accounting: rows only one config can price count as
+lost or gained and are aggregated at zero under the other config, and rows
+neither can price are errors.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import importlib.util
+import unittest
+
+FLAT = {'product_type': 'flat-prints', 'width': 4, 'height': 6, 'paper_code': 'LYNOC95FSC'}
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+@unittest.skipIf(importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+class ImpactAnalysisTest(unittest.TestCase):
+
+    def test_gained_and_lost_rows(self):
+        from pricing.calculator import PricingCalculator
+        from pricing.impact import ImpactAnalysis, scenario_snapshot
+
+        old = PricingCalculator()
+        limits = old.config['product_constraints']['flat-prints']
+        low, high = limits['min_quantity'], limits['max_quantity']
+        # The new config takes smaller orders and caps large ones lower
+        new = PricingCalculator(snapshot=scenario_snapshot(old.snapshot, {
+            'product_constraints.flat-prints.min_quantity': low - 10,
+            'product_constraints.flat-prints.max_quantity': high - 1000
+        }))
+
+        both, gained, lost, neither = 250, low - 5, high, low - 20
+        analysis = ImpactAnalysis(old, new)
+        analysis.add([{**FLAT, 'quantity': quantity, 'customer_email': 'buyer@example.com'}
+                      for quantity in (both, gained, lost, neither)] + [{'product_type': 'nope'}])
+        report = analysis.report()
+
+        self.assertEqual(report['rows'], 5)
+        self.assertEqual(report['priced'], 3)
+        self.assertEqual(report['gained'], {'flat-prints': 1})
+        self.assertEqual(report['lost'], {'flat-prints': 1})
+        self.assertEqual(report['errors'].get('Not priceable under either config'), 1)
+        self.assertEqual(sum(report['errors'].values()), 2)
+
+        def total(calculator, *quantities):
+            return round(sum(calculator.calculate_flat_print_price(quantity=quantity, **{
+                name: value for name, value in FLAT.items() if name != 'product_type'})['total_cost']
+                for quantity in quantities), 2)
+
+        overall = report['overall']
+        self.assertEqual(overall['rows'], 3)
+        self.assertEqual(overall['quantity'], both + gained + lost)
+        self.assertEqual(overall['old_total'], total(old, both, lost))
+        self.assertEqual(overall['new_total'], total(new, both, gained))
+        (customer,) = report['hardest_hit_customers']
+        self.assertEqual((customer['label'], customer['rows']), ('buyer@example.com', 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Instrumentation under concurrent calls: every call, error, latency
+observation and sampled hot key from many threads must be counted once.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import importlib.util
+import sys
+import threading
+import unittest
+
+from pricing.instrumentation import Instrumentation
+
+THREADS = 8
+CALLS = 2000
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+class InstrumentationThreadsTest(unittest.TestCase):
+
+    def setUp(self):
+        # Switch threads as often as possible, giving unlocked updates a chance to be
+        # lost (they are on free-threaded builds, which batch --threads targets)
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+    def test_concurrent_counts(self):
+        from pricing.calculator import PricingCalculator
+        calculator = PricingCalculator()
+        instrumentation = Instrumentation(sample_every=1).attach(calculator)
+        start = threading.Barrier(THREADS)
+
+        def work():
+            start.wait()
+            for i in range(CALLS):
+                # Every other call is out of range
+                calculator.calculate_flat_print_price(quantity=25 if i % 2 else 0, width=4, height=6,
+                                                      paper_code='LYNOC95FSC')
+
+        threads = [threading.Thread(target=work) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = THREADS * CALLS
+        snapshot = instrumentation.snapshot()
+        self.assertEqual(snapshot['calls']['calculate_flat_print_price'], total)
+        self.assertEqual(snapshot['errors']['calculate_flat_print_price'], {'quantity_out_of_range': total // 2})
+        self.assertEqual(snapshot['latency']['calculate_flat_print_price']['count'], total)
+        counts, _, count = instrumentation.histograms()['calculate_flat_print_price']
+        self.assertEqual((sum(counts), count), (total, total))
+        self.assertEqual(instrumentation.hot_keys.top(), [(('flat-prints', 'LYNOC95FSC', '4x6'), total)])
+        self.assertIn(f'pricing_calls_total{{method="calculate_flat_print_price"}} {total}',
+                      instrumentation.export('prometheus'))
+
+        instrumentation.reset()
+        self.assertEqual(instrumentation.snapshot()['calls'], {})
+        self.assertEqual(instrumentation.hot_keys.top(), [])
+        instrumentation.detach()
+
+
+if __name__ == '__main__':
+    unittest.main()
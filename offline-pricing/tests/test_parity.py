@@ -0,0 +1,114 @@
+"""
+Every pricing path against calculate_*: compiled plans, the batch kernels
+and the impact analysis plan table must give the same results to the cent
+over the benchmark scenarios and golden quantities.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import importlib.util
+import unittest
+
+from pricing.benchmark import GOLDEN_QUANTITIES, SCENARIOS
+from pricing.dispatch import DIRECT_PRODUCTS, PRODUCTS, normalize_request
+
+PRODUCT_OF = {method: product for product, (method, _) in PRODUCTS.items()}
+
+
+def _options(kwargs):
+    return {name: value for name, value in kwargs.items() if name != 'quantity'}
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+@unittest.skipIf(importlib.util.find_spec('numpy') is None, 'numpy is not installed')
+class ParityTest(unittest.TestCase):
+
+    def scalar_results(self, calculator, method, options):
+        return {quantity: getattr(calculator, method)(quantity=quantity, **options)
+                for quantity in GOLDEN_QUANTITIES}
+
+    def check_plans(self, calculator, price):
+        for name, method, kwargs in SCENARIOS:
+            product = PRODUCT_OF[method]
+            if product in DIRECT_PRODUCTS:
+                continue
+            options = _options(kwargs)
+            plan = calculator.compile_plan(product, **options)
+            for quantity, expected in self.scalar_results(calculator, method, options).items():
+                with self.subTest(scenario=name, quantity=quantity):
+                    self.assertEqual(price(calculator, plan, quantity), expected)
+
+    def check_batch(self, calculator):
+        for name, method, kwargs in SCENARIOS:
+            options = _options(kwargs)
+            scalar = self.scalar_results(calculator, method, options)
+            quantities = [quantity for quantity, result in scalar.items() if 'error' not in result]
+            batch = getattr(calculator, f'{method}_batch')(quantities, **options)
+            for i, quantity in enumerate(quantities):
+                for field, expected in scalar[quantity].items():
+                    if field not in batch:
+                        continue
+                    actual = batch[field]
+                    if hasattr(actual, 'shape'):
+                        actual = actual[i]
+                    with self.subTest(scenario=name, quantity=quantity, field=field):
+                        self.assertEqual(actual, expected)
+            # An out-of-range quantity fails the whole batch with the scalar message
+            for quantity, result in scalar.items():
+                if 'error' in result:
+                    with self.subTest(scenario=name, quantity=quantity):
+                        self.assertEqual(getattr(calculator, f'{method}_batch')([quantity], **options), result)
+
+    def test_plans_match_calculate(self):
+        from pricing.calculator import PricingCalculator
+        self.check_plans(PricingCalculator(), lambda calculator, plan, quantity: plan.price(quantity))
+
+    def test_exact_plans_match_exact_calculate(self):
+        from pricing.money import ExactPricingCalculator
+
+        def price(calculator, plan, quantity):
+            # Quotes, carts and size suggestions round a plan through the calculator
+            result = plan.price(quantity)
+            if 'error' in result:
+                return result
+            return calculator._plan_breakdown(plan, quantity, plan._costs(quantity), plan.r)
+        self.check_plans(ExactPricingCalculator(), price)
+
+    def test_batch_matches_calculate(self):
+        from pricing.batch import BatchPricingCalculator
+        self.check_batch(BatchPricingCalculator())
+
+    def test_exact_batch_matches_exact_calculate(self):
+        from pricing.batch import ExactBatchPricingCalculator
+        self.check_batch(ExactBatchPricingCalculator())
+
+    def test_impact_plan_table_matches_calculate(self):
+        import numpy as np
+        from pricing.calculator import PricingCalculator
+        from pricing.impact import PlanTable
+
+        calculator = PricingCalculator()
+        quantities = np.asarray(GOLDEN_QUANTITIES, dtype=np.int64)
+        rows = np.zeros(quantities.size, dtype=np.int64)
+        for name, method, kwargs in SCENARIOS:
+            product, options, error = normalize_request({'product_type': PRODUCT_OF[method], **kwargs})
+            self.assertIsNone(error)
+            options.pop('quantity')
+            rush_type = options.pop('rush_type', 'standard')
+            table = PlanTable(calculator)
+            table.add(product, options)
+            total, material, priced = table.evaluate(rows, quantities, rows, [rush_type])
+
+            scalar = self.scalar_results(calculator, method, _options(kwargs))
+            for i, (quantity, expected) in enumerate(scalar.items()):
+                with self.subTest(scenario=name, quantity=quantity):
+                    self.assertEqual(bool(priced[i]), 'error' not in expected)
+                    if priced[i]:
+                        self.assertEqual(total[i], expected['total_cost'])
+                        self.assertEqual(material[i], expected.get('material_cost',
+                                                                   expected.get('supplier_cost', 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+ConfigWatcher: reloads from a SQLite config database and a snapshot file
+reach subscribed calculators, and invalid configs or failing sources leave
+the last good config serving while the watcher keeps polling.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from pricing.reload import ConfigWatcher, FileSnapshotSource, SQLiteConfigSource
+from pricing.snapshot import ConfigStore, compile_snapshot, write_snapshot
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+class ConfigWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        from pricing.calculator import PricingCalculator
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ConfigStore(compile_snapshot())
+        self.calculator = PricingCalculator(store=self.store)
+        # Reload messages go to stderr
+        patcher = mock.patch('sys.stderr', new_callable=io.StringIO)
+        self.stderr = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def sqlite_source(self):
+        return SQLiteConfigSource(os.path.join(self.directory.name, 'config.db'), base=self.store.snapshot)
+
+    def set_config(self, source, key, value):
+        with source.connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO pricing_configs (config_key, config_value) VALUES (?, ?)',
+                               (key, value if isinstance(value, str) else json.dumps(value)))
+
+    def rush_multipliers(self, two_day):
+        return {**self.store.snapshot.config['rush_multipliers'], '2-day': {'multiplier': two_day}}
+
+    def test_sqlite_reload_reaches_calculators(self):
+        source = self.sqlite_source()
+        watcher = ConfigWatcher(source, self.store)
+        version = self.store.version
+        # The empty database overlays nothing, so the first poll is the same config
+        self.assertIsNone(watcher.check())
+        self.assertEqual(self.store.version, version)
+
+        self.set_config(source, 'rush_multipliers', self.rush_multipliers(1.3))
+        self.assertEqual(watcher.check(), frozenset({'pricing'}))
+        self.assertNotEqual(self.store.version, version)
+        self.assertEqual(self.calculator._get_rush_multiplier('2-day'), 1.3)
+        # Nothing changed since
+        self.assertIsNone(watcher.check())
+        self.assertEqual(self.store.swaps, 1)
+
+    def test_snapshot_file_reload(self):
+        path = os.path.join(self.directory.name, 'pricing-snapshot.bin')
+        watcher = ConfigWatcher(FileSnapshotSource(path), self.store)
+        self.assertIsNone(watcher.check())
+
+        config = {**self.store.snapshot.config, 'rush_multipliers': self.rush_multipliers(1.4)}
+        snapshot = compile_snapshot(config, self.store.snapshot.paper_stocks, self.store.snapshot.promo_config)
+        write_snapshot(snapshot, path)
+        self.assertEqual(watcher.check(), frozenset({'pricing'}))
+        self.assertEqual(self.store.version, snapshot.version)
+        self.assertEqual(self.calculator._get_rush_multiplier('2-day'), 1.4)
+
+    def test_invalid_config_keeps_last_good(self):
+        source = self.sqlite_source()
+        watcher = ConfigWatcher(source, self.store)
+        version = self.store.version
+        two_day = self.calculator._get_rush_multiplier('2-day')
+
+        self.set_config(source, 'product_constraints', '[]')
+        self.assertIsNone(watcher.check())
+        self.assertIn('product_constraints must be a dict', watcher.last_error)
+        self.assertEqual(self.store.version, version)
+        self.assertEqual(self.calculator._get_rush_multiplier('2-day'), two_day)
+
+        with source.connect() as connection:
+            connection.execute("DELETE FROM pricing_configs WHERE config_key = 'product_constraints'")
+        self.set_config(source, 'rush_multipliers', self.rush_multipliers(1.3))
+        self.assertEqual(watcher.check(), frozenset({'pricing'}))
+        self.assertIsNone(watcher.last_error)
+        self.assertEqual(self.calculator._get_rush_multiplier('2-day'), 1.3)
+
+    def test_polling_survives_unexpected_errors(self):
+        config = {**self.store.snapshot.config, 'rush_multipliers': self.rush_multipliers(1.5)}
+        snapshot = compile_snapshot(config, self.store.snapshot.paper_stocks, self.store.snapshot.promo_config)
+        errors = []
+
+        class FlakySource:
+            polls = 0
+
+            def poll(self):
+                self.polls += 1
+                # start() polls once itself; the thread's first two polls fail
+                if self.polls in (2, 3):
+                    errors.append(self.polls)
+                    raise RuntimeError('connection reset')
+                return snapshot if self.polls == 4 else None
+
+        watcher = ConfigWatcher(FlakySource(), self.store, interval=0.01).start()
+        try:
+            deadline = time.monotonic() + 5
+            while self.store.version != snapshot.version and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop()
+        self.assertEqual(errors, [2, 3])
+        self.assertEqual(self.store.version, snapshot.version)
+        self.assertEqual(self.calculator._get_rush_multiplier('2-day'), 1.5)
+        self.assertIn('RuntimeError: connection reset', self.stderr.getvalue())
+
+    def test_unexpected_error_is_recorded(self):
+        class BrokenSource:
+            def poll(self):
+                raise RuntimeError('disk gone')
+
+        watcher = ConfigWatcher(BrokenSource(), self.store, interval=0.01)
+        # The thread body, stopped after its first poll
+        with mock.patch.object(watcher._stop, 'wait', side_effect=[False, True]):
+            watcher._run()
+        self.assertEqual(watcher.last_error, 'RuntimeError: disk gone')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+PricingService response cache across config reloads: responses built from
+a changed section are recomputed, the rest are still served from cache, and
+nothing cached under one config version is served under another.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import asyncio
+import importlib.util
+import unittest
+
+
+def _flat(paper_code):
+    return {'quantity': 100, 'width': 4, 'height': 6, 'paper_code': paper_code}
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+class ResponseCacheReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        from pricing.calculator import PricingCalculator
+        from pricing.service import PricingService
+        from pricing.snapshot import ConfigStore, compile_snapshot
+
+        self.store = ConfigStore(compile_snapshot())
+        self.service = PricingService(PricingCalculator(store=self.store))
+        self.addCleanup(self.service.executor.shutdown)
+
+    def call(self, paper_code):
+        return asyncio.run(self.service.call('calculate_flat_print_price', _flat(paper_code)))
+
+    def swap_paper_cost(self, code, factor):
+        from pricing.snapshot import compile_snapshot
+        snapshot = self.store.snapshot
+        papers = dict(snapshot.paper_stocks)
+        papers[code] = {**papers[code], 'cost_per_sheet': papers[code]['cost_per_sheet'] * factor}
+        return self.store.swap(compile_snapshot(snapshot.config, papers, snapshot.promo_config))
+
+    def test_reload_evicts_only_changed_papers(self):
+        changed_before = self.call('LYNOC95FSC')
+        kept_before = self.call('PACDIS42FSC')
+        cache = self.service.cache
+        self.assertEqual((cache.misses, len(cache)), (2, 2))
+
+        self.assertEqual(self.swap_paper_cost('LYNOC95FSC', 2), frozenset({'paper:LYNOC95FSC'}))
+        self.assertEqual((cache.evictions, len(cache)), (1, 1))
+
+        self.assertEqual(self.call('PACDIS42FSC'), kept_before)
+        self.assertEqual(cache.hits, 1)
+        changed_after = self.call('LYNOC95FSC')
+        self.assertEqual(cache.misses, 3)
+        self.assertGreater(changed_after['total_cost'], changed_before['total_cost'])
+        self.assertEqual(changed_after, self.service.calc.calculate_flat_print_price(**_flat('LYNOC95FSC')))
+
+    def test_other_versions_are_never_served(self):
+        key = self.service._key('calculate_flat_print_price', _flat('LYNOC95FSC'))
+        self.assertEqual(key[0], self.store.version)
+        # An entry from some other config, as a reload racing a computation could leave
+        self.service.cache.put(('stale-version', *key[1:]), {'total_cost': 0}, frozenset({'pricing'}))
+        self.assertNotEqual(self.call('LYNOC95FSC')['total_cost'], 0)
+
+        self.swap_paper_cost('PACDIS42FSC', 2)
+        self.assertEqual(len(self.service.cache), 1)
+        self.assertEqual(next(iter(self.service.cache._entries))[0], self.store.version)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+PricingSolver against brute force: every quantity of each benchmark
+scenario's range is priced, and the budget, unit-price and price-break
+answers must match a linear scan of those prices.
+
+Run from offline-pricing/ with the site's config package importable:
+
+    python -m pytest tests
+"""
+import importlib.util
+import unittest
+
+from pricing.benchmark import SCENARIOS
+from pricing.dispatch import DIRECT_PRODUCTS, PRODUCTS
+from pricing.plans import PosterPlan, SheetPlan
+from pricing.solver import PricingSolver
+
+PRODUCT_OF = {method: product for product, (method, _) in PRODUCTS.items()}
+
+# Targets tried per scenario, spread over the prices the range reaches
+TARGETS = 15
+
+
+def _spread(values):
+    values = sorted(set(values))
+    return values[::max(1, len(values) // TARGETS)]
+
+
+@unittest.skipIf(importlib.util.find_spec('config') is None, 'config package is not importable')
+class SolverBruteForceTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from pricing.calculator import PricingCalculator
+        calculator = PricingCalculator()
+        cls.cases = []
+        for name, method, kwargs in SCENARIOS:
+            product = PRODUCT_OF[method]
+            if product in DIRECT_PRODUCTS:
+                continue
+            options = {key: value for key, value in kwargs.items() if key != 'quantity'}
+            plan = calculator.compile_plan(product, **options)
+            quantities = range(plan.min_quantity, plan.max_quantity + 1)
+            prices = {quantity: plan.price(quantity) for quantity in quantities}
+            cls.cases.append((name, plan, quantities, prices))
+
+    def assertAnswer(self, answer, expected_quantity):
+        if expected_quantity is None:
+            self.assertIn('error', answer)
+        else:
+            self.assertEqual(answer.get('quantity'), expected_quantity)
+
+    def test_quantity_for_unit_price(self):
+        for name, plan, quantities, prices in self.cases:
+            solver = PricingSolver(plan)
+            units = [price['unit_price'] for price in prices.values()]
+            for target in _spread(units) + [min(units) - 0.001, max(units) + 1]:
+                expected = next((q for q in quantities if prices[q]['unit_price'] <= target), None)
+                with self.subTest(scenario=name, target=target):
+                    self.assertAnswer(solver.quantity_for_unit_price(target), expected)
+
+    def test_quantity_for_total_price(self):
+        for name, plan, quantities, prices in self.cases:
+            solver = PricingSolver(plan)
+            totals = [price['total_cost'] for price in prices.values()]
+            for target in _spread(totals) + [min(totals) - 1, max(totals) + 1]:
+                expected = next((q for q in quantities if prices[q]['total_cost'] >= target), None)
+                with self.subTest(scenario=name, target=target):
+                    self.assertAnswer(solver.quantity_for_total_price(target), expected)
+
+    def test_price_breaks(self):
+        for name, plan, quantities, prices in self.cases:
+            units = sorted({price['unit_price'] for price in prices.values()})
+            thresholds = tuple(units[len(units) * k // 4] for k in (1, 2, 3))
+            if isinstance(plan, SheetPlan):
+                kind, step = 'sheet_step', lambda quantity: -(-quantity // plan.imposition)
+            elif isinstance(plan, PosterPlan):
+                kind, step = 'volume_tier', lambda quantity: plan.tiers.lookup(plan.square_footage * quantity)
+            else:
+                kind, step = 'sheet_step', lambda quantity: None
+
+            expected = set()
+            for quantity in quantities[1:]:
+                if step(quantity) != step(quantity - 1):
+                    expected.add((quantity, kind, None))
+                for threshold in thresholds:
+                    before = prices[quantity - 1]['unit_price'] <= threshold
+                    after = prices[quantity]['unit_price'] <= threshold
+                    if before != after:
+                        expected.add((quantity, 'below_threshold' if after else 'above_threshold', threshold))
+
+            breaks = PricingSolver(plan).price_breaks(thresholds)
+            with self.subTest(scenario=name):
+                self.assertEqual({(b['quantity'], b['kind'], b.get('threshold')) for b in breaks}, expected)
+                self.assertEqual([b['quantity'] for b in breaks], sorted(b['quantity'] for b in breaks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+QuoteStore round-trips (save_quote and bulk record against the query
+methods) and the sync queue the insert triggers fill.
+
+    python -m pytest tests
+"""
+import os
+import tempfile
+import unittest
+
+from pricing.store import QuoteStore
+
+
+def _item(product_type, quantity, unit_price, total_cost, **configuration):
+    return {'product_type': product_type, 'quantity': quantity, 'unit_price': unit_price,
+            'total_cost': total_cost, 'config_version': 'v1', 'configuration': configuration}
+
+
+class QuoteStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = QuoteStore(os.path.join(self.directory.name, 'quotes.db'))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def save(self, **quote):
+        return self.store.save_quote({'customer_email': 'buyer@example.com', **quote}, [
+            _item('flat-prints', 250, 0.42, 105.0, width=4, height=6, paper_code='LYNOC95FSC'),
+            _item('booklets', 100, 3.5, 350.0, size='5.5x8.5', pages=16, cover_paper_code='SELF_COVER',
+                  text_paper_code='PACDIS42FSC')
+        ])
+
+    def test_save_quote_round_trip(self):
+        quote_id = self.save(customer_company='Acme')
+        quote = self.store.quote(quote_id)
+        self.assertEqual(quote['customer_email'], 'buyer@example.com')
+        self.assertEqual(quote['customer_company'], 'Acme')
+        self.assertEqual(quote['status'], 'draft')
+        self.assertEqual(quote['total'], 455.0)
+        self.assertEqual(quote['subtotal'], 455.0)
+        self.assertEqual([item['product_type'] for item in quote['items']], ['flat-prints', 'booklets'])
+        flat, booklet = quote['items']
+        self.assertEqual(flat['configuration'], {'width': 4, 'height': 6, 'paper_code': 'LYNOC95FSC'})
+        self.assertEqual((flat['quantity'], flat['unit_price'], flat['total_price']), (250, 0.42, 105.0))
+        self.assertEqual(flat['paper_code'], 'LYNOC95FSC')
+        # A self cover has no paper of its own, so the text paper is indexed
+        self.assertEqual(booklet['paper_code'], 'PACDIS42FSC')
+        self.assertEqual(booklet['config_version'], 'v1')
+        self.assertIsNone(self.store.quote('missing'))
+
+    def test_queries(self):
+        first = self.save(customer_company='Acme')
+        self.save(customer_email='other@example.com')
+        self.assertEqual([quote['id'] for quote in self.store.quotes_for_customer(company='Acme')], [first])
+        self.assertEqual(len(self.store.quotes_for_customer(email='buyer@example.com')), 1)
+        self.assertEqual(self.store.quotes_for_customer(email='buyer@example.com', start='9999'), [])
+        self.assertEqual(len(self.store.items(product_type='flat-prints')), 2)
+        self.assertEqual(len(self.store.items(paper_code='PACDIS42FSC')), 2)
+        summary = {row['product_type']: row for row in self.store.summary()}
+        self.assertEqual((summary['booklets']['items'], summary['booklets']['quantity'],
+                          summary['booklets']['revenue']), (2, 200, 700.0))
+        with self.assertRaises(ValueError):
+            self.store.quotes_for_customer()
+        with self.assertRaises(ValueError):
+            self.store.summary(by='customer')
+
+    def test_record_round_trip(self):
+        rows = [
+            {'row': 0, 'id': 'a', **_item('flat-prints', 250, 0.42, 105.0, paper_code='LYNOC95FSC')},
+            {'row': 1, 'id': 'b', 'error': 'Invalid paper selection', 'configuration': {'paper_code': 'NOPE'}},
+            {'row': 2, 'id': 'c', 'quote_id': 'Q1', 'quote_number': 'Q-0001',
+             **_item('posters', 10, 12.5, 125.0, material_code='LARGE_FORMAT_PAPER')},
+        ]
+        yielded = list(self.store.record(rows, batch_size=2))
+        self.assertEqual([row['id'] for row in yielded], ['a', 'b', 'c'])
+        self.assertTrue(all('configuration' not in row for row in yielded))
+        self.assertEqual((self.store.written['stored'], self.store.written['skipped']), (2, 1))
+
+        grouped = self.store.quote('Q1')
+        self.assertEqual(grouped['quote_number'], 'Q-0001')
+        self.assertEqual([item['source_id'] for item in grouped['items']], ['c'])
+        self.assertEqual(grouped['items'][0]['configuration'], {'material_code': 'LARGE_FORMAT_PAPER'})
+        (flat,) = self.store.items(product_type='flat-prints')
+        self.assertEqual((flat['source_id'], flat['paper_code'], flat['total_price']), ('a', 'LYNOC95FSC', 105.0))
+        self.assertEqual(self.store.quote(flat['quote_id'])['items'][0]['id'], flat['id'])
+
+        self.assertEqual(self.store.write_results([_item('flat-prints', 25, 1.0, 25.0)], quote_id='Q1'), (1, 0))
+        self.assertEqual(len(self.store.quote('Q1')['items']), 2)
+
+    def test_inserts_queue_sync(self):
+        quote_id = self.save()
+        pending = self.store.pending_sync()
+        self.assertEqual([row['table_name'] for row in pending], ['quotes', 'quote_items', 'quote_items'])
+        self.assertEqual(pending[0]['record_id'], quote_id)
+        item_ids = {item['id'] for item in self.store.quote(quote_id)['items']}
+        self.assertEqual({row['record_id'] for row in pending[1:]}, item_ids)
+
+        # Bulk rows under a new quote queue the bare quote as well as the items
+        self.store.write_results([_item('flat-prints', 25, 1.0, 25.0)], quote_id='bulk')
+        queued = [(row['table_name'], row['record_id']) for row in self.store.pending_sync()[3:]]
+        self.assertEqual([table for table, _ in queued], ['quotes', 'quote_items'])
+        self.assertEqual(queued[0][1], 'bulk')
+
+    def test_sync_queue_lifecycle(self):
+        self.save()
+        first, second, third = self.store.pending_sync()
+        self.store.mark_failed(first['id'], 'timeout')
+        self.store.mark_synced([second['id'], third['id']])
+        (left,) = self.store.pending_sync()
+        self.assertEqual((left['id'], left['attempts'], left['last_error']), (first['id'], 1, 'timeout'))
+
+        self.assertEqual(self.store.purge_synced('0000'), 0)
+        self.assertEqual(self.store.purge_synced('9999'), 2)
+        self.assertEqual([row['id'] for row in self.store.pending_sync()], [first['id']])
+
+
+if __name__ == '__main__':
+    unittest.main()